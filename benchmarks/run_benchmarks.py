@@ -0,0 +1,315 @@
+"""性能基准测试
+
+在模拟的微信目录树上测量扫描、标签索引、预览、删除和列表排序的耗时，
+结果以 JSON 输出，并可以与保存的基准结果比较。不需要图形界面。
+
+用法:
+    python benchmarks/run_benchmarks.py --sizes 10k,100k
+    python benchmarks/run_benchmarks.py --sizes 10k --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --sizes 10k --baseline benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'src')
+
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+GROUPS = ['scan', 'tags', 'preview', 'cache', 'sort', 'startup']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='快速图片清理工具性能基准测试')
+    parser.add_argument('--sizes', default='10k', help=f'目录树规模，逗号分隔: {", ".join(SIZES)}（默认 10k）')
+    parser.add_argument('--only', help=f'只运行部分测试，逗号分隔: {", ".join(GROUPS)}')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试的重复次数（默认 3）')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'fastDeleteImg-bench'),
+                        help='生成测试数据的目录，已生成的目录树会被复用')
+    parser.add_argument('-o', '--output', help='结果输出文件，默认输出到标准输出')
+    parser.add_argument('--baseline', help='与此基准结果比较')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基准')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='比基准慢多少视为退化（默认 0.15，即 15%%）')
+    parser.add_argument('--fail-on-regression', action='store_true', help='有退化时以非零状态退出')
+    return parser.parse_args()
+
+class Runner:
+    """运行测试并收集结果"""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name: str, func, items: int = None, setup=None, repeat: int = None):
+        """多次运行 func 并记录耗时；setup 在每次运行前调用，不计入耗时"""
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        result = {'median': round(median, 6), 'min': round(min(times), 6), 'runs': len(times)}
+        if items:
+            result['items'] = items
+            result['per_second'] = round(items / median, 1) if median > 0 else None
+        self.results[name] = result
+        print(f'{name:<40} {median * 1000:>10.2f} ms', file=sys.stderr)
+
+    def skip(self, name: str, reason: str):
+        self.results[name] = {'skipped': reason}
+        print(f'{name:<40} 跳过: {reason}', file=sys.stderr)
+
+def bench_scan(runner: Runner, label: str, root: str):
+    from utils.file_utils import FileUtils
+    from utils.scan_utils import ScanUtils
+
+    count = sum(1 for _ in ScanUtils.iter_images(root))
+    message_folders = FileUtils.find_wechat_folders(root)
+
+    def walk():
+        for _ in ScanUtils.iter_images(root):
+            pass
+
+    def scan_results():
+        # 与 FastImageDeleter.scan_images 生成的结果相同
+        results = []
+        for entry in ScanUtils.iter_images(root):
+            results.append(('entry', entry, False, 0))
+
+    def walk_multi():
+        # 与“全部扫描”相同，各账号的 Message 目录共用一个线程池
+        for _ in ScanUtils.iter_images_multi(message_folders):
+            pass
+
+    runner.run(f'scan.walk[{label}]', walk, count)
+    runner.run(f'scan.results[{label}]', scan_results, count)
+    runner.run(f'scan.multi[{label}]', walk_multi, count)
+
+def bench_tags(runner: Runner, label: str, root: str, work_dir: str):
+    from utils.scan_utils import ScanUtils
+    from utils.tag_index import TagIndex
+
+    paths = [entry.path for entry in ScanUtils.iter_images(root)]
+    sample = random.Random(0).sample(paths, min(len(paths), 2000))
+    db_path = os.path.join(work_dir, f'tags-{label}.db')
+
+    def fresh_index():
+        # TagIndex 是单例，每次测试前换成新的数据库
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        TagIndex._instance = None
+        return TagIndex(db_path)
+
+    state = {}
+
+    def setup_bulk():
+        state['index'] = fresh_index()
+
+    runner.run(f'tags.set_bulk[{label}]',
+               lambda: state['index'].set_tags([(p, '1', 'Red', 'Red') for p in paths]),
+               len(paths), setup_bulk)
+
+    runner.run(f'tags.set_single[{label}]',
+               lambda: [state['index'].set_tag(p, '2', 'Orange', 'Orange') for p in sample[:200]],
+               200, repeat=1)
+
+    def cold():
+        state['index'].invalidate_cache()
+
+    runner.run(f'tags.get_cold[{label}]', lambda: state['index'].get_tag(paths[0]), 1, cold)
+    runner.run(f'tags.get_bulk[{label}]', lambda: state['index'].get_tags(paths), len(paths))
+    runner.run(f'tags.get_single[{label}]', lambda: [state['index'].get_tag(p) for p in sample], len(sample))
+    runner.run(f'tags.get_all[{label}]', lambda: state['index'].get_all_tags(), len(paths))
+    runner.run(f'tags.remove_bulk[{label}]', lambda: state['index'].remove_tags(sample), len(sample))
+
+def bench_preview(runner: Runner, work_dir: str):
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        runner.skip('preview.load_and_resize', 'Pillow 未安装')
+        return
+    from wechat_tree import generate_images
+    from utils.image_utils import ImageUtils
+
+    paths = generate_images(os.path.join(work_dir, 'preview'), 20)
+
+    def load():
+        for file_path in paths:
+            ImageUtils.load_and_resize_image(file_path, 800, 600)
+
+    runner.run('preview.load_and_resize', load, len(paths))
+    
+    # 同样的缩略图分别在线程池和解码进程池中生成，比较多核下的吞吐量
+    from concurrent.futures import ThreadPoolExecutor
+    from config.config import Config
+    from utils.decode_service import DecodeService
+
+    thumbs = paths * 4
+    service = DecodeService()
+    service.warm_up()
+
+    def thumbs_threads():
+        with ThreadPoolExecutor(max_workers=Config.DECODE_WORKERS) as executor:
+            list(executor.map(lambda p: ImageUtils.load_thumbnail(p, Config.THUMB_SIZE), thumbs))
+
+    def thumbs_processes():
+        with ThreadPoolExecutor(max_workers=Config.DECODE_WORKERS) as executor:
+            list(executor.map(lambda p: service.thumbnail(p, Config.THUMB_SIZE), thumbs))
+
+    runner.run('preview.thumbs.threads', thumbs_threads, len(thumbs))
+    runner.run('preview.thumbs.processes', thumbs_processes, len(thumbs))
+    service.close()
+
+def bench_cache(runner: Runner, label: str, root: str):
+    from utils.cache_utils import CacheUtils
+    from utils.cache_manifest import CacheManifest
+    from utils.scan_utils import ScanUtils
+
+    paths = [entry.path for entry in ScanUtils.iter_images(root)]
+    sample = random.Random(1).sample(paths, min(len(paths), 1000))
+    manifest = CacheManifest()
+
+    def restore():
+        # 撤销上一次移动，保持目录树不变
+        batch_id = manifest.get_last_batch_id()
+        if batch_id:
+            CacheUtils.restore_entries(manifest.get_batch(batch_id))
+
+    def move():
+        CacheUtils.move_to_cache(sample, {p: i for i, p in enumerate(sample)})
+
+    runner.run(f'cache.move_to_cache[{label}]', move, len(sample), restore)
+    batch_id = manifest.get_last_batch_id()
+    entries = manifest.get_batch(batch_id)
+    runner.run(f'cache.restore[{label}]', lambda: CacheUtils.restore_entries(entries), len(entries), repeat=1)
+
+def bench_sort(runner: Runner, label: str, root: str):
+    from utils.image_catalog import ImageCatalog
+    from utils.scan_utils import ScanUtils
+
+    entries = list(ScanUtils.iter_images(root))
+    catalog = ImageCatalog()
+    for entry in entries:
+        catalog.add(entry.path, entry.size, entry.mtime)
+
+    # 与 ImageList.sort_by_column 相同，在数据模型上按原始数值排序
+    def sort_column(key):
+        def sort():
+            catalog.sort(key)
+        return sort
+
+    def load():
+        loaded = ImageCatalog()
+        for entry in entries:
+            loaded.add(entry.path, entry.size, entry.mtime)
+
+    runner.run(f'catalog.load[{label}]', load, len(entries))
+    runner.run(f'sort.size[{label}]', sort_column('size'), len(catalog))
+    runner.run(f'sort.name[{label}]', sort_column('name'), len(catalog))
+    runner.run(f'sort.mtime[{label}]', sort_column('mtime'), len(catalog))
+
+def bench_startup(runner: Runner, root: str):
+    from utils.scan_utils import ScanUtils
+
+    file_path = next(ScanUtils.iter_images(root)).path
+    main_script = os.path.join(SRC_DIR, 'main.py')
+
+    def tag_get():
+        subprocess.run([sys.executable, main_script, 'tag', '--no-daemon', 'get', file_path],
+                       cwd=os.environ['HOME'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    runner.run('startup.tag_get', tag_get, 1, repeat=max(runner.repeat, 5))
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """与基准比较，返回退化的测试"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'median' not in result or 'median' not in base or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        result['baseline'] = base['median']
+        result['ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def main():
+    args = parse_args()
+    sizes = [size.strip().lower() for size in args.sizes.split(',')]
+    for size in sizes:
+        if size not in SIZES:
+            sys.exit(f'未知的规模: {size}')
+    groups = [group.strip() for group in args.only.split(',')] if args.only else GROUPS
+
+    work_dir = os.path.abspath(args.work_dir)
+    home = os.path.join(work_dir, 'home')
+    os.makedirs(home, exist_ok=True)
+    # 配置在导入时读取主目录，先切换到独立的主目录，避免影响真实的标签和缓存
+    os.environ['HOME'] = home
+    sys.path.insert(0, SRC_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    from wechat_tree import generate_tree
+
+    runner = Runner(args.repeat)
+    for size in sizes:
+        print(f'准备 {size} 目录树...', file=sys.stderr)
+        root = generate_tree(os.path.join(work_dir, f'tree-{size}'), SIZES[size])
+        if 'scan' in groups:
+            bench_scan(runner, size, root)
+        if 'tags' in groups:
+            bench_tags(runner, size, root, work_dir)
+        if 'cache' in groups:
+            bench_cache(runner, size, root)
+        if 'sort' in groups:
+            bench_sort(runner, size, root)
+    if 'preview' in groups:
+        bench_preview(runner, work_dir)
+    if 'startup' in groups:
+        bench_startup(runner, generate_tree(os.path.join(work_dir, f'tree-{sizes[0]}'), SIZES[sizes[0]]))
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat
+        },
+        'results': runner.results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(runner.results, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+        for name in regressions:
+            result = runner.results[name]
+            print(f'退化: {name} {result["baseline"] * 1000:.2f} ms -> {result["median"] * 1000:.2f} ms '
+                  f'({result["ratio"]:.2f}x)', file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
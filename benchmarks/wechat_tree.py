@@ -0,0 +1,76 @@
+"""生成模拟微信图片目录的测试数据
+
+目录结构与微信的缓存目录一致：
+    <root>/<版本>/<账号哈希>/Message/MessageTemp/<会话哈希>/Image/<哈希>.pic.jpg
+每张图片都有一个对应的 .pic_thumb.jpg 缩略图。
+"""
+import hashlib
+import os
+import random
+import time
+
+# 最小的 JPEG 文件头，扫描只看扩展名和 stat 信息，不需要完整图片
+JPEG_STUB = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00\xff\xd9'
+
+# 生成完成后写入的标记文件，存在时直接复用
+MARKER = '.bench_tree_done'
+
+def _hex(rng: random.Random) -> str:
+    return hashlib.md5(str(rng.random()).encode()).hexdigest()
+
+def generate_tree(root: str, file_count: int, seed: int = 0) -> str:
+    """生成约 file_count 个文件的目录树（图片与缩略图各占一半）
+    参数:
+        root: 输出目录
+        file_count: 文件总数
+        seed: 随机种子，相同参数生成相同的目录树
+    返回:
+        str: 目录树的根目录
+    """
+    marker = os.path.join(root, MARKER)
+    if os.path.exists(marker):
+        return root
+
+    rng = random.Random(seed)
+    now = time.time()
+    pairs = file_count // 2
+    accounts = [_hex(rng) for _ in range(max(1, pairs // 50000))]
+    created = 0
+    while created < pairs:
+        account = rng.choice(accounts)
+        image_dir = os.path.join(root, '2.0b4.0.9', account, 'Message', 'MessageTemp', _hex(rng), 'Image')
+        os.makedirs(image_dir, exist_ok=True)
+        # 每个会话的图片数量差异较大
+        for _ in range(min(pairs - created, rng.choice((5, 20, 50, 200)))):
+            name = _hex(rng)
+            mtime = now - rng.random() * 365 * 86400
+            for suffix, size in (('.pic.jpg', rng.randint(20, 400)), ('.pic_thumb.jpg', rng.randint(2, 20))):
+                file_path = os.path.join(image_dir, name + suffix)
+                with open(file_path, 'wb') as f:
+                    f.write(JPEG_STUB)
+                    # 写入少量数据，使文件大小各不相同
+                    f.write(b'\0' * size)
+                os.utime(file_path, (mtime, mtime))
+            created += 1
+
+    with open(marker, 'w') as f:
+        f.write(str(pairs * 2))
+    return root
+
+def generate_images(root: str, count: int, size=(1920, 1080)) -> list:
+    """生成用于预览测试的真实 JPEG 图片，需要 Pillow
+    返回:
+        list: 图片路径列表
+    """
+    from PIL import Image
+
+    os.makedirs(root, exist_ok=True)
+    rng = random.Random(count)
+    paths = []
+    for i in range(count):
+        file_path = os.path.join(root, f'{i}.pic.jpg')
+        if not os.path.exists(file_path):
+            image = Image.new('RGB', size, (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+            image.save(file_path, quality=90)
+        paths.append(file_path)
+    return paths
@@ -1 +1,6 @@
 from .tag_command import setup_tag_parser, handle_tag_command
+from .restore_command import setup_restore_parser, handle_restore_command
+from .scan_command import setup_scan_parser, handle_scan_command
+from .delete_command import setup_delete_parser, handle_delete_command
+from .daemon_command import setup_daemon_parser, handle_daemon_command
+from .export_command import setup_export_parser, handle_export_command
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import time
+
+def setup_daemon_parser(subparsers):
+    """设置标签服务命令的解析器"""
+    daemon_parser = subparsers.add_parser('daemon', help='管理后台标签服务')
+    daemon_subparsers = daemon_parser.add_subparsers(dest='daemon_action', help='服务操作')
+
+    start_parser = daemon_subparsers.add_parser('start', help='启动标签服务')
+    start_parser.add_argument('--foreground', action='store_true', help='在前台运行')
+
+    daemon_subparsers.add_parser('stop', help='停止标签服务')
+    daemon_subparsers.add_parser('status', help='查看标签服务状态')
+
+def handle_daemon_command(args):
+    """处理标签服务命令"""
+    from config.config import Config
+    from utils.tag_daemon import TagDaemon, TagDaemonClient
+
+    if args.daemon_action == 'start':
+        client = TagDaemonClient.connect()
+        if client:
+            client.close()
+            print('标签服务已在运行')
+            return
+
+        if args.foreground:
+            TagDaemon().serve_forever()
+            return
+
+        # 以独立会话在后台启动，不随当前终端退出
+        main_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+        subprocess.Popen(
+            [sys.executable, main_script, 'daemon', 'start', '--foreground'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        for _ in range(50):
+            time.sleep(0.1)
+            client = TagDaemonClient.connect()
+            if client:
+                client.close()
+                print('标签服务已启动')
+                return
+        print('标签服务启动失败')
+
+    elif args.daemon_action == 'stop':
+        client = TagDaemonClient.connect()
+        if not client:
+            print('标签服务未运行')
+            return
+        client.shutdown()
+        client.close()
+        # 等待服务退出并删除套接字文件
+        for _ in range(50):
+            if not os.path.exists(Config.TAG_DAEMON_SOCKET):
+                print('标签服务已停止')
+                return
+            time.sleep(0.1)
+        print('标签服务未能及时退出')
+
+    elif args.daemon_action == 'status':
+        client = TagDaemonClient.connect()
+        if not client:
+            print('标签服务未运行')
+            return
+        try:
+            count = len(client.get_files_by_tag())
+        except OSError as e:
+            print(f'标签服务没有响应: {e}')
+            return
+        finally:
+            client.close()
+        print(f'标签服务运行中，已缓存 {count} 个标签')
+
+    else:
+        print('请指定服务操作: start, stop, status')
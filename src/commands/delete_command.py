@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+
+from config.config import Config
+from commands.scan_command import add_filter_arguments, dir_rules
+
+def setup_delete_parser(subparsers):
+    """设置删除命令的解析器"""
+    delete_parser = subparsers.add_parser('delete', help='按条件批量删除图片（默认移动到缓存）')
+    delete_parser.add_argument('folders', nargs='*', help='要扫描的文件夹')
+    delete_parser.add_argument('--color', choices=['1', '2', '3', '4', '5', '6', '7'],
+                               help='选择带此颜色标签的文件: 1=红色, 2=橙色, 3=黄色, 4=绿色, 5=蓝色, 6=紫色, 7=灰色')
+    delete_parser.add_argument('--stdin', action='store_true', help='从标准输入读取文件列表（每行一个）')
+    delete_parser.add_argument('-0', '--null', action='store_true', help='标准输入的文件列表以 NUL 分隔')
+    delete_parser.add_argument('--duplicates', action='store_true',
+                               help='只选择重复文件，每组保留最早的一个')
+    add_filter_arguments(delete_parser)
+    delete_parser.add_argument('--hard', action='store_true', help='直接删除，不移动到缓存')
+    delete_parser.add_argument('--dry-run', action='store_true', help='只列出将要删除的文件')
+    delete_parser.add_argument('--batch-size', type=int, default=Config.BATCH_PROCESS_SIZE,
+                               help=f'每批处理的文件数（默认 {Config.BATCH_PROCESS_SIZE}）')
+    delete_parser.add_argument('--workers', type=int, default=Config.MAX_WORKERS,
+                               help='并行处理的批次数')
+
+def _read_stdin_paths(null_separated: bool) -> list:
+    """从标准输入读取文件列表"""
+    data = sys.stdin.buffer.read()
+    separator = b'\0' if null_separated else b'\n'
+    return [os.fsdecode(item.rstrip(b'\r')) for item in data.split(separator) if item.strip()]
+
+def _collect_candidates(args) -> list:
+    """根据文件夹、标签和标准输入收集候选文件
+
+    多个条件同时指定时取交集：指定了文件夹时，标签和标准输入只用于筛选文件夹中的文件，
+    文件夹以外的文件不会被选中。
+    """
+    from utils.scan_utils import ScanUtils
+
+    filters = (args.min_size, args.max_size, args.newer_than, args.older_than)
+
+    # 标签和标准输入给出的文件，None 表示不按此条件筛选
+    selected = None
+    if args.color:
+        from utils.macos_utils import MacOSUtils
+        selected = list(dict.fromkeys(os.path.abspath(path) for path in MacOSUtils.get_files_by_tag(args.color)))
+    if args.stdin:
+        paths = list(dict.fromkeys(os.path.abspath(path) for path in _read_stdin_paths(args.null)))
+        if selected is None:
+            selected = paths
+        else:
+            wanted = set(paths)
+            selected = [path for path in selected if path in wanted]
+
+    if args.folders:
+        wanted = None if selected is None else set(selected)
+        candidates = {}
+        for folder in args.folders:
+            folder = os.path.abspath(folder)
+            exclude_dirs, include_dirs = dir_rules(args, folder)
+            for entry in ScanUtils.iter_images(folder, None, *filters,
+                                               exclude_dirs=exclude_dirs, include_dirs=include_dirs,
+                                               sniff=args.sniff):
+                if wanted is None or entry.path in wanted:
+                    candidates[entry.path] = entry
+        return list(candidates.values())
+
+    candidates = []
+    for path in selected or []:
+        entry = ScanUtils.entry_from_path(path)
+        if entry and ScanUtils.matches(entry, *filters):
+            candidates.append(entry)
+    return candidates
+
+def _process_batch(batch: list, hard: bool, batch_id: str = None) -> tuple:
+    """处理一批文件
+    参数:
+        batch_id: 删除批次ID，一次命令的全部文件共用，撤销时整批恢复
+    返回:
+        tuple: (成功的文件数, 失败的文件列表)
+    """
+    from utils.cache_utils import CacheUtils
+
+    if not hard:
+        moved = []
+        if CacheUtils.move_to_cache(batch, moved=moved, batch_id=batch_id):
+            return len(batch), []
+        # 整批失败时逐个重试未移动的文件，找出失败的文件；重试前已不存在的文件也算失败
+        moved = set(moved)
+        failed = [path for path in batch
+                  if path not in moved and (not os.path.exists(path)
+                                            or not CacheUtils.move_to_cache([path], batch_id=batch_id))]
+        return len(batch) - len(failed), failed
+
+    failed = []
+    for path in batch:
+        try:
+            os.remove(path)
+        except OSError:
+            failed.append(path)
+    return len(batch) - len(failed), failed
+
+def handle_delete_command(args):
+    """处理删除命令"""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.file_utils import FileUtils
+    from utils.scan_utils import ScanUtils
+
+    if not (args.folders or args.color or args.stdin):
+        print('错误: 请指定要扫描的文件夹、--color 或 --stdin')
+        return
+
+    start = time.perf_counter()
+    entries = _collect_candidates(args)
+
+    keep = set()
+    if args.duplicates:
+        from utils.duplicate_utils import DuplicateUtils
+        groups = DuplicateUtils.find_duplicate_groups(entries, args.workers)
+        keep = {group[0].path for group in groups}
+        entries = [entry for group in groups for entry in group[1:]]
+
+    # 收集关联文件（原图和缩略图一起处理），保留的文件不会被连带删除
+    sizes = {entry.path: entry.size for entry in entries}
+    files_to_delete = dict.fromkeys(sizes)
+    for entry in entries:
+        for related_file in FileUtils.find_related_files(entry.path):
+            if related_file not in keep and related_file not in files_to_delete:
+                related_entry = ScanUtils.entry_from_path(related_file)
+                if related_entry:
+                    files_to_delete[related_file] = None
+                    sizes[related_file] = related_entry.size
+    files_to_delete = list(files_to_delete)
+    total_size = sum(sizes.values())
+    select_time = time.perf_counter() - start
+
+    if args.dry_run:
+        for path in files_to_delete:
+            print(path)
+        print(f'将删除 {len(files_to_delete)} 个文件, {FileUtils.format_size(total_size)}（选择用时 {select_time:.2f} 秒）',
+              file=sys.stderr)
+        return
+
+    if not files_to_delete:
+        print('没有找到匹配的文件')
+        return
+
+    batch_size = max(1, args.batch_size)
+    batches = [files_to_delete[i:i + batch_size] for i in range(0, len(files_to_delete), batch_size)]
+
+    batch_id = None
+    if not args.hard:
+        # 在主线程中打开缓存清单，删除线程不会同时初始化
+        from utils.cache_manifest import CacheManifest
+        from utils.cache_utils import CacheUtils
+        CacheManifest()
+        # 各线程分块移动的文件记为同一个批次，restore --last 可以整体恢复
+        batch_id = CacheUtils.new_batch_id()
+
+    deleted_count = 0
+    failed = []
+    move_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        for count, batch_failed in executor.map(lambda batch: _process_batch(batch, args.hard, batch_id), batches):
+            deleted_count += count
+            failed.extend(batch_failed)
+    move_time = time.perf_counter() - move_start
+
+    for path in failed:
+        print(f'删除失败: {path}')
+    deleted_size = total_size - sum(sizes.get(path, 0) for path in failed)
+    action = '删除' if args.hard else '移动到缓存'
+    print(f'已{action} {deleted_count}/{len(files_to_delete)} 个文件, {FileUtils.format_size(deleted_size)}')
+    print(f'选择用时 {select_time:.2f} 秒, {action}用时 {move_time:.2f} 秒, '
+          f'{deleted_count / max(move_time, 1e-6):.0f} 个文件/秒, '
+          f'{FileUtils.format_size(deleted_size / max(move_time, 1e-6))}/秒')
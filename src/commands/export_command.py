@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+from config.config import Config
+from commands.scan_command import add_filter_arguments, dir_rules
+
+def setup_export_parser(subparsers):
+    """设置导出命令的解析器"""
+    export_parser = subparsers.add_parser('export-dat', help='把微信的 .dat 图片解码后导出为普通图片')
+    export_parser.add_argument('paths', nargs='+', help='要导出的 .dat 文件或包含它们的文件夹')
+    export_parser.add_argument('-o', '--output', required=True, help='导出到的文件夹')
+    export_parser.add_argument('--workers', type=int, default=Config.DAT_EXPORT_WORKERS,
+                               help=f'并行解码的进程数（默认 {Config.DAT_EXPORT_WORKERS}）')
+    add_filter_arguments(export_parser)
+
+def _collect_dat_files(args) -> list:
+    """收集要导出的 .dat 文件"""
+    from utils.scan_utils import ScanUtils
+    from utils.wechat_dat import WeChatDat
+
+    filters = (args.min_size, args.max_size, args.newer_than, args.older_than)
+    files = {}
+    for path in args.paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            exclude_dirs, include_dirs = dir_rules(args, path)
+            for entry in ScanUtils.iter_images(path, {WeChatDat.EXTENSION}, *filters,
+                                               exclude_dirs=exclude_dirs, include_dirs=include_dirs,
+                                               sniff=False):
+                files[entry.path] = None
+        else:
+            entry = ScanUtils.entry_from_path(path)
+            if entry and ScanUtils.matches(entry, *filters):
+                files[path] = None
+    return list(files)
+
+def handle_export_command(args):
+    """处理导出命令"""
+    from utils.wechat_dat import WeChatDat
+
+    start = time.perf_counter()
+    files = _collect_dat_files(args)
+    if not files:
+        print('没有找到 .dat 文件')
+        return
+
+    def progress(done: int, total: int):
+        if done % 500 == 0 or done == total:
+            print(f'\r已处理 {done}/{total}', end='', file=sys.stderr, flush=True)
+
+    exported, failed = WeChatDat.export(files, os.path.abspath(args.output), max(1, args.workers), progress)
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    for path in failed:
+        print(f'无法解码: {path}')
+    print(f'已导出 {len(exported)}/{len(files)} 个文件到 {args.output}, 用时 {elapsed:.2f} 秒, '
+          f'{len(exported) / max(elapsed, 1e-6):.0f} 个文件/秒')
@@ -0,0 +1,52 @@
+import os
+from datetime import datetime
+
+
+def setup_restore_parser(subparsers):
+    """设置恢复命令的解析器"""
+    restore_parser = subparsers.add_parser('restore', help='从缓存恢复已删除的文件')
+    group = restore_parser.add_mutually_exclusive_group()
+    group.add_argument('--list', action='store_true', help='列出缓存中的删除批次（默认）')
+    group.add_argument('--last', action='store_true', help='恢复最近一次删除')
+    group.add_argument('--batch', help='恢复指定批次')
+    group.add_argument('--path', help='恢复原路径为该文件或位于该目录下的文件')
+    group.add_argument('--all', action='store_true', help='恢复缓存中的全部文件')
+
+def handle_restore_command(args):
+    """处理恢复命令"""
+    from utils.cache_utils import CacheUtils
+    from utils.cache_manifest import CacheManifest
+    from utils.file_utils import FileUtils
+
+    manifest = CacheManifest()
+
+    if args.last:
+        batch_id = manifest.get_last_batch_id()
+        entries = manifest.get_batch(batch_id) if batch_id else []
+    elif args.batch:
+        entries = manifest.get_batch(args.batch)
+    elif args.path:
+        path = os.path.abspath(args.path)
+        entries = manifest.find_by_original(path)[:1] or manifest.find_by_prefix(path)
+    elif args.all:
+        entries = manifest.get_all_entries()
+    else:
+        # 列出删除批次
+        batches = manifest.list_batches()
+        if not batches:
+            print('缓存中没有可恢复的文件')
+            return
+        for batch_id, count, total_size, deleted_at in batches:
+            deleted_time = datetime.fromtimestamp(deleted_at).strftime('%Y-%m-%d %H:%M:%S')
+            print(f'{batch_id}  {deleted_time}  {count} 个文件  {FileUtils.format_size(total_size or 0)}')
+        return
+
+    if not entries:
+        print('没有找到匹配的缓存文件')
+        return
+
+    restored = CacheUtils.restore_entries(entries)
+    print(f'成功恢复 {len(restored)}/{len(entries)} 个文件')
+    for entry in entries:
+        if entry not in restored:
+            print(f'恢复失败: {entry["original_path"]}')
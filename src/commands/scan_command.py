@@ -0,0 +1,139 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+def parse_size(value: str) -> int:
+    """解析大小参数，例如 500K、2MB、1G"""
+    from utils.file_utils import FileUtils
+    try:
+        return FileUtils.parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_time(value: str) -> float:
+    """解析时间参数，支持天数（例如 30d）或日期（例如 2024-01-31）"""
+    from utils.file_utils import FileUtils
+    try:
+        return FileUtils.parse_time(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def add_filter_arguments(parser):
+    """添加大小和修改时间筛选参数"""
+    parser.add_argument('--min-size', type=parse_size, help='最小文件大小，例如 500K、2MB')
+    parser.add_argument('--max-size', type=parse_size, help='最大文件大小')
+    parser.add_argument('--newer-than', type=parse_time,
+                        help='只包含此时间之后修改的文件，例如 30d 或 2024-01-31')
+    parser.add_argument('--older-than', type=parse_time,
+                        help='只包含此时间之前修改的文件，例如 365d 或 2023-12-31')
+    parser.add_argument('--exclude-dir', action='append', metavar='PATTERN',
+                        help='不进入名称匹配此通配符的目录，可以多次指定（扫描微信图片文件夹时在设置中的排除规则之外）')
+    parser.add_argument('--include-dir', action='append', metavar='PATTERN',
+                        help='即使匹配排除规则也进入名称匹配此通配符的目录，可以多次指定')
+    parser.add_argument('--no-default-excludes', action='store_true',
+                        help='扫描微信图片文件夹时也不使用设置中的目录排除规则')
+    parser.add_argument('--sniff', action='store_true', default=None,
+                        help='按文件头识别没有图片扩展名的文件（默认使用设置中的选项）')
+
+def dir_rules(args, folder: str) -> tuple:
+    """根据命令行参数得到扫描 folder 时的 (排除规则, 包含规则)
+    设置中的排除规则只用于微信图片文件夹，参见 ScanUtils.default_exclude_dirs
+    """
+    from config.config import Config
+    from utils.scan_utils import ScanUtils
+    exclude_dirs = [] if args.no_default_excludes else ScanUtils.default_exclude_dirs(folder)
+    include_dirs = list(Config.SCAN_INCLUDE_DIRS)
+    exclude_dirs.extend(args.exclude_dir or [])
+    include_dirs.extend(args.include_dir or [])
+    return exclude_dirs, include_dirs
+
+def setup_scan_parser(subparsers):
+    """设置扫描命令的解析器"""
+    scan_parser = subparsers.add_parser('scan', help='扫描图片并输出报告（无需图形界面）')
+    scan_parser.add_argument('folders', nargs='+', help='要扫描的文件夹')
+    scan_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson',
+                             help='输出格式（默认 ndjson）')
+    scan_parser.add_argument('--report', choices=['files', 'dirs', 'both'], default='files',
+                             help='输出文件明细、按目录汇总或两者（默认 files）')
+    scan_parser.add_argument('-o', '--output', help='输出文件路径，默认输出到标准输出')
+    add_filter_arguments(scan_parser)
+
+class _ReportWriter:
+    """按格式逐行输出扫描结果"""
+    FIELDS = ['type', 'path', 'size', 'mtime', 'count']
+
+    def __init__(self, stream, fmt: str):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=self.FIELDS, extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, record: dict):
+        if self.fmt == 'csv':
+            self.writer.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False))
+            self.stream.write('\n')
+
+def handle_scan_command(args):
+    """处理扫描命令"""
+    # 扫描命令只依赖扫描引擎，不导入 tkinter 和 PIL，适合在 cron 中运行
+    from utils.scan_utils import ScanUtils
+
+    stream = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        writer = _ReportWriter(stream, args.format)
+        dir_totals = {}
+        total_count = 0
+        total_size = 0
+        stats = {}
+        start = time.perf_counter()
+
+        for folder in args.folders:
+            folder = os.path.abspath(folder)
+            exclude_dirs, include_dirs = dir_rules(args, folder)
+            for entry in ScanUtils.iter_images(
+                folder,
+                min_size=args.min_size,
+                max_size=args.max_size,
+                newer_than=args.newer_than,
+                older_than=args.older_than,
+                stats=stats,
+                exclude_dirs=exclude_dirs,
+                include_dirs=include_dirs,
+                sniff=args.sniff
+            ):
+                total_count += 1
+                total_size += entry.size
+
+                if args.report != 'files':
+                    totals = dir_totals.get(entry.dir)
+                    if totals is None:
+                        dir_totals[entry.dir] = [1, entry.size]
+                    else:
+                        totals[0] += 1
+                        totals[1] += entry.size
+
+                if args.report != 'dirs':
+                    writer.write({
+                        'type': 'file',
+                        'path': entry.path,
+                        'size': entry.size,
+                        'mtime': int(entry.mtime)
+                    })
+
+        for dir_path, (count, size) in sorted(dir_totals.items(), key=lambda item: item[1][1], reverse=True):
+            writer.write({'type': 'dir', 'path': dir_path, 'size': size, 'count': count})
+
+        stream.flush()
+        elapsed = time.perf_counter() - start
+        print(f'扫描完成: {total_count} 个图片, {total_size} 字节, '
+              f'检查了 {stats.get("files", 0)} 个文件 / {stats.get("dirs", 0)} 个目录, 用时 {elapsed:.2f} 秒',
+              file=sys.stderr)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
@@ -1,95 +1,175 @@
-import argparse
-import logging
+import glob
 import os
-from typing import List, Optional
-
 import sys
-import os
+from typing import List
 
-# 添加项目根目录到Python路径
-project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
+TAG_COLORS = ['1', '2', '3', '4', '5', '6', '7']
+TAG_HELP = '标签颜色: 1=红色, 2=橙色, 3=黄色, 4=绿色, 5=蓝色, 6=紫色, 7=灰色'
 
-from src.utils.macos_utils import MacOSUtils
+def _add_file_arguments(parser, metavar='FILE'):
+    """添加文件列表参数：多个路径、通配符、--from-file 或 - 表示标准输入"""
+    parser.add_argument('files', nargs='*', metavar=metavar,
+                        help='文件路径，支持通配符；- 表示从标准输入读取')
+    parser.add_argument('--from-file', help='从文件读取路径列表（每行一个）')
+    parser.add_argument('-0', '--null', action='store_true', help='路径列表以 NUL 分隔')
 
 def setup_tag_parser(subparsers):
     """设置标签命令的解析器"""
     tag_parser = subparsers.add_parser('tag', help='管理文件标签')
+    tag_parser.add_argument('--no-daemon', action='store_true', help='不使用后台标签服务，直接访问数据库')
     tag_subparsers = tag_parser.add_subparsers(dest='tag_action', help='标签操作')
     
-    # 设置标签
+    # 设置标签，兼容 "tag set FILE COLOR"，也可以用 --color 指定
     set_parser = tag_subparsers.add_parser('set', help='设置标签')
-    set_parser.add_argument('file', help='文件路径')
-    set_parser.add_argument('color', choices=['1', '2', '3', '4', '5', '6', '7'], 
-                          help='标签颜色: 1=红色, 2=橙色, 3=黄色, 4=绿色, 5=蓝色, 6=紫色, 7=灰色')
+    _add_file_arguments(set_parser, 'FILE... COLOR')
+    set_parser.add_argument('-c', '--color', choices=TAG_COLORS, help=TAG_HELP)
     
     # 移除标签
     remove_parser = tag_subparsers.add_parser('remove', help='移除标签')
-    remove_parser.add_argument('file', help='文件路径')
+    _add_file_arguments(remove_parser)
     
     # 获取标签
     get_parser = tag_subparsers.add_parser('get', help='获取标签')
-    get_parser.add_argument('file', help='文件路径')
+    _add_file_arguments(get_parser)
     
     # 列出带标签的文件
     list_parser = tag_subparsers.add_parser('list', help='列出带标签的文件')
-    list_parser.add_argument('--color', choices=['1', '2', '3', '4', '5', '6', '7'],
+    list_parser.add_argument('--color', choices=TAG_COLORS,
                            help='按颜色筛选: 1=红色, 2=橙色, 3=黄色, 4=绿色, 5=蓝色, 6=紫色, 7=灰色')
     
     # 清理失效的标签
     cleanup_parser = tag_subparsers.add_parser('cleanup', help='清理失效的标签')
+    
+    # 标签索引与 Finder 标签对账
+    reconcile_parser = tag_subparsers.add_parser('reconcile', help='标签索引与 Finder 标签对账')
+    reconcile_parser.add_argument('roots', nargs='+', metavar='ROOT', help='要对账的文件夹')
+    reconcile_parser.add_argument('--direction', choices=['to-finder', 'to-index'], default='to-finder',
+                                  help='to-finder: 以标签索引为准写入 Finder 标签；'
+                                       'to-index: 以 Finder 标签为准写入标签索引（默认 to-finder）')
+    reconcile_parser.add_argument('--full', action='store_true', help='检查全部文件，而不只是上次对账后变化的文件')
+    reconcile_parser.add_argument('--dry-run', action='store_true', help='只报告差异，不做修改')
+    reconcile_parser.add_argument('--report', help='把差异明细写入 JSON 报告文件')
+    reconcile_parser.add_argument('--workers', type=int, help='读写扩展属性的线程数')
+
+def _read_paths(stream, null_separated: bool) -> List[str]:
+    """从流中读取路径列表"""
+    data = stream.read()
+    separator = b'\0' if null_separated else b'\n'
+    return [os.fsdecode(item.rstrip(b'\r')) for item in data.split(separator) if item.strip()]
+
+def _expand_files(args) -> List[str]:
+    """展开命令行中的文件、通配符、--from-file 和标准输入，去重并保持顺序"""
+    items = []
+    for item in args.files:
+        if item == '-':
+            items.extend(_read_paths(sys.stdin.buffer, args.null))
+        elif glob.has_magic(item):
+            items.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            items.append(item)
+    if args.from_file:
+        with open(args.from_file, 'rb') as f:
+            items.extend(_read_paths(f, args.null))
+    return list(dict.fromkeys(os.path.abspath(item) for item in items))
+
+def _split_existing(file_paths: List[str]):
+    """区分存在和不存在的文件"""
+    existing = []
+    missing = []
+    for file_path in file_paths:
+        (existing if os.path.exists(file_path) else missing).append(file_path)
+    return existing, missing
+
+def _flush_finder_tags(tag_store):
+    """等待后台线程写完 Finder 标签再退出；通过标签服务写入时由服务负责同步"""
+    from utils.macos_utils import MacOSUtils
+    if tag_store is MacOSUtils or getattr(tag_store, 'failed', False):
+        from utils.finder_tags import FinderTagSync
+        FinderTagSync().flush()
 
 def handle_tag_command(args):
     """处理标签命令"""
-    if args.tag_action == 'set':
-        # 设置标签
-        file_path = os.path.abspath(args.file)
-        if not os.path.exists(file_path):
+    # 标签操作只需要标签索引，在执行时才导入
+    from config.config import Config
+    from utils.macos_utils import MacOSUtils
+
+    # 后台标签服务运行时通过服务读写，否则直接访问数据库
+    tag_store = MacOSUtils
+    if not args.no_daemon and os.path.exists(Config.TAG_DAEMON_SOCKET):
+        from utils.tag_daemon import TagDaemonClient
+        tag_store = TagDaemonClient.connect(fallback=True) or MacOSUtils
+
+    if args.tag_action in ('set', 'remove', 'get'):
+        if args.tag_action == 'set' and not args.color:
+            # 兼容旧用法：最后一个参数为颜色
+            if not args.files or args.files[-1] not in TAG_COLORS:
+                print(f'错误: 请指定标签颜色（{TAG_HELP}）')
+                return
+            args.color = args.files.pop()
+        
+        file_paths = _expand_files(args)
+        if not file_paths:
+            print('错误: 请指定文件')
+            return
+        existing, missing = _split_existing(file_paths)
+        for file_path in missing:
             print(f'错误: 文件不存在: {file_path}')
+        if not existing:
             return
-        
-        success = MacOSUtils.set_tag(file_path, args.color)
-        if success:
-            tag_info = MacOSUtils.TAGS[args.color]
+        single = len(file_paths) == 1
+
+    if args.tag_action == 'set':
+        # 设置标签，所有文件在一个事务中写入
+        success = tag_store.set_tags(existing, args.color)
+        _flush_finder_tags(tag_store)
+        tag_info = MacOSUtils.TAGS[args.color]
+        if not success:
+            print('设置标签失败')
+        elif single:
             print(f'成功设置{tag_info[0]}标签 {tag_info[1]}')
         else:
-            print('设置标签失败')
+            print(f'成功为 {len(existing)} 个文件设置{tag_info[0]}标签 {tag_info[1]}，'
+                  f'{len(missing)} 个文件不存在')
             
     elif args.tag_action == 'remove':
-        # 移除标签
-        file_path = os.path.abspath(args.file)
-        if not os.path.exists(file_path):
-            print(f'错误: 文件不存在: {file_path}')
-            return
-        
-        success = MacOSUtils.remove_tag(file_path)
-        if success:
+        # 移除标签，所有文件在一个事务中写入
+        success = tag_store.remove_tags(existing)
+        _flush_finder_tags(tag_store)
+        if not success:
+            print('移除标签失败')
+        elif single:
             print('成功移除标签')
         else:
-            print('移除标签失败')
+            print(f'成功移除 {len(existing)} 个文件的标签，{len(missing)} 个文件不存在')
             
     elif args.tag_action == 'get':
-        # 获取标签
-        file_path = os.path.abspath(args.file)
-        if not os.path.exists(file_path):
-            print(f'错误: 文件不存在: {file_path}')
-            return
-        
-        tag_info = MacOSUtils.get_tag(file_path)
-        if tag_info:
-            color_info = MacOSUtils.TAGS[tag_info['tag_key']]
-            print(f'文件标签: {color_info[0]} {color_info[1]}')
+        # 获取标签，一次查询所有文件
+        tags = tag_store.get_tags(existing)
+        if single:
+            tag_info = tags.get(existing[0])
+            if tag_info:
+                color_info = MacOSUtils.TAGS[tag_info['tag_key']]
+                print(f'文件标签: {color_info[0]} {color_info[1]}')
+            else:
+                print('文件没有标签')
         else:
-            print('文件没有标签')
+            for file_path in existing:
+                tag_info = tags.get(file_path)
+                if tag_info:
+                    color_info = MacOSUtils.TAGS[tag_info['tag_key']]
+                    print(f'{color_info[1]} {color_info[0]} {file_path}')
+                else:
+                    print(f'- {file_path}')
+            print(f'共 {len(existing)} 个文件，{len(tags)} 个有标签，{len(missing)} 个文件不存在')
             
     elif args.tag_action == 'list':
         # 列出带标签的文件
-        files = MacOSUtils.get_files_by_tag(args.color)
+        files = tag_store.get_files_by_tag(args.color)
         if files:
             print('带标签的文件:')
+            tags = tag_store.get_tags(files)
             for file in files:
-                tag_info = MacOSUtils.get_tag(file)
+                tag_info = tags.get(file)
                 if tag_info:
                     color_info = MacOSUtils.TAGS[tag_info['tag_key']]
                     print(f'{color_info[1]} {file}')
@@ -98,8 +178,25 @@ def handle_tag_command(args):
             
     elif args.tag_action == 'cleanup':
         # 清理失效的标签
-        count = MacOSUtils.cleanup_tags()
-        print(f'清理了 {count} 个失效的标签记录')
+        stats = {}
+        count = tag_store.cleanup_tags(stats)
+        print(f'清理了 {count} 个失效的标签记录，找回了 {stats.get("relinked", 0)} 个被移动文件的标签')
+    
+    elif args.tag_action == 'reconcile':
+        from utils.tag_reconcile import TagReconciler
+        reconciler = TagReconciler(tag_store, args.direction, args.dry_run, args.workers)
+        results = []
+        for root in args.roots:
+            result = reconciler.reconcile(root, args.full)
+            results.append(result)
+            mode = '增量' if result['incremental'] else '全量'
+            action = '发现' if args.dry_run else '修正'
+            print(f'{result["root"]}: {mode}检查 {result["checked"]} 个文件，{action} {result["changed"]} 个差异，'
+                  f'{result["errors"]} 个错误，用时 {result["elapsed"]:.2f} 秒')
+        if args.report:
+            reconciler.write_report(args.report, results)
+            print(f'报告已写入: {args.report}')
+        _flush_finder_tags(tag_store)
     
     else:
-        print('请指定标签操作: set, remove, get, list, cleanup')
+        print('请指定标签操作: set, remove, get, list, cleanup, reconcile')
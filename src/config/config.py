@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 class Config:
@@ -10,14 +11,36 @@ class Config:
     # UI设置
     PREVIEW_WIDTH = 600
     PREVIEW_HEIGHT = 600
+    PREVIEW_DECODE_SIZE = 2048  # 预览图解码后的最大边长，缩放在此基础上进行
+    PREVIEW_POLL_INTERVAL = 10  # 等待预览图解码完成的检查间隔（毫秒）
+    THUMB_SIZE = 128  # 缩略图网格中缩略图的最大边长
+    THUMB_CACHE_SIZE = 600  # 最多缓存的缩略图数，超出时丢弃最久没有显示的
     
     # 图片设置
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+    # 扫描微信图片文件夹时不进入的目录（目录名通配符，不区分大小写），微信的语音、视频和数据库目录中没有图片；
+    # 其他文件夹默认不排除任何目录。MessageTemp/*/File 中有图片，不能排除 File
+    SCAN_EXCLUDE_DIRS = ['Audio', 'Video', 'Voice', 'OpenData', '*.db']
+    # 即使匹配排除规则也要进入的目录
+    SCAN_INCLUDE_DIRS = []
+    # 按文件头识别扩展名不是图片的文件（微信经常保存为没有扩展名或扩展名不对的文件）
+    SCAN_SNIFF = False
+    SNIFF_EXTENSIONS = {'', '.dat', '.tmp', '.bin'}  # 需要识别的扩展名，'' 表示没有扩展名
     
     # 微信文件夹设置
     WECHAT_BASE_PATH = os.path.expanduser(
         "~/Library/Containers/com.tencent.xinWeChat/Data/Library/Application Support/com.tencent.xinWeChat"
     )
+    # 查找微信图片文件夹的位置：旧版 macOS 微信、4.x 的 xwechat_files、Windows 的 WeChat Files
+    WECHAT_BASE_PATHS = [
+        WECHAT_BASE_PATH,
+        os.path.expanduser("~/Library/Containers/com.tencent.xinWeChat/Data/Documents/xwechat_files"),
+        os.path.expanduser("~/Documents/xwechat_files"),
+        os.path.expanduser("~/Documents/WeChat Files")
+    ]
+    # 账号目录下的图片文件夹，按顺序取第一个存在的
+    WECHAT_LAYOUTS = ['Message', 'MessageTemp', os.path.join('msg', 'attach'), os.path.join('FileStorage', 'Image')]
+    WECHAT_FOLDER_CACHE = {}  # 查找结果缓存，保存在设置文件中，按目录修改时间判断是否失效
     
     # 列设置
     COLUMNS = [
@@ -25,6 +48,7 @@ class Config:
         ("文件名", 200),
         ("大小", 100),
         ("修改时间", 150),
+        ("账号", 100),
         ("路径", 400)
     ]
     
@@ -40,13 +64,62 @@ class Config:
 - 5: 蓝色标签
 - 6: 紫色标签
 - 7: 灰色标签
-- 0: 清除标签"""
+- 0: 清除标签
+- Ctrl+Z: 撤销删除
+- G: 切换缩略图网格（Shift/Ctrl+单击多选，双击查看大图）
+- Ctrl+F: 筛选（例如 size:>2MB date:2023 tag:red dup）
+- Esc: 清除筛选和目录选择
+- F12: 显示/隐藏性能统计
+- Shift+F12: 导出性能统计"""
 
     # 缓存设置
     CACHE_DIR = os.path.join(str(Path.home()), '.fastDeleteImg', 'cache')
-    CACHE_THRESHOLD = 2  # 缓存文件数达到此阈值时提示清理
+    CACHE_MANIFEST = os.path.join(CACHE_DIR, 'manifest.db')  # 缓存清单，记录原始路径、大小和删除时间
+    SCAN_SNAPSHOT = os.path.join(str(Path.home()), '.fastDeleteImg', 'scan_snapshot.db')  # 文件头识别结果
+    CACHE_MAX_SIZE_MB = 2048  # 缓存总大小上限，超出时从最早删除的文件开始清理，0 表示不限制
+    CACHE_MAX_AGE_DAYS = 30  # 缓存文件保存天数，0 表示不限制
+    CACHE_PURGE_BATCH_SIZE = 100  # 后台清理每批删除的文件数
+    CACHE_PURGE_INTERVAL = 0.05  # 后台清理每批之间的间隔（秒）
+    CACHE_RECOVER_AFTER = 3600  # 超过此时间（秒）仍为 pending 的清单记录视为中断遗留，其他进程可能正在移动较新的记录
+    
+    # 标签服务设置
+    TAG_DAEMON_SOCKET = os.path.join(str(Path.home()), '.fastDeleteImg', 'tagd.sock')
+    TAG_DAEMON_TIMEOUT = 30  # 秒
+    TAG_DAEMON_LONG_TIMEOUT = 600  # cleanup 等需要遍历文件的请求的超时（秒）
+    TAG_DAEMON_CHUNK_SIZE = 1000  # 每个请求携带的路径数
+    
+    # Finder 标签同步设置
+    FINDER_TAG_SYNC = sys.platform == 'darwin'  # 是否把标签写入 Finder 扩展属性
+    FINDER_TAG_BACKEND = 'auto'  # auto, darwin, linux, memory, none
+    FINDER_TAG_BATCH_SIZE = 200  # 后台线程每批写入的文件数
+    RECONCILE_BATCH_SIZE = 2000  # 标签对账每批比较的文件数
+    
+    # 日志设置
+    LOG_FILE = os.path.join(str(Path.home()), '.fastDeleteImg', 'app.log')
+    LOG_MAX_BYTES = 5 * 1024 * 1024  # 单个日志文件大小上限
+    LOG_BACKUP_COUNT = 3  # 保留的旧日志文件数
+    LOG_LEVEL = 'INFO'  # 默认日志级别
+    LOG_CONSOLE_LEVEL = 'WARNING'  # 控制台只输出警告和错误，详细日志见日志文件
+    LOG_MODULE_LEVELS = {}  # 各模块的日志级别，例如 {'utils.tag_index': 'DEBUG'}
+    LOG_RATE_LIMIT_BURST = 20  # 同类调试日志每个时间窗口最多输出的条数
+    LOG_RATE_LIMIT_INTERVAL = 10  # 时间窗口（秒）
+    
+    # 性能统计设置
+    PERF_ENABLED = os.environ.get('FASTDELETEIMG_PERF') == '1'  # 启动时是否开启性能统计
+    PERF_OVERLAY_INTERVAL = 1000  # 状态栏性能信息刷新间隔（毫秒）
     
     # 线程设置
     MAX_WORKERS = os.cpu_count()
+    SCAN_WORKERS = 8  # 同时扫描多个目录时共用的线程数
+    SNIFF_WORKERS = 4  # 读取文件头的线程数
+    SNIFF_BATCH_SIZE = 256  # 每次提交给读取线程的文件数
+    DAT_EXPORT_WORKERS = os.cpu_count() or 1  # 导出 .dat 图片时并行解码的进程数
+    DECODE_WORKERS = os.cpu_count() or 1  # 解码预览图、缩略图和计算哈希的进程数
+    THUMB_WORKERS = DECODE_WORKERS  # 向解码进程提交缩略图的线程数
+    THUMB_BATCH_SIZE = 32  # 每次刷新最多转换的缩略图数，避免阻塞界面
     UI_UPDATE_INTERVAL = 50  # 毫秒
-    BATCH_PROCESS_SIZE = 50  # 每批处理的文件数
+    QUERY_DELAY = 200  # 筛选条件输入停顿多久后执行查询（毫秒）
+    FOLDER_REFRESH_INTERVAL = 500  # 扫描时目录汇总面板的刷新间隔（毫秒）
+    BATCH_PROCESS_SIZE = 5000  # 每批处理的文件数（只加入数据模型，不逐行插入列表）
+    SCAN_TAG_BATCH_SIZE = 500  # 扫描时每次批量查询标签的文件数，目录变化时也会提前查询
+    RELINK_CHUNK_SIZE = 5000  # 扫描时每积累多少个未标记的文件查找一次被移动文件的标签
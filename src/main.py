@@ -1,4 +1,3 @@
-import tkinter as tk
 import sys
 import logging
 import os
@@ -10,43 +9,71 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
-from ui.app import FastImageDeleter
 from commands import setup_tag_parser, handle_tag_command
-
-def setup_logging():
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log'),
-            logging.StreamHandler()
-        ]
-    )
+from commands import setup_restore_parser, handle_restore_command
+from commands import setup_scan_parser, handle_scan_command
+from commands import setup_delete_parser, handle_delete_command
+from commands import setup_daemon_parser, handle_daemon_command
+from commands import setup_export_parser, handle_export_command
 
 def main():
     """主函数"""
-    # 设置日志
-    setup_logging()
+    # 设置日志，写入 ~/.fastDeleteImg/app.log
+    from utils.log_utils import LogUtils
+    LogUtils.setup()
     
     # 创建命令行解析器
     parser = argparse.ArgumentParser(description='Fast Delete Image - 快速删除和管理图片')
+    parser.add_argument('--perf-dump', metavar='FILE', help='开启性能统计，退出时把各阶段耗时写入 JSON 文件')
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
     
     # 添加标签命令
     setup_tag_parser(subparsers)
     
+    # 添加恢复命令
+    setup_restore_parser(subparsers)
+    
+    # 添加扫描命令
+    setup_scan_parser(subparsers)
+    
+    # 添加删除命令
+    setup_delete_parser(subparsers)
+    
+    # 添加标签服务命令
+    setup_daemon_parser(subparsers)
+    
+    # 添加导出命令
+    setup_export_parser(subparsers)
+    
     # 添加GUI命令
     gui_parser = subparsers.add_parser('gui', help='启动图形界面')
     
     # 解析命令行参数
     args = parser.parse_args()
     
+    if args.perf_dump:
+        from utils.perf import Perf
+        Perf.set_enabled(True)
+    
     try:
         # 处理命令
         if args.command == 'tag':
             handle_tag_command(args)
+        elif args.command == 'restore':
+            handle_restore_command(args)
+        elif args.command == 'scan':
+            handle_scan_command(args)
+        elif args.command == 'delete':
+            handle_delete_command(args)
+        elif args.command == 'daemon':
+            handle_daemon_command(args)
+        elif args.command == 'export-dat':
+            handle_export_command(args)
         elif args.command == 'gui' or not args.command:
+            # 仅在启动图形界面时导入，命令行模式不需要 tkinter 和 PIL
+            import tkinter as tk
+            from ui.app import FastImageDeleter
+            
             # 创建主窗口
             root = tk.Tk()
             app = FastImageDeleter(root)
@@ -54,8 +81,11 @@ def main():
         else:
             parser.print_help()
     except Exception as e:
-        logging.error(f"应用程序出错：{str(e)}", exc_info=True)
+        logging.error("应用程序出错：%s", e, exc_info=True)
         raise
+    finally:
+        if args.perf_dump:
+            Perf.dump(args.perf_dump)
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import logging
 import os
+import sys
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Set, List, Optional
+from datetime import datetime
+from typing import List, Optional
 
 from config.config import Config
 from utils.file_utils import FileUtils
-from utils.image_utils import ImageUtils
+from utils.scan_utils import ScanUtils
+from utils.image_catalog import ImageCatalog
+from utils.catalog_query import CatalogQuery, CatalogIndex
+from utils.folder_tree import FolderTree
+from utils.wechat_discovery import WeChatDiscovery
+from utils.thumbnail_loader import ThumbnailLoader
+from utils.decode_service import DecodeService
 from utils.cache_utils import CacheUtils
+from utils.cache_purger import CachePurger
 from utils.settings_utils import SettingsUtils
 from utils.macos_utils import MacOSUtils
-from ui.components import ToolBar, ImageList, StatusBar, PreviewPanel
+from utils.perf import Perf
+from ui.components import ToolBar, QueryBar, ImageList, FolderPane, StatusBar, PreviewPanel, ThumbnailGrid
 from ui.dialogs import SettingsDialog
 
+logger = logging.getLogger(__name__)
+
 class FastImageDeleter:
     def __init__(self, root: tk.Tk):
         self.root = root
@@ -30,17 +44,37 @@ class FastImageDeleter:
         """设置窗口属性"""
         self.root.title(Config.APP_TITLE)
         self.root.geometry(f"{Config.APP_WIDTH}x{Config.APP_HEIGHT}")
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
     
     def setup_variables(self):
         """初始化变量"""
-        self.marked_items: Set[str] = set()
-        self.image_files: List[str] = []
-        self.scan_results: List[dict] = []
+        self.catalog = ImageCatalog()
+        self.catalog_index = CatalogIndex(self.catalog)
+        self.query: Optional[CatalogQuery] = None
+        self.folders = FolderTree()
+        self.folder_filter: Optional[str] = None
+        self.folders_refreshed_at = 0.0
+        self.scan_results: List[tuple] = []
+        self.scan_progress = {'processed': 0, 'total': 0, 'labels': [], 'roots': []}
+        self.scan_roots: List[str] = []
         self.current_image: Optional[tk.PhotoImage] = None
         self.current_image_tk: Optional[tk.PhotoImage] = None
+        self.perf_overlay_visible = False
+        self.grid_visible = False
+        
+        # 预览图和缩略图在解码进程中生成，启动时预先创建进程
+        self.decode_service = DecodeService()
+        self.decode_service.warm_up()
+        self.preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preview')
+        self.preview_future = None
+        self.preview_path: Optional[str] = None  # 需要预览的图片
+        self.preview_future_path: Optional[str] = None  # 正在解码的图片
         
         # 创建缓存目录
         os.makedirs(Config.CACHE_DIR, exist_ok=True)
+        
+        # 启动时按保留策略清理一次缓存
+        CachePurger().request_purge()
     
     def create_ui(self):
         """创建UI组件"""
@@ -63,6 +97,15 @@ class FastImageDeleter:
         self.paned_window.add(self.left_frame, weight=1)
         self.paned_window.add(self.right_frame, weight=1)
         
+        # 目录汇总面板放在最左侧
+        self.folder_frame = ttk.Frame(self.paned_window)
+        self.paned_window.insert(0, self.folder_frame, weight=0)
+        self.folder_pane = FolderPane(
+            self.folder_frame,
+            self.folders,
+            self.on_folder_select
+        )
+        
         # 创建工具栏
         self.toolbar = ToolBar(
             self.left_frame,
@@ -71,14 +114,10 @@ class FastImageDeleter:
             self.show_settings
         )
         self.toolbar.select_all_btn.configure(
-            command=lambda: self.image_list.tree.selection_set(
-                self.image_list.tree.get_children()
-            )
+            command=lambda: self.image_list.select_all()
         )
         self.toolbar.deselect_btn.configure(
-            command=lambda: self.image_list.tree.selection_remove(
-                self.image_list.tree.get_children()
-            )
+            command=lambda: self.image_list.clear_selection()
         )
         
         # 创建路径标签
@@ -90,17 +129,32 @@ class FastImageDeleter:
         )
         self.path_label.pack(pady=5)
         
+        # 创建筛选栏
+        self.query_bar = QueryBar(
+            self.left_frame,
+            self.apply_query,
+            Config.QUERY_DELAY
+        )
+        
         # 创建图片列表
         self.image_list = ImageList(
             self.left_frame,
             Config.COLUMNS,
-            self.on_select
+            self.on_select,
+            self.catalog
         )
         
         # 创建底部按钮
         self.button_frame = ttk.Frame(self.left_frame)
         self.button_frame.pack(fill=tk.X, pady=10)
         
+        self.view_btn = ttk.Button(
+            self.button_frame,
+            text="缩略图网格",
+            command=self.toggle_grid
+        )
+        self.view_btn.pack(side=tk.LEFT, padx=5)
+        
         self.delete_btn = ttk.Button(
             self.button_frame,
             text="删除选中图片",
@@ -117,6 +171,18 @@ class FastImageDeleter:
             self.right_frame,
             Config.SHORTCUTS_TEXT
         )
+        
+        # 创建缩略图网格（与预览面板切换显示）
+        self.thumbnail_grid = ThumbnailGrid(
+            self.right_frame,
+            self.catalog,
+            self.image_list,
+            ThumbnailLoader(Config.THUMB_SIZE, decode=self.decode_service.thumbnail),
+            self.show_in_preview,
+            Config.THUMB_CACHE_SIZE,
+            Config.THUMB_BATCH_SIZE,
+            Config.UI_UPDATE_INTERVAL
+        )
     
     def bind_events(self):
         """绑定事件"""
@@ -127,8 +193,11 @@ class FastImageDeleter:
         # 导航快捷键
         self.root.bind('<Left>', self.prev_image)
         self.root.bind('<Right>', self.next_image)
-        self.root.bind('<Up>', self.prev_image)    # 增加上下方向键
-        self.root.bind('<Down>', self.next_image)
+        self.root.bind('<Up>', self.prev_row)    # 增加上下方向键
+        self.root.bind('<Down>', self.next_row)
+        
+        # 切换缩略图网格
+        self.root.bind('g', lambda e: self.toggle_grid())
         
         # 标记快捷键
         self.root.bind('<space>', self.toggle_mark)    # 空格键标记/取消标记
@@ -141,6 +210,49 @@ class FastImageDeleter:
         self.root.bind('6', lambda e: self.set_mark('6'))   # 紫色
         self.root.bind('7', lambda e: self.set_mark('7'))   # 灰色
         self.root.bind('0', lambda e: self.set_mark('0'))   # 清除标签
+        
+        # 撤销删除快捷键
+        self.root.bind('<Control-z>', lambda e: self.undo_delete())
+        if sys.platform == 'darwin':
+            self.root.bind('<Command-z>', lambda e: self.undo_delete())
+        
+        # 筛选快捷键
+        self.root.bind('<Control-f>', lambda e: self.query_bar.focus_entry())
+        if sys.platform == 'darwin':
+            self.root.bind('<Command-f>', lambda e: self.query_bar.focus_entry())
+        self.root.bind('<Escape>', lambda e: self.clear_filters())
+        
+        # 性能统计快捷键
+        self.root.bind('<F12>', self.toggle_perf_overlay)
+        self.root.bind('<Shift-F12>', self.dump_perf)
+    
+    def toggle_perf_overlay(self, event=None):
+        """显示或隐藏状态栏中的性能统计，显示时开启统计"""
+        self.perf_overlay_visible = not self.perf_overlay_visible
+        if self.perf_overlay_visible:
+            Perf.set_enabled(True)
+            self.refresh_perf_overlay()
+        self.status_bar.show_perf(self.perf_overlay_visible)
+    
+    def refresh_perf_overlay(self):
+        """定时刷新性能统计"""
+        if not self.perf_overlay_visible:
+            return
+        self.status_bar.perf_var.set(Perf.summary())
+        self.root.after(Config.PERF_OVERLAY_INTERVAL, self.refresh_perf_overlay)
+    
+    def dump_perf(self, event=None):
+        """导出性能统计到 JSON 文件"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出性能统计",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+            initialfile=f"perf-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        if not file_path:
+            return
+        if not Perf.dump(file_path):
+            messagebox.showerror("错误", "导出性能统计失败，详情请查看日志")
     
     def select_folder(self):
         """选择文件夹"""
@@ -150,18 +262,58 @@ class FastImageDeleter:
     
     def scan_folder(self, folder_path: str):
         """扫描文件夹"""
-        self.path_var.set(f"选中文件夹: {folder_path}")
+        self.scan_folders([folder_path])
+    
+    def scan_folders(self, folder_paths: List[str]):
+        """扫描一个或多个文件夹，结果合并到同一个列表中"""
+        if len(folder_paths) == 1:
+            self.path_var.set(f"选中文件夹: {folder_paths[0]}")
+        else:
+            self.path_var.set(f"选中 {len(folder_paths)} 个文件夹: " + "、".join(folder_paths))
         self.status_bar.status_var.set("正在扫描文件...")
-        self.image_list.tree.delete(*self.image_list.tree.get_children())
-        self.image_files.clear()
+        self.status_bar.detail_var.set("")
+        self.catalog.clear()
+        self.scan_roots = [os.path.abspath(folder_path) for folder_path in folder_paths]
+        
+        # 每个文件夹一个简短名称，显示在“账号”列和进度中
+        labels = []
+        for folder_path in folder_paths:
+            label = FileUtils.folder_label(folder_path)
+            if label in labels:
+                label = f"{label}({labels.count(label) + 1})"
+            labels.append(label)
+            self.catalog.add_root(label)
+        self.query = None
+        self.query_bar.query_var.set('')
+        self.query_bar.result_var.set('')
+        self.image_list.reset()
+        self.folders.clear()
+        for folder_path in folder_paths:
+            self.folders.add_root(folder_path)
+        self.folder_filter = None
+        self.folder_pane.reset()
         self.scan_results.clear()
+        self.scan_progress = {
+            'processed': 0,
+            'total': 0,
+            'labels': labels,
+            'roots': [{} for _ in folder_paths]
+        }
         self.delete_btn.configure(state=tk.DISABLED)
         self.toolbar.select_btn.configure(state=tk.DISABLED)
         
+        # 流式扫描无法预知总数，进度条使用不确定模式
+        self.status_bar.progress_var.set(0)
+        self.status_bar.progress.configure(mode='indeterminate')
+        self.status_bar.progress.start()
+        
+        # 扫描期间暂停缓存清理，避免争抢磁盘 I/O
+        CachePurger().pause()
+        
         # 在新线程中扫描文件
         thread = threading.Thread(
             target=self.scan_images,
-            args=(folder_path,)
+            args=(folder_paths,)
         )
         thread.daemon = True
         thread.start()
@@ -169,39 +321,70 @@ class FastImageDeleter:
         # 启动UI更新
         self.root.after(Config.UI_UPDATE_INTERVAL, self.update_ui)
     
-    def scan_images(self, folder_path: str):
+    def iter_scan(self, folder_paths: List[str], progress: dict):
+        """逐个产出 (文件夹下标, 扫描条目)，多个文件夹并发扫描"""
+        if len(folder_paths) == 1:
+            stats = {}
+            for entry in ScanUtils.iter_images(folder_paths[0], stats=stats):
+                progress['total'] = stats['files']
+                yield 0, entry
+            return
+        
+        root_stats = progress['roots']
+        for index, entries in ScanUtils.iter_images_multi(folder_paths, stats=root_stats):
+            progress['total'] = sum(stats['files'] for stats in root_stats)
+            for entry in entries:
+                yield index, entry
+    
+    @Perf.timed('scan.total')
+    def scan_images(self, folder_paths: List[str]):
         """扫描图片文件"""
-        files_to_scan = []
-        for root, _, files in os.walk(folder_path):
-            files_to_scan.extend((root, f) for f in files)
-
-        total_files = len(files_to_scan)
-        processed_files = 0
-
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            for root, file in files_to_scan:
-                if any(file.lower().endswith(ext) for ext in Config.IMAGE_EXTENSIONS):
-                    file_path = os.path.join(root, file)
-                    file_info = FileUtils.get_file_info(file_path)
-                    
-                    if file_info:
-                        processed_files += 1
-                        progress = (processed_files / total_files) * 100
-                        
-                        # 获取已有的标签
-                        tag_info = MacOSUtils._get_tag_index().get_tag(file_path)
-                        mark_symbol = '★' if tag_info else ''
-                        
-                        self.scan_results.append({
-                            **file_info,
-                            'mark': mark_symbol,
-                            'progress': progress,
-                            'processed': processed_files,
-                            'total': total_files
-                        })
-
-        # 标记扫描完成
-        self.scan_results.append({'finished': True})
+        progress = self.scan_progress
+        error = None
+        try:
+            tag_index = MacOSUtils._get_tag_index()
+            untagged = []
+            pending = []
+            
+            def relink():
+                # 没有标签的文件可能是从别处移动过来的，找回原来的标签；
+                # 分块处理，避免扫描大目录时保留所有未标记的条目
+                moved = tag_index.relink_moved(untagged)
+                if moved:
+                    self.scan_results.append(('relinked', set(moved.values()), None, None))
+                untagged.clear()
+            
+            def flush():
+                # 同一目录的一批文件一次查询标签
+                with Perf.span('scan.tag_lookup'):
+                    tags = tag_index.get_tags([entry.path for _, entry in pending])
+                for root, entry in pending:
+                    tagged = entry.path in tags
+                    if not tagged:
+                        untagged.append(entry)
+                    # 只传递扫描条目本身，显示用的字符串在行可见时才生成
+                    self.scan_results.append(('entry', entry, tagged, root))
+                progress['processed'] += len(pending)
+                pending.clear()
+                if len(untagged) >= Config.RELINK_CHUNK_SIZE:
+                    relink()
+            
+            for root, entry in self.iter_scan(folder_paths, progress):
+                if pending and (entry.dir != pending[-1][1].dir or len(pending) >= Config.SCAN_TAG_BATCH_SIZE):
+                    flush()
+                pending.append((root, entry))
+            if pending:
+                flush()
+            if untagged:
+                relink()
+        except Exception as e:
+            logger.error('Error scanning %s: %s', folder_paths, e, exc_info=True)
+            error = str(e)
+        finally:
+            # 与 scan_folders 中的暂停成对，即使界面丢弃了本次扫描的结果也会恢复缓存清理
+            CachePurger().resume()
+            # 无论是否出错都标记扫描完成，界面据此恢复按钮状态
+            self.scan_results.append(('finished', error, None, None))
     
     def update_ui(self):
         """更新UI显示"""
@@ -209,103 +392,242 @@ class FastImageDeleter:
             self.root.after(Config.UI_UPDATE_INTERVAL, self.update_ui)
             return
             
-        # 批量处理结果
+        # 批量处理结果，整批加入数据模型后只刷新一次可见区域
         items_to_process = min(Config.BATCH_PROCESS_SIZE, len(self.scan_results))
-        for _ in range(items_to_process):
-            result = self.scan_results.pop(0)
-            
-            if 'finished' in result:
-                self.status_bar.status_var.set(
-                    f"扫描完成，共找到 {len(self.image_files)} 个图片文件"
-                )
-                if self.image_files:
-                    self.delete_btn.configure(state=tk.NORMAL)
-                self.toolbar.select_btn.configure(state=tk.NORMAL)
-                return
+        batch = self.scan_results[:items_to_process]
+        del self.scan_results[:items_to_process]
+        was_empty = len(self.catalog) == 0
+        finished = False
+        error = None
+        with Perf.span('ui.update_batch'):
+            for kind, value, marked, root in batch:
+                if kind == 'finished':
+                    finished = True
+                    error = value
+                    break
                 
-            self.status_bar.progress_var.set(result['progress'])
-            self.status_bar.status_var.set(
-                f"已处理: {result['processed']}/{result['total']}"
-            )
-            
-            self.image_files.append(result['path'])
-            item = self.image_list.tree.insert(
-                "",
-                tk.END,
-                values=(result['mark'], result['file'], result['size_str'],
-                       result['mod_time'], result['path'])
-            )
+                if kind == 'relinked':
+                    # 更新找回标签的文件的标记
+                    for row in self.catalog.find_many(value).values():
+                        self.catalog.set_marked(row, True)
+                    self.catalog_index.invalidate_tags()
+                    continue
+                
+                self.catalog.add(value.path, value.size, value.mtime, marked, root=root)
+                self.folders.add(value.dir, value.size)
             
-            # 如果有标签，添加到标记集合
-            if result['mark']:
-                self.marked_items.add(item)
+            with Perf.span('ui.tree_refresh'):
+                self.image_list.refresh()
             
-            # 如果是第一个项目，自动选中并预览
-            if len(self.image_files) == 1:
-                self.image_list.tree.selection_set(item)
-                self.image_list.tree.focus(item)
-                self.image_list.tree.see(item)
-                self.on_select(None)
+            # 目录面板按固定间隔刷新，扫描结束时按大小重新排列
+            now = time.monotonic()
+            if finished or now - self.folders_refreshed_at >= Config.FOLDER_REFRESH_INTERVAL / 1000:
+                self.folders_refreshed_at = now
+                with Perf.span('ui.folder_refresh'):
+                    self.folder_pane.refresh()
+                    if finished:
+                        self.folder_pane.resort()
+        
+        self.status_bar.status_var.set(
+            f"已找到: {self.scan_progress['processed']}，已检查: {self.scan_progress['total']}"
+        )
+        if len(self.scan_progress['roots']) > 1:
+            self.show_root_progress()
+        if self.query:
+            self.show_query_result()
+        
+        # 如果是第一批项目，自动选中第一个并预览
+        if was_empty and len(self.catalog):
+            self.image_list.select_position(0)
+        
+        if finished:
+            self.status_bar.progress.stop()
+            self.status_bar.progress.configure(mode='determinate')
+            self.status_bar.progress_var.set(100)
+            if error:
+                self.status_bar.status_var.set(
+                    f"扫描出错，已找到 {self.catalog.alive_count} 个图片文件: {error}"
+                )
+            else:
+                self.status_bar.status_var.set(
+                    f"扫描完成，共找到 {self.catalog.alive_count} 个图片文件"
+                )
+            if len(self.catalog):
+                self.delete_btn.configure(state=tk.NORMAL)
+            self.toolbar.select_btn.configure(state=tk.NORMAL)
+            return
         
         self.root.after(Config.UI_UPDATE_INTERVAL, self.update_ui)
     
+    def show_root_progress(self):
+        """在状态栏中显示每个文件夹的扫描进度"""
+        parts = []
+        for label, stats in zip(self.scan_progress['labels'], self.scan_progress['roots']):
+            state = "✓" if stats.get('done') else "…"
+            parts.append(f"{label}: {stats.get('found', 0)}{state}")
+        self.status_bar.detail_var.set(" | ".join(parts))
+    
+    def apply_query(self, text: str):
+        """按筛选栏中的条件筛选列表"""
+        try:
+            query = CatalogQuery.parse(text)
+        except ValueError as e:
+            self.query_bar.result_var.set(str(e))
+            return
+        query.folder_root = self.folder_filter
+        
+        if query.is_empty and self.query is None:
+            self.query_bar.result_var.set('')
+            return
+        
+        if query.is_empty:
+            self.query = None
+            self.catalog.set_filter(None)
+            self.query_bar.result_var.set('')
+        else:
+            self.query = query
+            if query.duplicates_only and self.catalog_index.find_duplicates(self.decode_service.executor):
+                # 重复文件在后台查找，完成后重新筛选
+                self.root.after(Config.UI_UPDATE_INTERVAL, self.wait_duplicates)
+            self.catalog.set_filter(self.catalog_index.predicate(query))
+            self.show_query_result()
+        
+        # 当前图片仍在结果中时保持选中，否则选中第一个
+        position = self.image_list.current_position()
+        if position is not None:
+            self.image_list.select_position(position, notify=False)
+        elif len(self.catalog):
+            self.image_list.select_position(0)
+        else:
+            self.image_list.reset()
+    
+    def on_folder_select(self, folder: Optional[str]):
+        """在目录面板中选择目录时，只显示该目录中的文件"""
+        self.folder_filter = folder
+        self.apply_query(self.query_bar.query_var.get())
+    
+    def clear_filters(self):
+        """清除筛选条件和目录选择"""
+        self.folder_filter = None
+        self.folder_pane.clear_selection()
+        self.query_bar.clear()
+    
+    def wait_duplicates(self):
+        """等待后台的重复文件查找完成"""
+        if self.catalog_index.duplicates_running:
+            self.root.after(Config.UI_UPDATE_INTERVAL * 4, self.wait_duplicates)
+            return
+        if self.query and self.query.duplicates_only:
+            self.apply_query(self.query_bar.query_var.get())
+    
+    def show_query_result(self):
+        """显示筛选结果的数量"""
+        if self.query.duplicates_only and self.catalog_index.duplicates_running:
+            self.query_bar.result_var.set("正在查找重复文件...")
+        else:
+            self.query_bar.result_var.set(f"{len(self.catalog)} / {self.catalog.alive_count}")
+    
+    @Perf.timed('ui.on_select')
     def on_select(self, event):
         """处理选择事件"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
+        selected_rows = self.image_list.selected_rows()
+        if not selected_rows:
+            return
+        
+        # 显示缩略图网格时只需要让当前图片可见，不加载大图
+        if self.grid_visible:
+            position = self.image_list.current_position()
+            if position is not None:
+                self.thumbnail_grid.see(position)
+            self.thumbnail_grid.schedule_refresh()
             return
             
-        item = selected_items[0]
-        values = self.image_list.tree.item(item)['values']
-        file_path = values[4]  # 完整路径在第五列
-        
-        # 加载和显示图片
-        result = ImageUtils.load_and_resize_image(
-            file_path,
-            Config.PREVIEW_WIDTH,
-            Config.PREVIEW_HEIGHT
+        # 在后台解码，界面线程不等待；快速切换时只解码最后选中的图片
+        self.preview_path = self.catalog.path(selected_rows[0])
+        if self.preview_future is None:
+            self.start_preview()
+    
+    def start_preview(self):
+        """开始解码需要预览的图片"""
+        self.preview_future_path = self.preview_path
+        self.preview_future = self.preview_executor.submit(
+            self.decode_service.decode,
+            self.preview_path,
+            Config.PREVIEW_DECODE_SIZE,
+            Config.PREVIEW_DECODE_SIZE
         )
+        self.root.after(Config.PREVIEW_POLL_INTERVAL, self.show_preview)
+    
+    def show_preview(self):
+        """预览图解码完成后显示"""
+        if not self.preview_future.done():
+            self.root.after(Config.PREVIEW_POLL_INTERVAL, self.show_preview)
+            return
+        future = self.preview_future
+        self.preview_future = None
         
-        if result:
-            original_image, _ = result
-            self.preview_panel.set_image(original_image)
+        # 解码期间选中了其他图片，改为解码最新的
+        if self.preview_path != self.preview_future_path:
+            self.start_preview()
+            return
+        
+        try:
+            image = future.result()
+        except Exception as e:
+            logger.error('Error decoding preview: %s', e)
+            image = None
+        
+        if image is not None:
+            self.preview_panel.set_image(image)
         else:
             self.preview_panel.set_image(None)
             messagebox.showerror("错误", "无法加载图片")
     
     def set_mark(self, tag_key: str, event=None):
         """设置标记"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
+        selected_rows = self.image_list.selected_rows()
+        if not selected_rows:
             return
-            
-        item = selected_items[0]
-        values = self.image_list.tree.item(item)['values']
-        file_path = values[4]  # 完整路径在第五列
         
-        # 设置 macOS 标签
-        if MacOSUtils.set_tag(file_path, tag_key):
-            # 更新列表显示
-            mark_symbol = '★' if tag_key != '0' else ''
-            if mark_symbol:
-                self.marked_items.add(item)
+        # 选中多张图片时（例如在缩略图网格中多选）一起设置，不自动移动
+        if len(selected_rows) > 1:
+            file_paths = [self.catalog.path(row) for row in selected_rows]
+            if tag_key == '0':
+                success = MacOSUtils.remove_tags(file_paths)
             else:
-                self.marked_items.discard(item)
+                success = MacOSUtils.set_tags(file_paths, tag_key)
+            if success:
+                for row in selected_rows:
+                    self.catalog.set_marked(row, tag_key != '0')
+                self.catalog_index.invalidate_tags()
+                self.image_list.refresh()
+            return
             
-            self.image_list.tree.item(item, values=(mark_symbol,) + tuple(values[1:]))
+        row = selected_rows[0]
+        file_path = self.catalog.path(row)
+        
+        # 设置 macOS 标签，0 表示清除标签
+        if tag_key == '0':
+            success = MacOSUtils.remove_tag(file_path)
+        else:
+            success = MacOSUtils.set_tag(file_path, tag_key)
+        
+        if success:
+            # 更新列表显示
+            self.catalog.set_marked(row, tag_key != '0')
+            self.catalog_index.invalidate_tags()
+            self.image_list.refresh()
             
             # 自动移动到下一张图片
             self.next_image()
     
     def toggle_mark(self, event=None):
         """切换标记状态"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
+        selected_rows = self.image_list.selected_rows()
+        if not selected_rows:
             return
             
-        item = selected_items[0]
-        values = self.image_list.tree.item(item)['values']
-        file_path = values[4]  # 完整路径在第五列
+        file_path = self.catalog.path(selected_rows[0])
         
         # 获取当前标签
         current_tag = MacOSUtils.get_tag(file_path)
@@ -317,103 +639,153 @@ class FastImageDeleter:
     
     def prev_image(self, event=None):
         """显示上一张图片"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
-            return
-            
-        current_item = selected_items[0]
-        prev_item = self.image_list.tree.prev(current_item)
-        
-        if prev_item:
-            self.image_list.tree.selection_set(prev_item)
-            self.image_list.tree.see(prev_item)
+        self.image_list.move_selection(-1)
     
     def next_image(self, event=None):
         """显示下一张图片"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
-            return
-            
-        current_item = selected_items[0]
-        next_item = self.image_list.tree.next(current_item)
-        
-        if next_item:
-            self.image_list.tree.selection_set(next_item)
-            self.image_list.tree.see(next_item)
+        self.image_list.move_selection(1)
+    
+    def row_step(self) -> int:
+        """上下方向键移动的图片数，缩略图网格中为一行的图片数"""
+        return self.thumbnail_grid.columns if self.grid_visible else 1
+    
+    def prev_row(self, event=None):
+        """显示上一行图片"""
+        self.image_list.move_selection(-self.row_step())
+    
+    def next_row(self, event=None):
+        """显示下一行图片"""
+        self.image_list.move_selection(self.row_step())
+    
+    def toggle_grid(self):
+        """在预览面板和缩略图网格之间切换"""
+        if self.grid_visible:
+            self.grid_visible = False
+            self.thumbnail_grid.hide()
+            self.preview_panel.pack(fill=tk.BOTH, expand=True)
+            self.view_btn.configure(text="缩略图网格")
+            self.on_select(None)
+        else:
+            self.grid_visible = True
+            self.preview_panel.pack_forget()
+            self.thumbnail_grid.show()
+            self.view_btn.configure(text="单张预览")
+    
+    def show_in_preview(self, position: int):
+        """在缩略图网格中双击时切换到预览面板查看该图片"""
+        self.image_list.select_position(position, notify=False)
+        self.toggle_grid()
     
     def delete_selected(self):
         """删除选中的图片（移动到缓存）"""
-        selected_items = self.image_list.tree.selection()
-        if not selected_items:
+        selected_rows = self.image_list.selected_rows()
+        if not selected_rows:
             messagebox.showwarning("警告", "请先选择要删除的图片")
             return
         
-        # 在删除前找到下一个项目
-        next_item = None
-        for item in selected_items:
-            next_item = self.image_list.tree.next(item)
-            if next_item not in selected_items:  # 确保下一个项目不是要删除的
-                break
-            next_item = None
-        
-        # 如果没有找到下一个，尝试使用上一个
-        if not next_item:
-            for item in selected_items:
-                prev_item = self.image_list.tree.prev(item)
-                if prev_item and prev_item not in selected_items:
-                    next_item = prev_item
-                    break
-        
         # 收集要删除的文件和其关联文件
         files_to_delete = set()
-        items_to_delete = set()
+        rows_to_delete = set()
+        related_files = set()
         
-        for item in selected_items:
-            values = self.image_list.tree.item(item)['values']
-            file_path = values[4]  # 完整路径在第五列
+        for row in selected_rows:
+            file_path = self.catalog.path(row)
             files_to_delete.add(file_path)
-            items_to_delete.add(item)
+            rows_to_delete.add(row)
             
             # 查找关联文件
-            related_files = FileUtils.find_related_files(file_path)
-            for related_file in related_files:
-                files_to_delete.add(related_file)
-                # 查找关联文件对应的列表项
-                for child in self.image_list.tree.get_children():
-                    if self.image_list.tree.item(child)['values'][4] == related_file:
-                        items_to_delete.add(child)
-                        break
-        
-        # 移动文件到缓存
-        if CacheUtils.move_to_cache(list(files_to_delete)):
-            # 从列表中删除项目
-            for item in items_to_delete:
-                self.image_list.tree.delete(item)
+            related_files.update(FileUtils.find_related_files(file_path))
+        
+        # 查找关联文件对应的行
+        files_to_delete.update(related_files)
+        rows_to_delete.update(self.catalog.find_many(related_files).values())
+        
+        # 文件在列表中的位置，撤销时插回原处
+        row_positions = self.catalog.view_positions(rows_to_delete)
+        positions = {self.catalog.path(row): position for row, position in row_positions.items()}
+        # 删除后选中原来第一个被删除项目所在位置的项目，即下一个未删除的项目
+        next_position = min(row_positions.values()) if row_positions else 0
+        
+        # 移动文件到缓存，本次删除的全部文件（包括关联文件）为一个批次，撤销时整批恢复
+        if CacheUtils.move_to_cache(list(files_to_delete), positions, batch_id=CacheUtils.new_batch_id()):
+            # 从列表和目录汇总中删除项目
+            self.catalog.remove(rows_to_delete)
+            for row in rows_to_delete:
+                self.folders.add(self.catalog.dir(row), -self.catalog.size(row), -1)
+            self.folder_pane.refresh()
             
             self.status_bar.status_var.set(f"已移动 {len(files_to_delete)} 个文件到缓存")
+            if self.query:
+                self.show_query_result()
             
-            # 检查缓存阈值
-            CacheUtils.check_cache_threshold()
+            # 按保留策略在后台清理缓存
+            CachePurger().request_purge()
             
-            # 如果有下一个项目，选中并预览
-            if next_item and next_item not in items_to_delete:
-                self.image_list.tree.selection_set(next_item)
-                self.image_list.tree.focus(next_item)
-                self.image_list.tree.see(next_item)
-                self.on_select(None)
-            elif next_item in items_to_delete:
-                # 如果下一个项目也被删除了，尝试找到一个未被删除的项目
-                for item in self.image_list.tree.get_children():
-                    if item not in items_to_delete:
-                        self.image_list.tree.selection_set(item)
-                        self.image_list.tree.focus(item)
-                        self.image_list.tree.see(item)
-                        self.on_select(None)
-                        break
-            
-            # 如果列表为空，禁用删除按钮
-            if not self.image_list.tree.get_children():
+            # 如果还有项目，选中并预览
+            if len(self.catalog):
+                self.image_list.select_position(next_position)
+            else:
+                # 如果列表为空，禁用删除按钮
+                self.image_list.reset()
                 self.delete_btn.configure(state=tk.DISABLED)
+        else:
+            messagebox.showerror("错误", "移动文件到缓存失败，详情请查看日志")
+    
+    def undo_delete(self):
+        """撤销最近一次删除，将文件移回原位置并插回列表"""
+        restored = CacheUtils.undo_last_delete()
+        if not restored:
+            self.status_bar.status_var.set("没有可撤销的删除")
+            return
+        
+        first_row = None
+        # 最近一次删除可能来自其他文件夹或命令行，只把当前扫描的文件夹下的文件插回列表
+        prefixes = tuple(os.path.join(root, '') for root in self.scan_roots)
+        entries = [entry for entry in restored
+                   if entry['position'] is not None and entry['original_path'].startswith(prefixes)]
+        # 一次扫描文件名列找出全部行，批量读取标签
+        paths = [entry['original_path'] for entry in entries]
+        rows = self.catalog.find_many(paths, include_deleted=True)
+        tags = MacOSUtils.get_tags(paths)
+        # 记录按原位置升序排列，依次插入即可还原顺序
+        for entry in entries:
+            file_path = entry['original_path']
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            
+            tag_info = tags.get(file_path)
+            row = rows.get(file_path)
+            if row is not None and self.catalog.is_deleted(row):
+                self.catalog.revive(row, entry['position'], st.st_size, st.st_mtime)
+                self.folders.add(self.catalog.dir(row), st.st_size)
+            elif row is None:
+                # 不是本次扫描中删除的文件，作为新行插回原位置
+                row = self.catalog.add(file_path, st.st_size, st.st_mtime, position=entry['position'])
+                self.folders.add(self.catalog.dir(row), st.st_size)
+            self.catalog.set_marked(row, bool(tag_info))
+            if first_row is None:
+                first_row = row
+        
+        self.folder_pane.refresh()
+        # 恢复的文件大小、修改时间和标签可能已经变化
+        self.catalog_index.invalidate_values()
+        self.catalog_index.invalidate_tags()
+        self.status_bar.status_var.set(f"已恢复 {len(restored)} 个文件")
+        if self.query:
+            self.show_query_result()
+        
+        if first_row is not None:
+            self.delete_btn.configure(state=tk.NORMAL)
+            self.image_list.select_row(first_row)
+    
+    def on_close(self):
+        """关闭窗口：停止缩略图和预览解码，结束解码进程并释放共享内存"""
+        self.thumbnail_grid.loader.close()
+        self.preview_executor.shutdown(wait=False, cancel_futures=True)
+        self.decode_service.close()
+        self.root.destroy()
     
     def show_settings(self):
         """显示设置对话框"""
@@ -421,7 +793,7 @@ class FastImageDeleter:
     
     def open_wechat_folder(self):
         """打开微信图片文件夹"""
-        message_folders = FileUtils.find_wechat_folders(Config.WECHAT_BASE_PATH)
+        message_folders = WeChatDiscovery.find_folders()
         
         if not message_folders:
             messagebox.showerror(
@@ -436,8 +808,8 @@ class FastImageDeleter:
             dialog.title("选择微信文件夹")
             dialog.geometry("600x400")
             
-            # 创建列表框
-            listbox = tk.Listbox(dialog, selectmode=tk.SINGLE)
+            # 创建列表框，可以选择多个文件夹一起扫描
+            listbox = tk.Listbox(dialog, selectmode=tk.EXTENDED)
             listbox.pack(fill=tk.BOTH, expand=True)
             
             # 添加滚动条
@@ -456,12 +828,18 @@ class FastImageDeleter:
             def on_select():
                 selection = listbox.curselection()
                 if selection:
-                    selected_path = message_folders[selection[0]]
                     dialog.destroy()
-                    self.scan_folder(selected_path)
+                    self.scan_folders([message_folders[index] for index in selection])
+            
+            def on_scan_all():
+                dialog.destroy()
+                self.scan_folders(message_folders)
             
-            # 确认按钮
-            ttk.Button(dialog, text="确认", command=on_select).pack(pady=10)
+            # 确认按钮和全部扫描按钮
+            button_frame = ttk.Frame(dialog)
+            button_frame.pack(pady=10)
+            ttk.Button(button_frame, text="确认", command=on_select).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame, text="全部扫描", command=on_scan_all).pack(side=tk.LEFT, padx=5)
             
             return
         
@@ -1,7 +1,12 @@
+import os
+import sys
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import ttk
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Set, Tuple
 from PIL import Image, ImageTk
+from utils.file_utils import FileUtils
+from utils.perf import Perf
 
 class ToolBar(ttk.Frame):
     def __init__(self, parent, select_cmd: Callable, wechat_cmd: Callable, settings_cmd: Callable):
@@ -39,21 +44,96 @@ class ToolBar(ttk.Frame):
         self.deselect_btn = ttk.Button(self, text="取消选择")
         self.deselect_btn.pack(side=tk.LEFT, padx=5)
 
+class QueryBar(ttk.Frame):
+    """筛选栏，输入停顿后回调查询文本"""
+    
+    def __init__(self, parent, on_change: Callable[[str], None], delay: int):
+        super().__init__(parent)
+        self.pack(fill=tk.X)
+        
+        self.on_change = on_change
+        self.delay = delay
+        self._pending = None
+        
+        ttk.Label(self, text="筛选:").pack(side=tk.LEFT)
+        
+        # 查询输入框
+        self.query_var = tk.StringVar()
+        self.entry = ttk.Entry(self, textvariable=self.query_var)
+        self.entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        # 输入时不触发窗口上的快捷键（数字键设置标签、退格键删除图片等）
+        toplevel = str(self.winfo_toplevel())
+        self.entry.bindtags(tuple(tag for tag in self.entry.bindtags() if tag != toplevel))
+        self.entry.bind('<Escape>', lambda e: self.clear())
+        self.entry.bind('<Return>', lambda e: self._fire())
+        self.query_var.trace_add('write', lambda *args: self._schedule())
+        
+        # 清除按钮
+        self.clear_btn = ttk.Button(self, text="清除", command=self.clear)
+        self.clear_btn.pack(side=tk.LEFT)
+        
+        # 结果数量或错误信息
+        self.result_var = tk.StringVar()
+        self.result_label = ttk.Label(self, textvariable=self.result_var)
+        self.result_label.pack(side=tk.LEFT, padx=5)
+    
+    def _schedule(self):
+        """输入停顿 delay 毫秒后再查询，连续输入时只查询一次"""
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(self.delay, self._fire)
+    
+    def _fire(self):
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+            self._pending = None
+        self.on_change(self.query_var.get())
+    
+    def focus_entry(self):
+        self.entry.focus_set()
+        self.entry.select_range(0, tk.END)
+    
+    def clear(self):
+        """清除筛选条件，焦点回到窗口以便使用快捷键"""
+        self.query_var.set('')
+        self._fire()
+        self.winfo_toplevel().focus_set()
+
 class ImageList(ttk.Frame):
-    def __init__(self, parent, columns: List[Tuple[str, int]], on_select: Callable):
+    """虚拟化的图片列表
+
+    数据保存在 ImageCatalog 中，Treeview 只包含一屏的行，滚动时复用这些行并填入可见部分的内容，
+    所以列表中有几十万个文件时插入、排序和滚动的开销也只与可见行数有关。
+    """
+    DEFAULT_ROW_HEIGHT = 20
+    
+    def __init__(self, parent, columns: List[Tuple[str, int]], on_select: Callable, catalog):
         super().__init__(parent)
         self.pack(fill=tk.BOTH, expand=True, pady=10)
         
+        self.catalog = catalog
+        self.on_select_callback = on_select
+        self.columns = [col[0] for col in columns]
+        
         # 初始化排序状态
         self.sort_column = None  # 当前排序的列
         self.sort_reverse = False  # 是否降序
         
+        # 可见区域状态
+        self.offset = 0  # 第一可见行在视图中的位置
+        self.page_size = 1  # 一屏能显示的行数
+        self.selected: Set[int] = set()  # 选中的行号
+        self.anchor: Optional[int] = None  # 当前行号（预览的图片）
+        self._synced_selection: Tuple[str, ...] = ()
+        self._extend_selection = False  # 本次点击是否按住了 Shift/Ctrl
+        self.refresh_callbacks: List[Callable[[], None]] = []  # 刷新后调用，缩略图网格据此同步
+        
         # 创建列表视图
         self.tree = ttk.Treeview(
             self,
-            columns=[col[0] for col in columns],
+            columns=self.columns,
             show="headings",
-            selectmode="browse"
+            selectmode="extended"
         )
         
         # 设置列标题和列宽
@@ -66,20 +146,203 @@ class ImageList(ttk.Frame):
             )
             self.tree.column(col, width=width)
         
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(
+        # 添加滚动条，滚动由列表自己管理
+        self.scrollbar = ttk.Scrollbar(
             self,
             orient=tk.VERTICAL,
-            command=self.tree.yview
+            command=self.on_scroll
         )
-        self.tree.configure(yscrollcommand=scrollbar.set)
         
         # 放置列表和滚动条
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 绑定事件
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<ButtonPress-1>', self.on_click, add='+')
+        self.tree.bind('<Configure>', lambda e: self.refresh())
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)  # Windows/macOS
+        self.tree.bind('<Button-4>', self.on_mousewheel)    # Linux上滚
+        self.tree.bind('<Button-5>', self.on_mousewheel)    # Linux下滚
+        # 上下方向键由窗口统一处理，阻止 Treeview 在一屏内自行移动
+        self.tree.bind('<Up>', lambda e: self._move_and_break(-1))
+        self.tree.bind('<Down>', lambda e: self._move_and_break(1))
+        self.tree.bind('<Prior>', lambda e: self._move_and_break(-self.page_size))
+        self.tree.bind('<Next>', lambda e: self._move_and_break(self.page_size))
+    
+    def reset(self):
+        """清空列表状态（数据由调用方清空）"""
+        self.offset = 0
+        self.selected.clear()
+        self.anchor = None
+        self.refresh()
+    
+    def _measure_page_size(self) -> int:
+        """根据控件高度计算一屏能完整显示的行数"""
+        height = self.tree.winfo_height()
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if bbox:
+            top, row_height = bbox[1], bbox[3]
+        else:
+            top, row_height = self.DEFAULT_ROW_HEIGHT + 5, self.DEFAULT_ROW_HEIGHT
+        return max(1, (height - top) // max(1, row_height))
+    
+    def refresh(self):
+        """用当前可见区域的行刷新 Treeview"""
+        self.page_size = self._measure_page_size()
+        total = len(self.catalog)
+        self.offset = max(0, min(self.offset, total - self.page_size))
+        visible = min(self.page_size, total - self.offset)
         
-        # 绑定选择事件
-        self.tree.bind('<<TreeviewSelect>>', on_select)
+        # 复用已有的行，只增删差额
+        children = self.tree.get_children()
+        if len(children) > visible:
+            self.tree.delete(*children[visible:])
+        for slot in range(len(children), visible):
+            self.tree.insert("", tk.END, iid=f"r{slot}")
+        
+        selection = []
+        for slot in range(visible):
+            row = self.catalog.view_row(self.offset + slot)
+            iid = f"r{slot}"
+            self.tree.item(iid, values=self.catalog.display_row(row))
+            if row in self.selected:
+                selection.append(iid)
+        
+        # 同步选中状态，记录下来以忽略由此产生的选择事件
+        self._synced_selection = tuple(selection)
+        if tuple(self.tree.selection()) != self._synced_selection:
+            self.tree.selection_set(selection)
+        
+        # 更新滚动条
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + visible) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        
+        for callback in self.refresh_callbacks:
+            callback()
+    
+    def on_scroll(self, *args):
+        """处理滚动条拖动和点击"""
+        total = len(self.catalog)
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.page_size
+            self.offset += step
+        self.refresh()
+    
+    def on_mousewheel(self, event):
+        """处理滚轮事件"""
+        if event.num == 4 or event.delta > 0:
+            self.offset -= 3
+        else:
+            self.offset += 3
+        self.refresh()
+        return 'break'
+    
+    def on_click(self, event):
+        """记录点击时的修饰键，决定是否保留可见区域外的选中行"""
+        modifiers = 0x0001 | 0x0004  # Shift、Control
+        if sys.platform == 'darwin':
+            modifiers |= 0x0008  # Command
+        self._extend_selection = bool(event.state & modifiers)
+    
+    def on_tree_select(self, event):
+        """用户在可见区域中点选时，更新选中的行"""
+        selection = tuple(self.tree.selection())
+        if selection == self._synced_selection:
+            return
+        self._synced_selection = selection
+        rows = []
+        for iid in selection:
+            position = self.offset + int(iid[1:])
+            if position < len(self.catalog):
+                rows.append(self.catalog.view_row(position))
+        
+        # 按住 Shift/Ctrl 多选时，可见区域外已选中的行保持选中
+        if self._extend_selection:
+            visible_rows = {self.catalog.view_row(self.offset + int(iid[1:])) for iid in self.tree.get_children()}
+            self.selected = {row for row in self.selected if row not in visible_rows}
+            self.selected.update(rows)
+        else:
+            self.selected = set(rows)
+        if rows and self.anchor not in rows:
+            self.anchor = rows[0]
+        elif not self.selected:
+            self.anchor = None
+        self.on_select_callback(event)
+    
+    def selected_rows(self) -> List[int]:
+        """选中的行号，当前行在最前面"""
+        positions = self.catalog.view_positions(self.selected)
+        rows = sorted(positions, key=positions.get)
+        if self.anchor in self.selected:
+            rows.remove(self.anchor)
+            rows.insert(0, self.anchor)
+        return rows
+    
+    def current_position(self) -> Optional[int]:
+        """当前行在视图中的位置"""
+        if self.anchor is None:
+            return None
+        return self.catalog.view_position(self.anchor)
+    
+    def see(self, position: int):
+        """滚动使视图中的指定位置可见"""
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.page_size:
+            self.offset = position - self.page_size + 1
+    
+    def select_position(self, position: int, notify: bool = True):
+        """选中视图中指定位置的行并滚动到可见处"""
+        total = len(self.catalog)
+        if not total:
+            self.selected.clear()
+            self.anchor = None
+            self.refresh()
+            return
+        position = max(0, min(position, total - 1))
+        self.anchor = self.catalog.view_row(position)
+        self.selected = {self.anchor}
+        self.see(position)
+        self.refresh()
+        if notify:
+            self.on_select_callback(None)
+    
+    def select_row(self, row: int, notify: bool = True):
+        """选中指定的行"""
+        position = self.catalog.view_position(row)
+        if position is not None:
+            self.select_position(position, notify)
+    
+    def move_selection(self, delta: int):
+        """把当前行上下移动 delta 行"""
+        position = self.current_position()
+        if position is None:
+            return
+        new_position = max(0, min(position + delta, len(self.catalog) - 1))
+        if new_position != position:
+            self.select_position(new_position)
+    
+    def _move_and_break(self, delta: int):
+        self.move_selection(delta)
+        return 'break'
+    
+    def select_all(self):
+        """全选"""
+        self.selected = set(self.catalog.view)
+        self.refresh()
+    
+    def clear_selection(self):
+        """取消选择"""
+        self.selected.clear()
+        self.refresh()
     
     def sort_by_column(self, column):
         """按列排序"""
@@ -90,35 +353,142 @@ class ImageList(ttk.Frame):
             self.sort_column = column
             self.sort_reverse = False
         
-        # 获取所有项目
-        items = [(self.tree.set(item, column), item) for item in self.tree.get_children('')]
-        
-        # 根据列类型进行排序
-        if column == "大小":  # 大小列需要特殊处理
-            # 将大小字符串转换为字节数
-            def get_size_in_bytes(size_str):
-                units = {'B': 1, 'KB': 1024, 'MB': 1024*1024, 'GB': 1024*1024*1024, 'TB': 1024*1024*1024*1024}
-                try:
-                    size, unit = size_str.strip().split()
-                    return float(size) * units[unit]
-                except:
-                    return 0
-            
-            items.sort(key=lambda x: get_size_in_bytes(x[0]), reverse=self.sort_reverse)
-        else:
-            # 其他列正常排序
-            items.sort(reverse=self.sort_reverse)
+        # 在数据模型上按原始数值排序，不需要解析显示字符串
+        key = self.catalog.COLUMN_KEYS[self.columns.index(column)]
+        with Perf.span('ui.sort'):
+            self.catalog.sort(key, self.sort_reverse)
         
-        # 重新排列项目
-        for index, (_, item) in enumerate(items):
-            self.tree.move(item, '', index)
+        # 排序后保持当前行可见
+        position = self.current_position()
+        if position is not None:
+            self.offset = max(0, position - self.page_size // 2)
+        self.refresh()
         
         # 更新列标题显示排序方向
-        for col in self.tree['columns']:
-            self.tree.heading(col, text=col.strip('▲▼'))
+        for col in self.columns:
+            self.tree.heading(col, text=col)
         new_text = column + (' ▼' if self.sort_reverse else ' ▲')
         self.tree.heading(column, text=new_text)
 
+class FolderPane(ttk.Frame):
+    """目录汇总面板
+
+    显示每个目录的文件数和总大小，子目录在展开时才插入；扫描过程中只刷新发生变化且已显示的节点。
+    """
+    PLACEHOLDER = '\n'  # 未展开节点下的占位子项 iid 后缀
+    
+    def __init__(self, parent, folders, on_select: Callable[[Optional[str]], None]):
+        super().__init__(parent)
+        self.pack(fill=tk.BOTH, expand=True)
+        
+        self.folders = folders
+        self.on_select_callback = on_select
+        self._populated: Set[str] = {''}  # 已插入子节点的节点，'' 为顶层
+        self._clearing = False
+        
+        # 创建目录树
+        self.tree = ttk.Treeview(
+            self,
+            columns=('count', 'size'),
+            show="tree headings",
+            selectmode="browse"
+        )
+        self.tree.heading('#0', text="目录")
+        self.tree.heading('count', text="文件数")
+        self.tree.heading('size', text="大小")
+        self.tree.column('#0', width=220)
+        self.tree.column('count', width=70, anchor=tk.E)
+        self.tree.column('size', width=90, anchor=tk.E)
+        
+        # 添加滚动条
+        scrollbar = ttk.Scrollbar(
+            self,
+            orient=tk.VERTICAL,
+            command=self.tree.yview
+        )
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        # 放置目录树和滚动条
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 绑定事件
+        self.tree.bind('<<TreeviewOpen>>', self.on_open)
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+    
+    def reset(self):
+        """清空目录树（数据由调用方清空）"""
+        self.clear_selection()
+        self.tree.delete(*self.tree.get_children())
+        self._populated = {''}
+    
+    def _values(self, path: str) -> Tuple[int, str]:
+        count, size = self.folders.totals(path)
+        return count, FileUtils.format_size(size)
+    
+    def _insert(self, parent: str, path: str):
+        """插入一个节点，有子目录时先放一个占位子项，展开时再插入真正的子目录"""
+        text = os.path.basename(path) if parent else path
+        self.tree.insert(parent, tk.END, iid=path, text=text, values=self._values(path))
+        if self.folders.has_children(path):
+            self.tree.insert(path, tk.END, iid=path + self.PLACEHOLDER)
+    
+    def _populate(self, path: str):
+        """插入节点的全部子目录"""
+        if path in self._populated:
+            return
+        self._populated.add(path)
+        if self.tree.exists(path + self.PLACEHOLDER):
+            self.tree.delete(path + self.PLACEHOLDER)
+        for child in self.folders.children(path):
+            if not self.tree.exists(child):
+                self._insert(path, child)
+    
+    def on_open(self, event):
+        """展开节点时插入子目录"""
+        path = self.tree.focus()
+        if path:
+            self._populate(path)
+    
+    def refresh(self):
+        """刷新上次刷新以来发生变化的节点"""
+        for path in self.folders.take_dirty():
+            parent = self.folders.parent(path) or ''
+            if self.tree.exists(path):
+                self.tree.item(path, values=self._values(path))
+                if (path not in self._populated and self.folders.has_children(path)
+                        and not self.tree.exists(path + self.PLACEHOLDER)):
+                    self.tree.insert(path, tk.END, iid=path + self.PLACEHOLDER)
+            elif parent in self._populated:
+                self._insert(parent, path)
+                if not parent:
+                    # 顶层的扫描根目录默认展开
+                    self._populate(path)
+                    self.tree.item(path, open=True)
+    
+    def resort(self):
+        """按总大小重新排列已显示的子目录"""
+        for path in self._populated:
+            for index, child in enumerate(self.folders.children(path or None)):
+                if self.tree.exists(child):
+                    self.tree.move(child, path, index)
+    
+    def selected_folder(self) -> Optional[str]:
+        selection = self.tree.selection()
+        return selection[0] if selection else None
+    
+    def clear_selection(self):
+        """取消选择，不触发回调"""
+        if self.tree.selection():
+            self._clearing = True
+            self.tree.selection_remove(*self.tree.selection())
+    
+    def on_tree_select(self, event):
+        if self._clearing:
+            self._clearing = False
+            return
+        self.on_select_callback(self.selected_folder())
+
 class StatusBar(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -141,6 +511,30 @@ class StatusBar(ttk.Frame):
             width=30
         )
         self.status_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 同时扫描多个文件夹时各文件夹的进度
+        self.detail_var = tk.StringVar()
+        self.detail_label = ttk.Label(
+            self,
+            textvariable=self.detail_var
+        )
+        self.detail_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 性能统计（默认隐藏）
+        self.perf_var = tk.StringVar()
+        self.perf_label = ttk.Label(
+            parent,
+            textvariable=self.perf_var,
+            anchor=tk.W,
+            font='TkFixedFont'
+        )
+    
+    def show_perf(self, visible: bool):
+        """显示或隐藏性能统计"""
+        if visible:
+            self.perf_label.pack(fill=tk.X, after=self)
+        else:
+            self.perf_label.pack_forget()
 
 class PreviewPanel(ttk.Frame):
     def __init__(self, parent, shortcuts_text: str):
@@ -190,6 +584,7 @@ class PreviewPanel(ttk.Frame):
         self.zoom_level = 1.0
         self.update_image()
     
+    @Perf.timed('preview.update')
     def update_image(self):
         """根据缩放级别更新图片显示"""
         if not self.original_image:
@@ -208,13 +603,15 @@ class PreviewPanel(ttk.Frame):
         
         if new_width > 0 and new_height > 0:
             # 创建缩放后的图片
-            resized_image = self.original_image.resize(
-                (new_width, new_height),
-                Image.Resampling.LANCZOS
-            )
+            with Perf.span('preview.resize'):
+                resized_image = self.original_image.resize(
+                    (new_width, new_height),
+                    Image.Resampling.LANCZOS
+                )
             
             # 转换为Tkinter图片
-            self.current_image = ImageTk.PhotoImage(resized_image)
+            with Perf.span('preview.photo_image'):
+                self.current_image = ImageTk.PhotoImage(resized_image)
             
             # 计算居中位置
             canvas_width = self.preview_canvas.winfo_width()
@@ -228,3 +625,272 @@ class PreviewPanel(ttk.Frame):
                 anchor='nw',
                 image=self.current_image
             )
+
+class ThumbnailGrid(ttk.Frame):
+    """缩略图网格
+
+    与 ImageList 显示同一个视图，选中状态也保存在 ImageList 中，标记和删除直接作用于网格中选中的图片。
+    画布上只有一屏的格子，滚动时复用这些格子；缩略图由 ThumbnailLoader 在后台解码，
+    转换后的 PhotoImage 保存在有上限的 LRU 缓存中，滚动很长的列表时内存占用也保持不变。
+    """
+    PADDING = 6
+    LABEL_HEIGHT = 18
+    
+    def __init__(self, parent, catalog, image_list, loader, on_activate: Callable[[int], None],
+                 cache_size: int, batch_size: int, poll_interval: int):
+        super().__init__(parent)
+        
+        self.catalog = catalog
+        self.image_list = image_list
+        self.loader = loader
+        self.on_activate = on_activate
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        
+        # 格子尺寸
+        self.tile_width = loader.size + self.PADDING * 2
+        self.tile_height = loader.size + self.PADDING * 2 + self.LABEL_HEIGHT
+        
+        # 可见区域状态
+        self.columns = 1
+        self.visible_rows = 1
+        self.top_row = 0
+        self.visible = False
+        self._slots: List[Tuple[int, int, int]] = []  # 每个格子的 (背景, 图片, 文件名) 画布对象
+        self._slot_paths: dict = {}  # 路径 -> 格子下标
+        self._cache: 'OrderedDict[str, Optional[ImageTk.PhotoImage]]' = OrderedDict()
+        self._refresh_pending = None
+        self._polling = False
+        
+        # 创建画布和滚动条
+        self.canvas = tk.Canvas(self, highlightthickness=0, background='white')
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 绑定事件
+        self.canvas.bind('<Configure>', lambda e: self.schedule_refresh())
+        self.canvas.bind('<ButtonPress-1>', self.on_click)
+        self.canvas.bind('<Double-Button-1>', self.on_double_click)
+        self.canvas.bind('<MouseWheel>', self.on_mousewheel)  # Windows/macOS
+        self.canvas.bind('<Button-4>', self.on_mousewheel)    # Linux上滚
+        self.canvas.bind('<Button-5>', self.on_mousewheel)    # Linux下滚
+        
+        # 列表内容或选中状态变化时刷新网格
+        image_list.refresh_callbacks.append(self.schedule_refresh)
+    
+    def show(self):
+        """显示网格并滚动到当前图片"""
+        self.visible = True
+        self.pack(fill=tk.BOTH, expand=True)
+        self.update_idletasks()
+        position = self.image_list.current_position()
+        if position is not None:
+            self.see(position)
+        self.refresh()
+    
+    def hide(self):
+        """隐藏网格，取消等待中的解码"""
+        self.visible = False
+        self.pack_forget()
+        self.loader.schedule([])
+    
+    def schedule_refresh(self):
+        """合并同一轮事件中的多次刷新"""
+        if self.visible and self._refresh_pending is None:
+            self._refresh_pending = self.after_idle(self.refresh)
+    
+    def _layout(self):
+        """根据画布大小计算列数和一屏的行数"""
+        width = max(1, self.canvas.winfo_width())
+        height = max(1, self.canvas.winfo_height())
+        self.columns = max(1, width // self.tile_width)
+        self.visible_rows = max(1, -(-height // self.tile_height))
+    
+    def _ensure_slots(self, count: int):
+        """创建或删除格子，使数量等于 count"""
+        while len(self._slots) < count:
+            background = self.canvas.create_rectangle(0, 0, 0, 0, width=2)
+            image = self.canvas.create_image(0, 0, anchor='center')
+            text = self.canvas.create_text(0, 0, anchor='n', font='TkSmallCaptionFont')
+            self._slots.append((background, image, text))
+        while len(self._slots) > count:
+            self.canvas.delete(*self._slots.pop())
+    
+    def _cached(self, path: str):
+        """从缓存中取缩略图，命中时移到最近使用的位置"""
+        image = self._cache.get(path)
+        if path in self._cache:
+            self._cache.move_to_end(path)
+        return image
+    
+    def _store(self, path: str, photo):
+        """存入缓存，超出上限时丢弃最久没有使用的缩略图
+        上限至少能放下可见的一屏和前后预读的两屏，预读的结果不会挤掉正在显示的缩略图
+        """
+        self._cache[path] = photo
+        self._cache.move_to_end(path)
+        limit = max(self.cache_size, len(self._slots) * 4)
+        while len(self._cache) > limit:
+            self._cache.popitem(last=False)
+    
+    def clear_cache(self):
+        """清空缩略图缓存"""
+        self._cache.clear()
+    
+    @Perf.timed('grid.refresh')
+    def refresh(self):
+        """用当前可见区域的图片刷新画布"""
+        self._refresh_pending = None
+        if not self.visible:
+            return
+        self._layout()
+        total = len(self.catalog)
+        total_rows = -(-total // self.columns)
+        self.top_row = max(0, min(self.top_row, total_rows - self.visible_rows + 1))
+        self._ensure_slots(self.columns * self.visible_rows)
+        
+        size = self.loader.size
+        selected = self.image_list.selected
+        anchor = self.image_list.anchor
+        first = self.top_row * self.columns
+        wanted = []
+        self._slot_paths = {}
+        for index, (background, image, text) in enumerate(self._slots):
+            position = first + index
+            if position >= total:
+                for item in (background, image, text):
+                    self.canvas.itemconfigure(item, state='hidden')
+                continue
+            
+            row = self.catalog.view_row(position)
+            path = self.catalog.path(row)
+            x = (index % self.columns) * self.tile_width
+            y = (index // self.columns) * self.tile_height
+            
+            # 选中的格子高亮，当前图片加粗边框
+            if row == anchor and row in selected:
+                fill, outline = '#cce4ff', '#3d7bd9'
+            elif row in selected:
+                fill, outline = '#cce4ff', '#9cc3f5'
+            else:
+                fill, outline = '#f2f2f2', '#f2f2f2'
+            self.canvas.coords(background, x + 2, y + 2, x + self.tile_width - 2, y + self.tile_height - 2)
+            self.canvas.itemconfigure(background, fill=fill, outline=outline, state='normal')
+            
+            photo = self._cached(path)
+            self.canvas.coords(image, x + self.tile_width // 2, y + self.PADDING + size // 2)
+            self.canvas.itemconfigure(image, image=photo or '', state='normal')
+            if photo is None and path not in self._cache:
+                wanted.append(path)
+            self._slot_paths[path] = index
+            
+            name = self.catalog.name(row)
+            if len(name) > 18:
+                name = name[:8] + '…' + name[-8:]
+            if self.catalog.is_marked(row):
+                name = '★ ' + name
+            self.canvas.coords(text, x + self.tile_width // 2, y + self.PADDING * 2 + size)
+            self.canvas.itemconfigure(text, text=name, state='normal')
+        
+        # 可见的格子优先，然后预读下一屏和上一屏
+        page = self.columns * self.visible_rows
+        for position in list(range(first + page, min(total, first + page * 2))) + \
+                list(range(max(0, first - page), first)):
+            path = self.catalog.path(self.catalog.view_row(position))
+            if path not in self._cache:
+                wanted.append(path)
+        self.loader.schedule(wanted)
+        if wanted and not self._polling:
+            self._polling = True
+            self.after(self.poll_interval, self.poll)
+        
+        # 更新滚动条
+        if total_rows:
+            self.scrollbar.set(self.top_row / total_rows, min(1, (self.top_row + self.visible_rows) / total_rows))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def poll(self):
+        """取走后台解码完成的缩略图，转换为 PhotoImage 并填入可见的格子"""
+        with Perf.span('grid.poll'):
+            for path, image in self.loader.take_results(self.batch_size):
+                photo = ImageTk.PhotoImage(image) if image is not None else None
+                self._store(path, photo)
+                index = self._slot_paths.get(path)
+                if index is not None and photo is not None:
+                    self.canvas.itemconfigure(self._slots[index][1], image=photo)
+        if self.loader.busy:
+            self.after(self.poll_interval, self.poll)
+        else:
+            self._polling = False
+    
+    def see(self, position: int):
+        """滚动使视图中的指定位置可见"""
+        self._layout()
+        row = position // self.columns
+        if row < self.top_row:
+            self.top_row = row
+        elif row >= self.top_row + self.visible_rows - 1:
+            self.top_row = row - max(0, self.visible_rows - 2)
+    
+    def on_scroll(self, *args):
+        """处理滚动条拖动和点击"""
+        total_rows = -(-len(self.catalog) // self.columns)
+        if args[0] == 'moveto':
+            self.top_row = int(float(args[1]) * total_rows)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, self.visible_rows - 1)
+            self.top_row += step
+        self.refresh()
+    
+    def on_mousewheel(self, event):
+        """处理滚轮事件"""
+        if event.num == 4 or event.delta > 0:
+            self.top_row -= 1
+        else:
+            self.top_row += 1
+        self.refresh()
+        return 'break'
+    
+    def _position_at(self, x: int, y: int) -> Optional[int]:
+        """画布坐标处格子对应的视图位置"""
+        column = x // self.tile_width
+        if column >= self.columns:
+            return None
+        position = (self.top_row + y // self.tile_height) * self.columns + column
+        return position if position < len(self.catalog) else None
+    
+    def on_click(self, event):
+        """单击选中，Shift 选择范围，Ctrl（macOS 上为 Command）切换单张的选中状态"""
+        self.canvas.focus_set()
+        position = self._position_at(event.x, event.y)
+        if position is None:
+            return
+        row = self.catalog.view_row(position)
+        image_list = self.image_list
+        toggle = 0x0004 | (0x0008 if sys.platform == 'darwin' else 0)
+        
+        anchor_position = image_list.current_position()
+        if event.state & 0x0001 and anchor_position is not None:
+            low, high = sorted((anchor_position, position))
+            image_list.selected = {self.catalog.view_row(p) for p in range(low, high + 1)}
+            image_list.refresh()
+        elif event.state & toggle:
+            if row in image_list.selected:
+                image_list.selected.discard(row)
+            else:
+                image_list.selected.add(row)
+                image_list.anchor = row
+            image_list.refresh()
+        else:
+            image_list.select_position(position)
+    
+    def on_double_click(self, event):
+        """双击查看大图"""
+        position = self._position_at(event.x, event.y)
+        if position is not None:
+            self.on_activate(position)
@@ -2,12 +2,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from config.config import Config
 from utils.settings_utils import SettingsUtils
+from utils.cache_purger import CachePurger
 
 class SettingsDialog(tk.Toplevel):
     def __init__(self, parent):
         super().__init__(parent)
         self.title("设置")
-        self.geometry("300x200")
+        self.geometry("420x370")
         
         # 设置为模态对话框
         self.transient(parent)
@@ -25,18 +26,61 @@ class SettingsDialog(tk.Toplevel):
         cache_frame = ttk.LabelFrame(self, text="缓存设置", padding="10")
         cache_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        # 缓存阈值设置
-        ttk.Label(cache_frame, text="缓存阈值:").pack(side=tk.LEFT, padx=5)
-        self.threshold_var = tk.StringVar(value=str(Config.CACHE_THRESHOLD))
-        threshold_spinbox = ttk.Spinbox(
+        # 缓存大小上限设置
+        ttk.Label(cache_frame, text="最大占用:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.max_size_var = tk.StringVar(value=str(Config.CACHE_MAX_SIZE_MB))
+        ttk.Spinbox(
             cache_frame,
-            from_=1,
-            to=100,
-            width=5,
-            textvariable=self.threshold_var
+            from_=0,
+            to=1024 * 1024,
+            increment=256,
+            width=8,
+            textvariable=self.max_size_var
+        ).grid(row=0, column=1, padx=5)
+        ttk.Label(cache_frame, text="MB").grid(row=0, column=2, sticky=tk.W, padx=5)
+        
+        # 缓存保存天数设置
+        ttk.Label(cache_frame, text="保存天数:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        self.max_age_var = tk.StringVar(value=str(Config.CACHE_MAX_AGE_DAYS))
+        ttk.Spinbox(
+            cache_frame,
+            from_=0,
+            to=3650,
+            width=8,
+            textvariable=self.max_age_var
+        ).grid(row=1, column=1, padx=5)
+        ttk.Label(cache_frame, text="天").grid(row=1, column=2, sticky=tk.W, padx=5)
+        
+        ttk.Label(cache_frame, text="0 表示不限制，超出部分在后台自动清理").grid(
+            row=2, column=0, columnspan=3, sticky=tk.W, padx=5, pady=(5, 0)
         )
-        threshold_spinbox.pack(side=tk.LEFT, padx=5)
-        ttk.Label(cache_frame, text="个文件").pack(side=tk.LEFT, padx=5)
+        
+        # 扫描设置框架
+        scan_frame = ttk.LabelFrame(self, text="扫描设置", padding="10")
+        scan_frame.pack(fill=tk.X, padx=10, pady=5)
+        scan_frame.columnconfigure(1, weight=1)
+        
+        # 目录排除规则
+        ttk.Label(scan_frame, text="微信文件夹中跳过的目录:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.exclude_dirs_var = tk.StringVar(value=", ".join(Config.SCAN_EXCLUDE_DIRS))
+        ttk.Entry(scan_frame, textvariable=self.exclude_dirs_var).grid(row=0, column=1, sticky=tk.EW, padx=5)
+        
+        # 目录包含规则
+        ttk.Label(scan_frame, text="仍要扫描:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        self.include_dirs_var = tk.StringVar(value=", ".join(Config.SCAN_INCLUDE_DIRS))
+        ttk.Entry(scan_frame, textvariable=self.include_dirs_var).grid(row=1, column=1, sticky=tk.EW, padx=5)
+        
+        ttk.Label(scan_frame, text="目录名通配符，用逗号分隔，例如 Video, *.db").grid(
+            row=2, column=0, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0)
+        )
+        
+        # 按文件头识别图片
+        self.sniff_var = tk.BooleanVar(value=Config.SCAN_SNIFF)
+        ttk.Checkbutton(
+            scan_frame,
+            text="识别没有图片扩展名的图片（读取文件头）",
+            variable=self.sniff_var
+        ).grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0))
         
         # 按钮框架
         button_frame = ttk.Frame(self)
@@ -59,20 +103,33 @@ class SettingsDialog(tk.Toplevel):
     def apply_settings(self):
         """应用并保存设置"""
         try:
-            new_threshold = int(self.threshold_var.get())
-            if new_threshold < 1:
-                raise ValueError("缓存阈值必须大于0")
+            new_max_size = int(self.max_size_var.get())
+            new_max_age = int(self.max_age_var.get())
+            if new_max_size < 0 or new_max_age < 0:
+                raise ValueError("缓存上限不能为负数")
             
             # 更新设置
-            Config.CACHE_THRESHOLD = new_threshold
+            Config.CACHE_MAX_SIZE_MB = new_max_size
+            Config.CACHE_MAX_AGE_DAYS = new_max_age
+            Config.SCAN_EXCLUDE_DIRS = self.split_patterns(self.exclude_dirs_var.get())
+            Config.SCAN_INCLUDE_DIRS = self.split_patterns(self.include_dirs_var.get())
+            Config.SCAN_SNIFF = self.sniff_var.get()
             
             # 保存设置
             SettingsUtils.save_settings()
             
+            # 按新策略在后台清理缓存
+            CachePurger().request_purge()
+            
             self.destroy()
         except ValueError as e:
             messagebox.showerror("错误", str(e))
     
+    @staticmethod
+    def split_patterns(text):
+        """把逗号分隔的目录规则拆成列表"""
+        return [pattern.strip() for pattern in text.replace('，', ',').split(',') if pattern.strip()]
+    
     def center_window(self):
         """将窗口居中显示"""
         self.update_idletasks()
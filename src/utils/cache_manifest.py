@@ -0,0 +1,341 @@
+import sqlite3
+import os
+import logging
+import threading
+import time
+from typing import List, Optional, Dict, Iterable, Tuple
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class CacheManifest:
+    """缓存清单
+
+    记录缓存中每个文件的原始路径、大小和删除时间。
+    以缓存键为主键，按键或原始路径查找都不需要遍历缓存目录。
+
+    每次移动作为一个批次写入：先以 pending 状态记入日志，
+    移动完成后在同一事务中改为 cached。界面和命令行可能同时在移动文件，
+    打开时只恢复超过 Config.CACHE_RECOVER_AFTER 仍未完成的记录。
+    """
+    _instance = None
+    _init_lock = threading.Lock()
+
+    STATE_PENDING = 'pending'
+    STATE_CACHED = 'cached'
+
+    _COLUMNS = 'cache_key, cache_path, original_path, size, deleted_at, batch_id, position'
+
+    def __new__(cls, db_path: str = None):
+        with cls._init_lock:
+            if cls._instance is None:
+                cls._instance = super(CacheManifest, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, db_path: str = None):
+        """初始化缓存清单
+
+        Args:
+            db_path: 数据库文件路径，如果为None则使用缓存目录下的manifest.db
+        """
+        if self._initialized:
+            return
+        # 多个删除线程可能同时第一次创建清单，初始化完成后才标记为已初始化
+        with CacheManifest._init_lock:
+            if self._initialized:
+                return
+            if db_path is None:
+                db_path = Config.CACHE_MANIFEST
+
+            # 确保目录存在
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+            self.db_path = db_path
+            self._init_db()
+            self.recover_pending()
+            self._initialized = True
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """初始化数据库表"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            # WAL 模式下写日志不阻塞读取
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    cache_path TEXT NOT NULL,
+                    original_path TEXT NOT NULL,
+                    size INTEGER,
+                    deleted_at REAL
+                )
+            ''')
+            # 旧版清单没有批次信息，补充列
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(cache_entries)')}
+            if 'batch_id' not in columns:
+                cursor.execute('ALTER TABLE cache_entries ADD COLUMN batch_id TEXT')
+            if 'position' not in columns:
+                cursor.execute('ALTER TABLE cache_entries ADD COLUMN position INTEGER')
+            if 'state' not in columns:
+                cursor.execute(f"ALTER TABLE cache_entries ADD COLUMN state TEXT DEFAULT '{self.STATE_CACHED}'")
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_cache_original
+                ON cache_entries (original_path)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_cache_deleted_at
+                ON cache_entries (deleted_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_cache_batch
+                ON cache_entries (batch_id)
+            ''')
+            conn.commit()
+
+    def begin_batch(self, entries: Iterable[Tuple[str, str, str, int, float, str, Optional[int]]]) -> bool:
+        """以 pending 状态写入一个批次的日志
+
+        Args:
+            entries: (cache_key, cache_path, original_path, size, deleted_at, batch_id, position) 列表
+
+        Returns:
+            bool: 是否写入成功
+        """
+        try:
+            with self._connect() as conn:
+                conn.executemany(f'''
+                    INSERT OR REPLACE INTO cache_entries
+                    ({self._COLUMNS}, state)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, '{self.STATE_PENDING}')
+                ''', entries)
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error('Error writing cache manifest: %s', e)
+            return False
+
+    def commit_batch(self, moved_keys: Iterable[str], failed_keys: Iterable[str]) -> bool:
+        """在同一事务中确认已移动的记录并丢弃失败的记录
+
+        Args:
+            moved_keys: 已移动到缓存的缓存键
+            failed_keys: 移动失败的缓存键
+
+        Returns:
+            bool: 是否写入成功
+        """
+        try:
+            with self._connect() as conn:
+                conn.executemany(f"UPDATE cache_entries SET state = '{self.STATE_CACHED}' WHERE cache_key = ?",
+                                 ((key,) for key in moved_keys))
+                conn.executemany('DELETE FROM cache_entries WHERE cache_key = ?',
+                                 ((key,) for key in failed_keys))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error('Error committing cache manifest: %s', e)
+            return False
+
+    def recover_pending(self, older_than: Optional[float] = None) -> int:
+        """处理中断时遗留的 pending 记录
+
+        Args:
+            older_than: 只处理删除时间早于此时间戳的记录，默认为 Config.CACHE_RECOVER_AFTER 秒之前，
+                较新的记录可能属于其他进程中正在进行的移动
+
+        Returns:
+            int: 处理的记录数量
+        """
+        if older_than is None:
+            older_than = time.time() - Config.CACHE_RECOVER_AFTER
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT cache_key, cache_path FROM cache_entries
+                    WHERE state = '{self.STATE_PENDING}' AND deleted_at < ?
+                """, (older_than,))
+                pending = cursor.fetchall()
+            if pending:
+                moved = [key for key, cache_path in pending if os.path.exists(cache_path)]
+                failed = [key for key, cache_path in pending if not os.path.exists(cache_path)]
+                self.commit_batch(moved, failed)
+            return len(pending)
+        except Exception as e:
+            logger.error('Error recovering cache manifest: %s', e)
+            return 0
+
+    def _row_to_dict(self, row) -> Dict:
+        return {
+            'cache_key': row[0],
+            'cache_path': row[1],
+            'original_path': row[2],
+            'size': row[3],
+            'deleted_at': row[4],
+            'batch_id': row[5],
+            'position': row[6]
+        }
+
+    def _query(self, where: str = '', params: tuple = (), order: str = 'deleted_at') -> List[Dict]:
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {self._COLUMNS}
+                    FROM cache_entries
+                    WHERE state = '{self.STATE_CACHED}' {where}
+                    ORDER BY {order}
+                ''', params)
+                return [self._row_to_dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error('Error reading cache manifest: %s', e)
+            return []
+
+    def get_entry(self, cache_key: str) -> Optional[Dict]:
+        """按缓存键获取记录
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            Optional[Dict]: 缓存记录
+        """
+        rows = self._query('AND cache_key = ?', (cache_key,))
+        return rows[0] if rows else None
+
+    def find_by_original(self, original_path: str) -> List[Dict]:
+        """按原始路径获取记录，最近删除的在前
+
+        Args:
+            original_path: 文件原始路径
+
+        Returns:
+            List[Dict]: 缓存记录列表
+        """
+        return self._query('AND original_path = ?', (original_path,), 'deleted_at DESC')
+
+    def find_by_prefix(self, path_prefix: str) -> List[Dict]:
+        """获取原始路径位于某目录下的记录
+
+        Args:
+            path_prefix: 目录路径
+
+        Returns:
+            List[Dict]: 缓存记录列表
+        """
+        path_prefix = os.path.join(path_prefix, '')
+        # 使用范围查询以利用 original_path 索引
+        return self._query('AND original_path >= ? AND original_path < ?',
+                           (path_prefix, path_prefix + '\U0010ffff'))
+
+    def get_batch(self, batch_id: str) -> List[Dict]:
+        """获取一个批次的记录，按原列表位置排序
+
+        Args:
+            batch_id: 批次ID
+
+        Returns:
+            List[Dict]: 缓存记录列表
+        """
+        return self._query('AND batch_id = ?', (batch_id,), 'position')
+
+    def get_last_batch_id(self) -> Optional[str]:
+        """获取最近一次删除的批次ID"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT batch_id FROM cache_entries
+                    WHERE state = '{self.STATE_CACHED}' AND batch_id IS NOT NULL
+                    ORDER BY deleted_at DESC
+                    LIMIT 1
+                ''')
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error('Error reading cache manifest: %s', e)
+            return None
+
+    def list_batches(self) -> List[Tuple[str, int, int, float]]:
+        """列出所有批次
+
+        Returns:
+            List[Tuple]: (batch_id, 文件数, 总字节数, 删除时间)，最近的在前
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT batch_id, COUNT(*), SUM(size), MAX(deleted_at)
+                    FROM cache_entries
+                    WHERE state = '{self.STATE_CACHED}'
+                    GROUP BY batch_id
+                    ORDER BY MAX(deleted_at) DESC
+                ''')
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error('Error reading cache manifest: %s', e)
+            return []
+
+    def count_entries(self) -> int:
+        """获取缓存记录数量"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM cache_entries WHERE state = '{self.STATE_CACHED}'")
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error('Error reading cache manifest: %s', e)
+            return 0
+
+    def total_size(self) -> int:
+        """获取缓存文件总字节数"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE state = '{self.STATE_CACHED}'")
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error('Error reading cache manifest: %s', e)
+            return 0
+
+    def get_oldest_entries(self, limit: int, deleted_before: Optional[float] = None) -> List[Dict]:
+        """获取最早删除的记录
+
+        Args:
+            limit: 最多返回的记录数
+            deleted_before: 只返回在此时间之前删除的记录
+
+        Returns:
+            List[Dict]: 缓存记录列表，最早删除的在前
+        """
+        if deleted_before is None:
+            return self._query('', (), f'deleted_at LIMIT {int(limit)}')
+        return self._query('AND deleted_at < ?', (deleted_before,), f'deleted_at LIMIT {int(limit)}')
+
+    def get_all_entries(self) -> List[Dict]:
+        """获取全部缓存记录，最早删除的在前"""
+        return self._query()
+
+    def remove_entries(self, cache_keys: Iterable[str]) -> bool:
+        """批量删除缓存记录
+
+        Args:
+            cache_keys: 缓存键列表
+
+        Returns:
+            bool: 是否删除成功
+        """
+        try:
+            with self._connect() as conn:
+                conn.executemany('DELETE FROM cache_entries WHERE cache_key = ?',
+                                 ((key,) for key in cache_keys))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error('Error removing cache manifest entries: %s', e)
+            return False
@@ -0,0 +1,138 @@
+import os
+import time
+import logging
+import threading
+from typing import List, Dict
+from config.config import Config
+from utils.cache_manifest import CacheManifest
+
+logger = logging.getLogger(__name__)
+
+class CachePurger:
+    """缓存保留策略
+
+    按总大小和保存天数清理缓存，在后台线程中分批执行。
+    扫描期间暂停清理，每批之间休眠，避免与扫描争抢磁盘 I/O。
+    暂停按次数计数，多个扫描同时进行时，全部结束后才恢复。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CachePurger, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+
+        self._wakeup = threading.Event()
+        # 置位表示当前没有扫描在进行，可以清理
+        self._io_idle = threading.Event()
+        self._io_idle.set()
+        self._pause_count = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def request_purge(self):
+        """请求按当前策略清理缓存，立即返回"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='CachePurger')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def pause(self):
+        """暂停清理（例如扫描开始时），每次调用都要对应一次 resume"""
+        with self._lock:
+            self._pause_count += 1
+            self._io_idle.clear()
+
+    def resume(self):
+        """撤销一次暂停，所有暂停都撤销后恢复清理"""
+        with self._lock:
+            if self._pause_count == 0:
+                logger.warning('CachePurger.resume called without a matching pause')
+                return
+            self._pause_count -= 1
+            if self._pause_count == 0:
+                self._io_idle.set()
+
+    def _run(self):
+        """后台线程主循环"""
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                removed_count, removed_size = self.purge()
+                if removed_count:
+                    logger.info('Purged %s cache files (%s bytes)', removed_count, removed_size)
+            except Exception as e:
+                logger.error('Error purging cache: %s', e)
+
+    def _next_batch(self, manifest: CacheManifest) -> List[Dict]:
+        """按策略选出下一批要清理的记录"""
+        batch_size = Config.CACHE_PURGE_BATCH_SIZE
+
+        # 超过保存天数的记录
+        if Config.CACHE_MAX_AGE_DAYS > 0:
+            cutoff = time.time() - Config.CACHE_MAX_AGE_DAYS * 86400
+            expired = manifest.get_oldest_entries(batch_size, deleted_before=cutoff)
+            if expired:
+                return expired
+
+        # 超过总大小时从最早删除的开始清理，只清理超出的部分
+        if Config.CACHE_MAX_SIZE_MB > 0:
+            excess = manifest.total_size() - Config.CACHE_MAX_SIZE_MB * 1024 * 1024
+            if excess > 0:
+                batch = []
+                for entry in manifest.get_oldest_entries(batch_size):
+                    batch.append(entry)
+                    excess -= entry['size'] or 0
+                    if excess <= 0:
+                        break
+                return batch
+        return []
+
+    def purge(self) -> tuple:
+        """按策略清理缓存，直到满足策略为止
+
+        Returns:
+            tuple: (清理的文件数, 清理的字节数)
+        """
+        manifest = CacheManifest()
+        removed_count = 0
+        removed_size = 0
+
+        while True:
+            # 扫描进行中时等待
+            self._io_idle.wait()
+
+            batch = self._next_batch(manifest)
+            if not batch:
+                break
+
+            removed_keys = []
+            for entry in batch:
+                try:
+                    os.remove(entry['cache_path'])
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error('Error removing cache file %s: %s', entry["cache_path"], e)
+                    continue
+                removed_keys.append(entry['cache_key'])
+                removed_size += entry['size'] or 0
+
+            if not removed_keys:
+                # 整批都删除失败，避免反复重试
+                break
+            manifest.remove_entries(removed_keys)
+            removed_count += len(removed_keys)
+
+            time.sleep(Config.CACHE_PURGE_INTERVAL)
+
+        return removed_count, removed_size
@@ -1,55 +1,132 @@
 import os
 import shutil
-from tkinter import messagebox
+import time
+import hashlib
+import itertools
+import logging
+import uuid
+from typing import Dict, List, Optional
 from config.config import Config
+from utils.cache_manifest import CacheManifest
+from utils.perf import Perf
+
+logger = logging.getLogger(__name__)
 
 class CacheUtils:
+    # 同一纳秒内多次删除时用于区分缓存键
+    _key_counter = itertools.count()
+
+    @staticmethod
+    def make_cache_key(file_path: str, deleted_at_ns: int) -> str:
+        """根据原始路径和删除时间生成缓存键"""
+        seed = f"{file_path}\0{deleted_at_ns}\0{next(CacheUtils._key_counter)}"
+        return hashlib.sha1(seed.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    @staticmethod
+    def get_cache_path(cache_key: str, filename: str) -> str:
+        """获取缓存键对应的分片路径
+        例如: CACHE_DIR/ab/cd/abcd..._原文件名
+        """
+        return os.path.join(
+            Config.CACHE_DIR,
+            cache_key[:2],
+            cache_key[2:4],
+            f"{cache_key[:16]}_{filename}"
+        )
+
     @staticmethod
-    def move_to_cache(file_paths: list) -> bool:
+    def new_batch_id() -> str:
+        """生成删除批次ID，一次删除操作分多次移动时共用同一个批次ID"""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    @Perf.timed('cache.move')
+    def move_to_cache(file_paths: list, positions: Optional[Dict[str, int]] = None,
+                      moved: Optional[list] = None, batch_id: Optional[str] = None) -> bool:
         """将文件移动到缓存文件夹
         参数:
             file_paths: 要移动的文件路径列表
+            positions: 文件在列表中的位置，用于撤销时插回原处
+            moved: 如果提供，写入已移动的文件路径，部分失败时用于区分已移动和失败的文件
+            batch_id: 删除批次ID，撤销时整批恢复，默认为本次移动生成新的批次
         返回:
             bool: 是否全部移动成功
         """
+        positions = positions or {}
+        batch_id = batch_id or CacheUtils.new_batch_id()
+        entries = []
         try:
             for file_path in file_paths:
-                # 生成目标路径
-                filename = os.path.basename(file_path)
-                cache_path = os.path.join(Config.CACHE_DIR, filename)
-                
-                # 如果目标文件已存在，添加数字后缀
-                counter = 1
-                while os.path.exists(cache_path):
-                    name, ext = os.path.splitext(filename)
-                    cache_path = os.path.join(Config.CACHE_DIR, f"{name}_{counter}{ext}")
-                    counter += 1
-                
+                # 生成目标路径，缓存键唯一，无需探测重名
+                deleted_at_ns = time.time_ns()
+                cache_key = CacheUtils.make_cache_key(file_path, deleted_at_ns)
+                cache_path = CacheUtils.get_cache_path(cache_key, os.path.basename(file_path))
+                entries.append((cache_key, cache_path, file_path, os.path.getsize(file_path),
+                                deleted_at_ns / 1e9, batch_id, positions.get(file_path)))
+        except Exception as e:
+            logger.error('Error moving files to cache: %s', e)
+            return False
+
+        # 先写日志再移动，中断后可以从清单中恢复
+        manifest = CacheManifest()
+        if not manifest.begin_batch(entries):
+            return False
+
+        moved_keys = []
+        try:
+            for cache_key, cache_path, file_path, *_ in entries:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
                 # 移动文件到缓存
                 shutil.move(file_path, cache_path)
+                moved_keys.append(cache_key)
+                if moved is not None:
+                    moved.append(file_path)
             return True
         except Exception as e:
-            messagebox.showerror("错误", f"移动文件到缓存失败：{str(e)}")
+            logger.error('Error moving files to cache: %s', e)
             return False
-    
+        finally:
+            moved_set = set(moved_keys)
+            manifest.commit_batch(moved_keys, [entry[0] for entry in entries if entry[0] not in moved_set])
+
     @staticmethod
-    def check_cache_threshold() -> bool:
-        """检查缓存文件数量并提示清理"""
-        try:
-            cache_files = [f for f in os.listdir(Config.CACHE_DIR) 
-                        if os.path.isfile(os.path.join(Config.CACHE_DIR, f))]
-            
-            if len(cache_files) >= Config.CACHE_THRESHOLD:
-                if messagebox.askyesno("清理缓存", 
-                                    f"缓存文件夹中已有{len(cache_files)}个文件，是否清空缓存？"):
-                    for f in cache_files:
-                        try:
-                            os.remove(os.path.join(Config.CACHE_DIR, f))
-                        except Exception as e:
-                            messagebox.showerror("错误", f"删除缓存文件失败：{str(e)}")
-                            return False
-                    return True
-            return False
-        except Exception as e:
-            messagebox.showerror("错误", f"检查缓存失败：{str(e)}")
-            return False
+    @Perf.timed('cache.restore')
+    def restore_entries(entries: List[Dict]) -> List[Dict]:
+        """将缓存记录对应的文件移回原位置
+        参数:
+            entries: 缓存清单记录
+        返回:
+            List[Dict]: 成功恢复的记录
+        """
+        restored = []
+        for entry in entries:
+            original_path = entry['original_path']
+            try:
+                if os.path.exists(original_path):
+                    logger.warning('Restore target already exists: %s', original_path)
+                    continue
+                os.makedirs(os.path.dirname(original_path), exist_ok=True)
+                try:
+                    # 同一文件系统下直接重命名
+                    os.rename(entry['cache_path'], original_path)
+                except OSError:
+                    shutil.move(entry['cache_path'], original_path)
+                restored.append(entry)
+            except Exception as e:
+                logger.error('Error restoring %s: %s', original_path, e)
+
+        if restored:
+            CacheManifest().remove_entries(entry['cache_key'] for entry in restored)
+        return restored
+
+    @staticmethod
+    def undo_last_delete() -> List[Dict]:
+        """撤销最近一次删除
+        返回:
+            List[Dict]: 成功恢复的记录，按原列表位置排序
+        """
+        manifest = CacheManifest()
+        batch_id = manifest.get_last_batch_id()
+        if not batch_id:
+            return []
+        return CacheUtils.restore_entries(manifest.get_batch(batch_id))
@@ -0,0 +1,391 @@
+import logging
+import os
+import re
+import shlex
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Pattern, Set
+
+from utils.file_utils import FileUtils
+from utils.image_catalog import ImageCatalog
+from utils.perf import Perf
+from utils.scan_utils import ScanEntry
+
+logger = logging.getLogger(__name__)
+
+# 文件名中的字符（不含分隔行和行号的字符）
+NAME_CHAR = r'[^\n\0]'
+
+# 标签条件的别名，值为标签键（1-7）或 any/none
+TAG_ALIASES = {
+    'red': '1', '红': '1', '红色': '1',
+    'orange': '2', '橙': '2', '橙色': '2',
+    'yellow': '3', '黄': '3', '黄色': '3',
+    'green': '4', '绿': '4', '绿色': '4',
+    'blue': '5', '蓝': '5', '蓝色': '5',
+    'purple': '6', '紫': '6', '紫色': '6',
+    'gray': '7', 'grey': '7', '灰': '7', '灰色': '7',
+    'any': 'any', '有': 'any', 'none': 'none', '无': 'none'
+}
+
+class CatalogQuery:
+    """解析后的筛选条件
+
+    查询语法（条件之间为“且”的关系）:
+        abc          文件名包含 abc（不区分大小写）
+        *.png        文件名匹配通配符（* 和 ?）
+        size:>2MB    大小范围，也可以写 size:<500K、size:1M..5M
+        date:2023    修改时间范围，也可以写 date:2023-05、date:>30d、date:2023-01-01..2023-06-30
+        tag:red      标签颜色（1-7、red、红色……），tag:any 为任意标签，tag:none 为无标签
+        in:abc       所在目录的路径包含 abc
+        dup          只显示内容重复的文件
+
+    folder_root 不来自查询文本，由目录面板设置，只显示该目录及其子目录中的文件。
+    """
+
+    def __init__(self):
+        self.names: List[Pattern] = []
+        self.min_size: Optional[int] = None
+        self.max_size: Optional[int] = None
+        self.newer_than: Optional[float] = None
+        self.older_than: Optional[float] = None
+        self.tag: Optional[str] = None
+        self.folders: List[str] = []
+        self.duplicates_only = False
+        self.folder_root: Optional[str] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.names or self.folders or self.tag or self.duplicates_only or self.folder_root
+                    or self.min_size is not None or self.max_size is not None
+                    or self.newer_than is not None or self.older_than is not None)
+
+    @staticmethod
+    def parse(text: str) -> 'CatalogQuery':
+        """解析查询文本
+        异常:
+            ValueError: 条件无法解析
+        """
+        query = CatalogQuery()
+        try:
+            terms = shlex.split(text)
+        except ValueError:
+            # 引号不完整时（正在输入中）按空格拆分
+            terms = text.split()
+
+        for term in terms:
+            field, sep, value = term.partition(':')
+            field = field.lower()
+            if not sep:
+                if field == 'dup':
+                    query.duplicates_only = True
+                else:
+                    query.names.append(CatalogQuery._name_pattern(term))
+            elif field == 'is' and value.lower() == 'dup':
+                query.duplicates_only = True
+            elif field == 'size':
+                query.min_size, query.max_size = CatalogQuery._parse_range(value, FileUtils.parse_size)
+            elif field == 'date':
+                query.newer_than, query.older_than = CatalogQuery._parse_date_range(value)
+            elif field == 'tag':
+                tag = value.lower()
+                tag = tag if tag in '1234567' and len(tag) == 1 else TAG_ALIASES.get(tag)
+                if not tag:
+                    raise ValueError(f'无效的标签: {value}')
+                query.tag = tag
+            elif field in ('in', 'folder'):
+                if value:
+                    query.folders.append(value.lower())
+            else:
+                query.names.append(CatalogQuery._name_pattern(term))
+        return query
+
+    @staticmethod
+    def _name_pattern(term: str) -> Pattern:
+        """文件名条件编译为正则，通配符匹配整个文件名，其他为子串匹配
+
+        正则匹配 CatalogIndex 中“小写文件名 + NUL + 行号”形式的一行，并捕获行号
+        """
+        term = term.lower()
+        if '*' not in term and '?' not in term:
+            # 子串不锚定行首，正则引擎可以按字面量快速查找
+            return re.compile(re.escape(term) + NAME_CHAR + r'*\0(\d+)$', re.MULTILINE)
+        # 以 * 开头时同样不需要锚定行首
+        anchor = '' if term.startswith('*') else '^'
+        body = ''.join(NAME_CHAR + '*' if char == '*' else NAME_CHAR if char == '?' else re.escape(char)
+                       for char in term.lstrip('*'))
+        return re.compile(anchor + body + r'\0(\d+)$', re.MULTILINE)
+
+    @staticmethod
+    def _parse_range(value: str, parse: Callable):
+        """解析 >a、<b、a..b 形式的范围，返回 (最小值, 最大值)，格式无效时抛出 ValueError"""
+        if value.startswith('>='):
+            return parse(value[2:]), None
+        if value.startswith('<='):
+            return None, parse(value[2:])
+        if value.startswith('>'):
+            return parse(value[1:]), None
+        if value.startswith('<'):
+            return None, parse(value[1:])
+        if '..' in value:
+            low, high = value.split('..', 1)
+            return (parse(low) if low else None), (parse(high) if high else None)
+        exact = parse(value)
+        return exact, exact
+
+    @staticmethod
+    def _parse_date_range(value: str):
+        """解析日期范围，单独的年份或年月表示整个年/月"""
+        match = re.fullmatch(r'(\d{4})(?:-(\d{1,2}))?', value)
+        if match:
+            year = int(match.group(1))
+            if match.group(2):
+                month = int(match.group(2))
+                start = datetime(year, month, 1)
+                end = datetime(year + month // 12, month % 12 + 1, 1)
+            else:
+                start = datetime(year, 1, 1)
+                end = datetime(year + 1, 1, 1)
+            return start.timestamp(), end.timestamp() - 1
+        newer_than, older_than = CatalogQuery._parse_range(value, FileUtils.parse_time)
+        if newer_than is not None and newer_than == older_than:
+            # 单独的日期表示当天
+            return newer_than, newer_than + 86399
+        return newer_than, older_than
+
+class CatalogIndex:
+    """ImageCatalog 上的查询索引
+
+    - 大小和修改时间：按值排序的行号数组，范围条件用二分查找
+    - 文件名：每行“小写文件名 + NUL + 行号”连接成一个字符串，名称条件用正则在 C 中整体扫描并直接取出行号。
+      微信文件名多为哈希值，三元组索引的倒排表会比文件名本身大很多倍
+    - 标签、目录和重复文件的结果按条件缓存
+
+    目录在扫描过程中只追加行，索引按需增量更新；扫描清空数据模型后自动重建。
+    所有方法都在界面线程中调用，只有重复文件的哈希在后台线程中计算。
+    """
+
+    # 候选行不超过此数量时，其余条件逐行检查
+    ROW_CHECK_LIMIT = 2000
+
+    def __init__(self, catalog: ImageCatalog):
+        self.catalog = catalog
+        self.duplicate_rows: Optional[Set[int]] = None
+        self._duplicates_running = False
+        self.reset()
+
+    def reset(self):
+        """丢弃全部索引"""
+        self._generation = self.catalog.generation
+        self._name_blob = ''
+        self._name_rows = 0
+        self.invalidate_values()
+        self.invalidate_tags()
+        self.duplicate_rows = None
+
+    def invalidate_values(self):
+        """大小或修改时间变化后（例如撤销删除）重建排序索引"""
+        self._sorted_rows = 0
+        self._by_size = array('l')
+        self._sizes = array('q')
+        self._by_mtime = array('l')
+        self._mtimes = array('q')
+
+    def invalidate_tags(self):
+        """标签变化后丢弃标签条件的缓存"""
+        self._tag_rows: Dict[str, Set[int]] = {}
+        self._tag_paths: Dict[str, Set[str]] = {}
+
+    @property
+    def indexed_rows(self) -> int:
+        """已建立索引的行数，之后追加的行逐行匹配"""
+        return min(self._name_rows, self._sorted_rows)
+
+    def update(self):
+        """把索引更新到数据模型的当前状态"""
+        catalog = self.catalog
+        if catalog.generation != self._generation:
+            self.reset()
+        row_count = catalog.row_count
+        if self.indexed_rows < row_count:
+            # 标签条件的缓存只覆盖已有的行
+            self.invalidate_tags()
+
+        if self._name_rows < row_count:
+            with Perf.span('query.index_names'):
+                lines = [f'{catalog.name(row).lower()}\0{row}' for row in range(self._name_rows, row_count)]
+                self._name_blob += '\n'.join(lines) + '\n'
+                self._name_rows = row_count
+
+        if self._sorted_rows < row_count:
+            with Perf.span('query.index_values'):
+                rows = range(row_count)
+                self._by_size = array('l', sorted(rows, key=catalog.size))
+                self._sizes = array('q', map(catalog.size, self._by_size))
+                self._by_mtime = array('l', sorted(rows, key=catalog.mtime))
+                self._mtimes = array('q', map(catalog.mtime, self._by_mtime))
+                self._sorted_rows = row_count
+
+    # 单个条件
+
+    def _name_matches(self, pattern: Pattern) -> Set[int]:
+        return set(map(int, pattern.findall(self._name_blob)))
+
+    @staticmethod
+    def _range(keys: array, values: array, low, high) -> array:
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        return keys[start:end]
+
+    def _folder_rows(self, folder: str) -> Set[int]:
+        dir_ids = [dir_id for dir_id, dir_path in enumerate(self.catalog.dirs()) if folder in dir_path.lower()]
+        return set(self.catalog.rows_in_dirs(dir_ids))
+
+    @staticmethod
+    def _under_root(dir_path: str, root: str) -> bool:
+        return dir_path == root or dir_path.startswith(root.rstrip(os.sep) + os.sep)
+
+    def _root_rows(self, root: str) -> Set[int]:
+        dir_ids = [dir_id for dir_id, dir_path in enumerate(self.catalog.dirs()) if self._under_root(dir_path, root)]
+        return set(self.catalog.rows_in_dirs(dir_ids))
+
+    def _load_tag(self, tag: str):
+        """读取带指定标签的文件，any/none 直接使用数据模型中的标记"""
+        if tag in self._tag_rows:
+            return
+        catalog = self.catalog
+        if tag in ('any', 'none'):
+            marked = tag == 'any'
+            self._tag_rows[tag] = {row for row in range(catalog.row_count) if catalog.is_marked(row) == marked}
+            return
+        from utils.macos_utils import MacOSUtils
+        paths = set(MacOSUtils.get_files_by_tag(tag))
+        self._tag_paths[tag] = paths
+        self._tag_rows[tag] = set(catalog.find_many(paths).values())
+
+    # 查询
+
+    def match(self, row: int, query: CatalogQuery) -> bool:
+        """逐行检查是否满足全部条件"""
+        catalog = self.catalog
+        if query.min_size is not None and catalog.size(row) < query.min_size:
+            return False
+        if query.max_size is not None and catalog.size(row) > query.max_size:
+            return False
+        if query.newer_than is not None and catalog.mtime(row) < query.newer_than:
+            return False
+        if query.older_than is not None and catalog.mtime(row) > query.older_than:
+            return False
+        if query.names:
+            line = f'{catalog.name(row).lower()}\0{row}'
+            if not all(pattern.search(line) for pattern in query.names):
+                return False
+        if query.folders:
+            dir_path = catalog.dir(row).lower()
+            if not all(folder in dir_path for folder in query.folders):
+                return False
+        if query.folder_root and not self._under_root(catalog.dir(row), query.folder_root):
+            return False
+        if query.tag:
+            self._load_tag(query.tag)
+            if query.tag in ('any', 'none'):
+                if catalog.is_marked(row) != (query.tag == 'any'):
+                    return False
+            elif row not in self._tag_rows[query.tag] and catalog.path(row) not in self._tag_paths[query.tag]:
+                return False
+        if query.duplicates_only and (self.duplicate_rows is None or row not in self.duplicate_rows):
+            return False
+        return True
+
+    @Perf.timed('query.search')
+    def search(self, query: CatalogQuery) -> Set[int]:
+        """返回已建立索引的行中满足条件的行号
+
+        先用排序索引和缓存求出范围、标签和重复文件条件的候选行。候选很少时其余条件逐行检查，
+        否则再扫描文件名和目录，各条件的结果集合取交集（在 C 中完成）。
+        """
+        self.update()
+        indexed_rows = self.indexed_rows
+        candidates = []
+        if query.min_size is not None or query.max_size is not None:
+            candidates.append(set(self._range(self._by_size, self._sizes, query.min_size, query.max_size)))
+        if query.newer_than is not None or query.older_than is not None:
+            candidates.append(set(self._range(self._by_mtime, self._mtimes, query.newer_than, query.older_than)))
+        if query.duplicates_only:
+            candidates.append(self.duplicate_rows or set())
+        if query.tag:
+            self._load_tag(query.tag)
+            candidates.append(self._tag_rows[query.tag])
+
+        if candidates and min(map(len, candidates)) <= self.ROW_CHECK_LIMIT:
+            base = min(candidates, key=len)
+            return {row for row in base if row < indexed_rows and self.match(row, query)}
+
+        for pattern in query.names:
+            candidates.append(self._name_matches(pattern))
+        for folder in query.folders:
+            candidates.append(self._folder_rows(folder))
+        if query.folder_root:
+            candidates.append(self._root_rows(query.folder_root))
+        if not candidates:
+            return set(range(indexed_rows))
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+    def predicate(self, query: CatalogQuery) -> Callable[[int], bool]:
+        """生成 ImageCatalog.set_filter 使用的筛选函数
+        建立索引之后追加的行（扫描仍在进行时）逐行匹配
+        """
+        rows = self.search(query)
+        indexed_rows = self.indexed_rows
+        return lambda row: row in rows if row < indexed_rows else self.match(row, query)
+
+    # 重复文件
+
+    @property
+    def duplicates_running(self) -> bool:
+        return self._duplicates_running
+
+    def find_duplicates(self, executor=None) -> bool:
+        """在后台线程中查找重复文件，完成后结果保存在 duplicate_rows 中
+        参数:
+            executor: 计算哈希用的线程池或进程池，默认新建线程池
+        返回:
+            bool: 是否启动了新的查找
+        """
+        if self.duplicate_rows is not None or self._duplicates_running:
+            return False
+        self.update()
+
+        # 只有大小相同的文件才可能重复，在界面线程中利用排序索引挑出候选
+        catalog = self.catalog
+        entries = {}
+        sizes = self._sizes
+        for i in range(1, len(sizes)):
+            if sizes[i] == sizes[i - 1] and sizes[i] > 0:
+                for row in (self._by_size[i - 1], self._by_size[i]):
+                    if row not in entries and not catalog.is_deleted(row):
+                        path = catalog.path(row)
+                        entries[row] = ScanEntry(path, catalog.dir(row), catalog.name(row),
+                                                 catalog.size(row), catalog.mtime(row), 0, 0)
+
+        generation = catalog.generation
+        self._duplicates_running = True
+
+        def run():
+            from utils.duplicate_utils import DuplicateUtils
+            try:
+                rows = {entry.path: row for row, entry in entries.items()}
+                groups = DuplicateUtils.find_duplicate_groups(entries.values(), executor=executor)
+                duplicates = {rows[entry.path] for group in groups for entry in group}
+            except Exception as e:
+                logger.error('Error finding duplicates: %s', e)
+                duplicates = set()
+            if generation == self.catalog.generation:
+                self.duplicate_rows = duplicates
+            self._duplicates_running = False
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
@@ -0,0 +1,167 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from config.config import Config
+from utils.perf import Perf
+
+logger = logging.getLogger(__name__)
+
+class DecodeService:
+    """在进程池中解码图片
+
+    JPEG/PNG 解码和缩放在线程池中并不能完全并行，解码放到多个进程中进行。
+    解码后的像素不经过 pickle：主进程分配共享内存，子进程解码、缩放后把像素写入共享内存，
+    只返回模式和尺寸，主进程从共享内存构造图片。共享内存按大小复用，由主进程创建和释放。
+
+    同一个进程池也用于计算文件哈希（参见 DuplicateUtils）。启动时调用 warm_up 预先创建子进程
+    并加载 PIL，第一次预览不需要等待进程启动。进程池不可用时退回在当前进程中解码。
+    """
+    _instance = None
+
+    # 每个像素最多 4 字节（RGBA）
+    MAX_BYTES_PER_PIXEL = 4
+
+    def __new__(cls, max_workers: Optional[int] = None):
+        if cls._instance is None:
+            cls._instance = super(DecodeService, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, max_workers: Optional[int] = None):
+        if self._initialized:
+            return
+        self._initialized = True
+        """初始化解码服务
+
+        Args:
+            max_workers: 进程数，默认 Config.DECODE_WORKERS
+        """
+        self.max_workers = max_workers or Config.DECODE_WORKERS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._buffers: Dict[int, List[shared_memory.SharedMemory]] = {}
+        self._closed = False
+        # 窗口关闭时由界面调用 close，异常退出时也在退出前释放共享内存
+        atexit.register(self.close)
+
+    @property
+    def executor(self) -> Executor:
+        """进程池，第一次使用时创建"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Decode service is closed')
+            if self._executor is None:
+                # 界面进程中已有多个线程，用 spawn 启动子进程，避免 fork 复制其他线程持有的锁
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=DecodeService._init_worker)
+            return self._executor
+
+    @staticmethod
+    def _init_worker():
+        """子进程启动时加载 PIL 和各格式的插件"""
+        from PIL import Image
+        Image.init()
+
+    @staticmethod
+    def _ping() -> bool:
+        return True
+
+    def warm_up(self):
+        """预先启动全部子进程，不等待完成"""
+        try:
+            for _ in range(self.max_workers):
+                self.executor.submit(DecodeService._ping)
+        except Exception as e:
+            logger.error('Error starting decode workers: %s', e)
+
+    def _take_buffer(self, size: int) -> shared_memory.SharedMemory:
+        with self._lock:
+            free = self._buffers.get(size)
+            if free:
+                return free.pop()
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def _return_buffer(self, size: int, buffer: shared_memory.SharedMemory):
+        # 按申请的大小归还，有的系统会把共享内存的大小向上取整到页大小
+        with self._lock:
+            free = self._buffers.setdefault(size, [])
+            if not self._closed and len(free) < self.max_workers:
+                free.append(buffer)
+                return
+        buffer.close()
+        buffer.unlink()
+
+    @staticmethod
+    def _decode_into(file_path: str, buffer_name: str, max_width: int, max_height: int,
+                     thumbnail: bool) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """在子进程中解码并缩放图片，像素写入共享内存
+        返回:
+            (模式, 尺寸)，无法解码时返回None
+        """
+        from utils.image_utils import ImageUtils
+
+        image = ImageUtils.decode_fit(file_path, max_width, max_height, thumbnail)
+        if image is None:
+            return None
+        buffer = shared_memory.SharedMemory(name=buffer_name)
+        try:
+            data = image.tobytes()
+            buffer.buf[:len(data)] = data
+        finally:
+            buffer.close()
+        return image.mode, image.size
+
+    def decode(self, file_path: str, max_width: int, max_height: int, thumbnail: bool = False):
+        """解码图片并缩小到不超过指定尺寸，可以在多个线程中同时调用
+
+        参数:
+            thumbnail: 为 True 时使用较快的缩放算法，用于缩略图
+        返回:
+            PIL.Image.Image，无法解码时返回None
+        """
+        from PIL import Image
+        from utils.image_utils import ImageUtils
+
+        buffer_size = max_width * max_height * self.MAX_BYTES_PER_PIXEL
+        buffer = self._take_buffer(buffer_size)
+        try:
+            with Perf.span('decode.process'):
+                result = self.executor.submit(DecodeService._decode_into, file_path, buffer.name,
+                                              max_width, max_height, thumbnail).result()
+            if result is None:
+                return None
+            mode, size = result
+            with Perf.span('decode.shared_memory'):
+                length = size[0] * size[1] * len(mode)
+                return Image.frombytes(mode, size, bytes(buffer.buf[:length]))
+        except BrokenProcessPool as e:
+            logger.error('Decode workers stopped, decoding in process: %s', e)
+            with self._lock:
+                self._executor = None
+            return ImageUtils.decode_fit(file_path, max_width, max_height, thumbnail)
+        finally:
+            self._return_buffer(buffer_size, buffer)
+
+    def thumbnail(self, file_path: str, size: int):
+        """生成缩略图，用作 ThumbnailLoader 的解码函数"""
+        return self.decode(file_path, size, size, thumbnail=True)
+
+    def close(self):
+        """停止子进程并释放共享内存，可以重复调用；正在解码的请求完成后释放其共享内存"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+            buffers = [buffer for free in self._buffers.values() for buffer in free]
+            self._buffers.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for buffer in buffers:
+            buffer.close()
+            buffer.unlink()
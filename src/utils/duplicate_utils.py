@@ -0,0 +1,99 @@
+import hashlib
+import logging
+from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from config.config import Config
+from utils.scan_utils import ScanEntry
+from utils.wechat_dat import WeChatDat
+
+logger = logging.getLogger(__name__)
+
+class DuplicateUtils:
+    # 先比较文件开头的部分哈希，相同时再计算完整哈希
+    PARTIAL_HASH_SIZE = 64 * 1024
+    READ_CHUNK_SIZE = 1024 * 1024
+
+    @staticmethod
+    def file_hash(file_path: str, limit: Optional[int] = None) -> Optional[str]:
+        """计算文件哈希
+        微信的 .dat 文件按解码后的内容计算，与导出的图片或其他账号中的同一张图片哈希相同
+        参数:
+            file_path: 文件路径
+            limit: 只读取前 limit 个字节，None 表示读取整个文件
+        """
+        try:
+            digest = hashlib.blake2b(digest_size=20)
+            remaining = limit
+            key = None
+            with open(file_path, 'rb') as f:
+                while remaining is None or remaining > 0:
+                    chunk_size = DuplicateUtils.READ_CHUNK_SIZE if remaining is None else min(remaining, DuplicateUtils.READ_CHUNK_SIZE)
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    if key is None:
+                        detected = WeChatDat.detect_key(chunk[:WeChatDat.HEADER_SIZE]) if WeChatDat.is_dat(file_path) else None
+                        key = detected[0] if detected else 0
+                    if key:
+                        chunk = WeChatDat.decode(chunk, key)
+                    digest.update(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+            return digest.hexdigest()
+        except OSError as e:
+            logger.error('Error hashing %s: %s', file_path, e)
+            return None
+
+    @staticmethod
+    def _group_by_hash(groups: List[List[ScanEntry]], limit: Optional[int], executor) -> List[List[ScanEntry]]:
+        """在每组内按哈希再分组，丢弃只有一个文件的组"""
+        entries = [entry for group in groups for entry in group]
+        # 只传递路径，线程池和进程池都可以使用
+        chunksize = max(1, min(64, len(entries) // 32))
+        hashes = executor.map(DuplicateUtils.file_hash, [entry.path for entry in entries],
+                              [limit] * len(entries), chunksize=chunksize)
+
+        buckets = defaultdict(list)
+        for entry, digest in zip(entries, hashes):
+            if digest is not None:
+                buckets[(entry.size, digest)].append(entry)
+        return [group for group in buckets.values() if len(group) > 1]
+
+    @staticmethod
+    def _group_by_hash_stages(groups: List[List[ScanEntry]], executor: Executor) -> List[List[ScanEntry]]:
+        """先按部分哈希、再按完整哈希分组"""
+        groups = DuplicateUtils._group_by_hash(groups, DuplicateUtils.PARTIAL_HASH_SIZE, executor)
+        # 小文件的部分哈希已经覆盖全部内容
+        small = [group for group in groups if group[0].size <= DuplicateUtils.PARTIAL_HASH_SIZE]
+        large = [group for group in groups if group[0].size > DuplicateUtils.PARTIAL_HASH_SIZE]
+        return small + DuplicateUtils._group_by_hash(large, None, executor)
+
+    @staticmethod
+    def find_duplicate_groups(entries: Iterable[ScanEntry], max_workers: Optional[int] = None,
+                              executor: Optional[Executor] = None) -> List[List[ScanEntry]]:
+        """查找内容相同的文件
+        依次按大小、部分哈希、完整哈希分组，只有大小相同的文件才会被读取。
+        参数:
+            max_workers: 线程数，默认 Config.MAX_WORKERS
+            executor: 用于计算哈希的线程池或进程池（例如 DecodeService 的进程池），提供时不另建线程池
+        返回:
+            List[List[ScanEntry]]: 重复文件组，组内按修改时间和路径排序，第一个为保留文件
+        """
+        by_size = defaultdict(list)
+        for entry in entries:
+            by_size[entry.size].append(entry)
+        groups = [group for group in by_size.values() if len(group) > 1]
+        if not groups:
+            return []
+
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=max_workers or Config.MAX_WORKERS) as executor:
+                groups = DuplicateUtils._group_by_hash_stages(groups, executor)
+        else:
+            groups = DuplicateUtils._group_by_hash_stages(groups, executor)
+
+        for group in groups:
+            group.sort(key=lambda entry: (entry.mtime, len(entry.path), entry.path))
+        return groups
@@ -1,8 +1,34 @@
 import os
+import re
+import time
 from datetime import datetime
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List
+
+from config.config import Config
 
 class FileUtils:
+    SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+                  'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+    @staticmethod
+    def parse_size(value: str) -> int:
+        """解析大小，例如 500K、2MB、1G，格式无效时抛出 ValueError"""
+        match = re.fullmatch(r'\s*([\d.]+)\s*([A-Za-z]*)\s*', value)
+        if not match or match.group(2).upper() not in FileUtils.SIZE_UNITS:
+            raise ValueError(f'无效的大小: {value}')
+        return int(float(match.group(1)) * FileUtils.SIZE_UNITS[match.group(2).upper()])
+
+    @staticmethod
+    def parse_time(value: str) -> float:
+        """解析时间，支持天数（例如 30d）或日期（例如 2024-01-31），格式无效时抛出 ValueError"""
+        match = re.fullmatch(r'\s*(\d+)\s*d\s*', value)
+        if match:
+            return time.time() - int(match.group(1)) * 86400
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            raise ValueError(f'无效的时间: {value}')
+
     @staticmethod
     def format_size(size: int) -> str:
         """格式化文件大小"""
@@ -59,29 +85,21 @@ class FileUtils:
         
         return related_files
     
+    @staticmethod
+    def folder_label(folder_path: str) -> str:
+        """扫描根目录的简短名称，微信的 Message 目录显示所属账号"""
+        folder_path = os.path.normpath(folder_path)
+        for layout in Config.WECHAT_LAYOUTS:
+            if folder_path.endswith(os.sep + layout):
+                account = os.path.basename(folder_path[:-len(layout) - 1])
+                # 旧版的账号目录是 32 位哈希，只取前 8 位
+                if re.fullmatch(r'[0-9a-f]{32}', account):
+                    return account[:8]
+                return account
+        return os.path.basename(folder_path) or folder_path
+
     @staticmethod
     def find_wechat_folders(base_path: str) -> list:
-        """查找微信的Message文件夹"""
-        message_folders = []
-        
-        if not os.path.exists(base_path):
-            return []
-            
-        # 遍历版本目录
-        for version in os.listdir(base_path):
-            version_path = os.path.join(base_path, version)
-            if not os.path.isdir(version_path):
-                continue
-                
-            # 遍历用户目录
-            for user_dir in os.listdir(version_path):
-                user_path = os.path.join(version_path, user_dir)
-                if not os.path.isdir(user_path):
-                    continue
-                    
-                # 检查Message文件夹
-                message_path = os.path.join(user_path, "Message")
-                if os.path.exists(message_path):
-                    message_folders.append(message_path)
-        
-        return message_folders
+        """查找微信的图片文件夹（不使用缓存），参见 WeChatDiscovery"""
+        from utils.wechat_discovery import WeChatDiscovery
+        return WeChatDiscovery.find_folders([base_path], use_cache=False)
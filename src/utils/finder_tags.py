@@ -0,0 +1,283 @@
+import errno
+import logging
+import os
+import plistlib
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Finder 标签保存在此扩展属性中，值为字符串数组的二进制 plist，每项为 "名称\n颜色编号"
+FINDER_TAGS_XATTR = 'com.apple.metadata:_kMDItemUserTags'
+
+# Finder 颜色编号
+FINDER_COLORS = {
+    'Gray': 1,
+    'Green': 2,
+    'Purple': 3,
+    'Blue': 4,
+    'Yellow': 5,
+    'Red': 6,
+    'Orange': 7
+}
+
+class XattrBackend:
+    """扩展属性读写接口"""
+    name = 'none'
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        """读取 Finder 标签属性，不存在时返回None"""
+        return None
+
+    def set(self, file_path: str, value: bytes):
+        """写入 Finder 标签属性"""
+
+    def remove(self, file_path: str):
+        """删除 Finder 标签属性，不存在时忽略"""
+
+class DarwinXattrBackend(XattrBackend):
+    """macOS：通过 libc 直接读写扩展属性，不启动子进程"""
+    name = 'darwin'
+    XATTR_NOFOLLOW = 0x0001
+    ENOATTR = 93
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._getxattr = libc.getxattr
+        self._getxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p,
+                                   ctypes.c_size_t, ctypes.c_uint32, ctypes.c_int]
+        self._getxattr.restype = ctypes.c_ssize_t
+        self._setxattr = libc.setxattr
+        self._setxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p,
+                                   ctypes.c_size_t, ctypes.c_uint32, ctypes.c_int]
+        self._setxattr.restype = ctypes.c_int
+        self._removexattr = libc.removexattr
+        self._removexattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        self._removexattr.restype = ctypes.c_int
+        self._name = FINDER_TAGS_XATTR.encode('utf-8')
+
+    def _raise(self, file_path: str):
+        code = self._ctypes.get_errno()
+        raise OSError(code, os.strerror(code), file_path)
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        path = os.fsencode(file_path)
+        size = self._getxattr(path, self._name, None, 0, 0, self.XATTR_NOFOLLOW)
+        if size < 0:
+            if self._ctypes.get_errno() == self.ENOATTR:
+                return None
+            self._raise(file_path)
+        buffer = self._ctypes.create_string_buffer(size)
+        size = self._getxattr(path, self._name, buffer, size, 0, self.XATTR_NOFOLLOW)
+        if size < 0:
+            self._raise(file_path)
+        return buffer.raw[:size]
+
+    def set(self, file_path: str, value: bytes):
+        if self._setxattr(os.fsencode(file_path), self._name, value, len(value), 0, self.XATTR_NOFOLLOW) != 0:
+            self._raise(file_path)
+
+    def remove(self, file_path: str):
+        if self._removexattr(os.fsencode(file_path), self._name, self.XATTR_NOFOLLOW) != 0:
+            if self._ctypes.get_errno() != self.ENOATTR:
+                self._raise(file_path)
+
+class LinuxXattrBackend(XattrBackend):
+    """Linux：使用 user 命名空间的扩展属性，便于在 Linux 上测试同步流程"""
+    name = 'linux'
+    ATTR_NAME = 'user.' + FINDER_TAGS_XATTR
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        try:
+            return os.getxattr(file_path, self.ATTR_NAME, follow_symlinks=False)
+        except OSError as e:
+            if e.errno == errno.ENODATA:
+                return None
+            raise
+
+    def set(self, file_path: str, value: bytes):
+        os.setxattr(file_path, self.ATTR_NAME, value, follow_symlinks=False)
+
+    def remove(self, file_path: str):
+        try:
+            os.removexattr(file_path, self.ATTR_NAME, follow_symlinks=False)
+        except OSError as e:
+            if e.errno != errno.ENODATA:
+                raise
+
+class MemoryXattrBackend(XattrBackend):
+    """内存实现，用于测试"""
+    name = 'memory'
+
+    def __init__(self):
+        self.values: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        with self._lock:
+            return self.values.get(file_path)
+
+    def set(self, file_path: str, value: bytes):
+        with self._lock:
+            self.values[file_path] = value
+
+    def remove(self, file_path: str):
+        with self._lock:
+            self.values.pop(file_path, None)
+
+class FinderTags:
+    _backend = None
+
+    @staticmethod
+    def get_backend() -> XattrBackend:
+        """按配置和平台选择扩展属性后端"""
+        if FinderTags._backend is None:
+            name = Config.FINDER_TAG_BACKEND
+            if name == 'auto':
+                name = {'darwin': 'darwin', 'linux': 'linux'}.get(sys.platform, 'none')
+            backends = {
+                'darwin': DarwinXattrBackend,
+                'linux': LinuxXattrBackend,
+                'memory': MemoryXattrBackend,
+                'none': XattrBackend
+            }
+            FinderTags._backend = backends[name]()
+        return FinderTags._backend
+
+    @staticmethod
+    def set_backend(backend: XattrBackend):
+        """替换扩展属性后端（测试时使用内存实现）"""
+        FinderTags._backend = backend
+
+    @staticmethod
+    def decode(value: Optional[bytes]) -> List[str]:
+        """解析属性值，返回 "名称\\n颜色编号" 列表"""
+        if not value:
+            return []
+        try:
+            tags = plistlib.loads(value)
+            return [tag for tag in tags if isinstance(tag, str)]
+        except Exception:
+            return []
+
+    @staticmethod
+    def encode(tags: List[str]) -> bytes:
+        return plistlib.dumps(tags, fmt=plistlib.FMT_BINARY)
+
+    @staticmethod
+    def color_name(tag: str) -> str:
+        return tag.split('\n', 1)[0]
+
+    @staticmethod
+    def get_color_tag(file_path: str) -> Optional[str]:
+        """读取文件的颜色标签名称（本工具只管理七种颜色标签）"""
+        for tag in FinderTags.decode(FinderTags.get_backend().get(file_path)):
+            if FinderTags.color_name(tag) in FINDER_COLORS:
+                return FinderTags.color_name(tag)
+        return None
+
+    @staticmethod
+    def apply(file_path: str, tag_name: Optional[str]):
+        """设置文件的颜色标签，保留用户自定义的其他标签
+        参数:
+            file_path: 文件路径
+            tag_name: 颜色名称，None 表示清除颜色标签
+        """
+        backend = FinderTags.get_backend()
+        current = FinderTags.decode(backend.get(file_path))
+        tags = [tag for tag in current if FinderTags.color_name(tag) not in FINDER_COLORS]
+        if tag_name:
+            tags.insert(0, f'{tag_name}\n{FINDER_COLORS[tag_name]}')
+        if tags == current:
+            return
+        if tags:
+            backend.set(file_path, FinderTags.encode(tags))
+        else:
+            backend.remove(file_path)
+
+class FinderTagSync:
+    """Finder 标签同步
+
+    标签索引写入成功后把变更放入队列，由后台线程批量写入扩展属性，
+    同一文件的多次变更只写最后一次。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(FinderTagSync, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, file_paths: Iterable[str], tag_name: Optional[str]):
+        """放入待同步的变更，立即返回
+        参数:
+            file_paths: 文件路径列表
+            tag_name: 颜色名称，None 表示清除颜色标签
+        """
+        if not Config.FINDER_TAG_SYNC:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='FinderTagSync')
+                self._thread.daemon = True
+                self._thread.start()
+        for file_path in file_paths:
+            self._queue.put((file_path, tag_name))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的变更全部写入（命令行退出前调用）
+        返回:
+            bool: 是否在超时前完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _take_batch(self) -> List[Tuple[str, Optional[str]]]:
+        """取出一批变更，阻塞直到至少有一个"""
+        batch = [self._queue.get()]
+        while len(batch) < Config.FINDER_TAG_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """后台线程主循环"""
+        while True:
+            batch = self._take_batch()
+            # 同一文件只保留最后一次变更
+            latest = dict(batch)
+            failed = 0
+            for file_path, tag_name in latest.items():
+                try:
+                    FinderTags.apply(file_path, tag_name)
+                except OSError as e:
+                    failed += 1
+                    logger.debug('Error writing Finder tag for %s: %s', file_path, e)
+            if failed:
+                logger.warning('Failed to write Finder tags for %s of %s files', failed, len(latest))
+            for _ in batch:
+                self._queue.task_done()
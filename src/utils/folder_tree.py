@@ -0,0 +1,94 @@
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+class FolderTree:
+    """按目录汇总扫描结果
+
+    每个目录节点记录其下（包括子目录）的文件数和总大小。扫描过程中每加入一个文件，
+    就沿着“所在目录 → 扫描根目录”这条链累加，链按目录缓存，所以汇总与扫描同步增量完成。
+    发生变化的节点记录下来，界面只刷新这些节点。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """清空全部数据"""
+        self._roots: List[str] = []
+        self._counts: Dict[str, int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._parents: Dict[str, Optional[str]] = {}
+        self._children: Dict[Optional[str], Set[str]] = {None: set()}
+        self._chains: Dict[str, Tuple[str, ...]] = {}
+        self._dirty: Set[str] = set()
+
+    def add_root(self, path: str):
+        """添加扫描根目录，根目录下的目录都汇总到它"""
+        path = os.path.normpath(path)
+        if path not in self._roots:
+            self._roots.append(path)
+            self._register(path, None)
+
+    def _root_of(self, dir_path: str) -> Optional[str]:
+        for root in self._roots:
+            if dir_path == root or dir_path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    def _register(self, path: str, parent: Optional[str]):
+        if path in self._parents:
+            return
+        self._parents[path] = parent
+        self._counts[path] = 0
+        self._bytes[path] = 0
+        self._children.setdefault(parent, set()).add(path)
+        self._dirty.add(path)
+
+    def _chain(self, dir_path: str) -> Tuple[str, ...]:
+        """从目录到根目录的节点链，不在任何根目录下的目录自成一个顶层节点"""
+        chain = self._chains.get(dir_path)
+        if chain is not None:
+            return chain
+        path = os.path.normpath(dir_path)
+        root = self._root_of(path)
+        nodes = [path]
+        if root is not None:
+            node = path
+            while node != root:
+                node = os.path.dirname(node)
+                nodes.append(node)
+        for child, parent in zip(nodes, nodes[1:] + [None]):
+            self._register(child, parent)
+        chain = self._chains[dir_path] = tuple(nodes)
+        return chain
+
+    def add(self, dir_path: str, size: int, count: int = 1):
+        """把文件计入所在目录及其上级目录，删除文件时传入负数"""
+        chain = self._chain(dir_path)
+        counts = self._counts
+        totals = self._bytes
+        for node in chain:
+            counts[node] += count
+            totals[node] += size
+        self._dirty.update(chain)
+
+    def take_dirty(self) -> Set[str]:
+        """取出上次调用以来发生变化的节点"""
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+    def parent(self, path: str) -> Optional[str]:
+        return self._parents.get(path)
+
+    def children(self, path: Optional[str] = None) -> List[str]:
+        """子目录，按总大小降序排列；path 为 None 时返回顶层节点"""
+        children = self._children.get(path, ())
+        return sorted(children, key=lambda child: (-self._bytes[child], child))
+
+    def has_children(self, path: str) -> bool:
+        return bool(self._children.get(path))
+
+    def totals(self, path: str) -> Tuple[int, int]:
+        """(文件数, 总大小)"""
+        return self._counts.get(path, 0), self._bytes.get(path, 0)
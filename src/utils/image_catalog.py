@@ -0,0 +1,301 @@
+import os
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.file_utils import FileUtils
+
+class Bitset:
+    """按位存储的布尔列，每行占 1 位"""
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def clear(self):
+        self._bits = bytearray()
+
+    def get(self, index: int) -> bool:
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (index & 7)))
+
+    def set(self, index: int, value: bool = True):
+        byte = index >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte - len(self._bits) + 1))
+        if value:
+            self._bits[byte] |= 1 << (index & 7)
+        else:
+            self._bits[byte] &= ~(1 << (index & 7)) & 0xFF
+
+class ImageCatalog:
+    """扫描结果的紧凑内存模型
+
+    每个文件一行，按列存储：目录编号、文件名、大小、修改时间和根目录编号分别放在并行的数组中，
+    目录字符串只保存一份，标记和删除状态用位图表示，每个目录另有文件名到行号的映射用于按路径查找。
+    同时扫描多个根目录（例如多个微信账号）时，每行记录所属的根目录。显示用的字符串只在行可见时才生成。
+    删除的行只做标记（墓碑），行号保持不变，撤销删除时可以直接恢复。
+
+    view 是当前排序和筛选后的行号列表，列表控件按位置从 view 中取行。
+    """
+    # 与 Config.COLUMNS 顺序对应的列
+    COLUMN_KEYS = ['mark', 'name', 'size', 'mtime', 'root', 'path']
+
+    def __init__(self):
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        """清空全部数据"""
+        # 每次清空后递增，依赖行号的索引据此判断是否需要重建
+        self.generation += 1
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        # 下标为目录编号，值为该目录中文件名到行号的映射
+        self._dir_rows: List[Dict[str, int]] = []
+        self._dir_index = array('l')
+        self._names: List[str] = []
+        self._sizes = array('q')
+        self._mtimes = array('q')
+        self._root_index = array('h')
+        self._roots: List[str] = []
+        self._marks = Bitset()
+        self._deleted = Bitset()
+        self._deleted_count = 0
+        self.view = array('l')
+        self.sort_key: Optional[str] = None
+        self.sort_reverse = False
+        self._filter: Optional[Callable[[int], bool]] = None
+
+    # 行数据
+
+    @property
+    def row_count(self) -> int:
+        """行总数（包括已删除的行）"""
+        return len(self._names)
+
+    @property
+    def alive_count(self) -> int:
+        """未删除的行数"""
+        return len(self._names) - self._deleted_count
+
+    def __len__(self) -> int:
+        """当前视图中的行数"""
+        return len(self.view)
+
+    def add_root(self, label: str) -> int:
+        """登记一个根目录，返回根目录编号"""
+        self._roots.append(label)
+        return len(self._roots) - 1
+
+    def add(self, path: str, size: int, mtime: float, marked: bool = False,
+            position: Optional[int] = None, root: int = 0) -> int:
+        """添加一行，新行插入视图的指定位置，默认追加到末尾（有筛选条件时只在满足条件时加入）
+        返回:
+            int: 行号
+        """
+        dir_path, name = os.path.split(path)
+        dir_id = self._dir_ids.get(dir_path)
+        if dir_id is None:
+            dir_id = self._dir_ids[dir_path] = len(self._dirs)
+            self._dirs.append(dir_path)
+            self._dir_rows.append({})
+        row = len(self._names)
+        # 同一路径有多行时保留未删除的那一行
+        name_rows = self._dir_rows[dir_id]
+        existing = name_rows.get(name)
+        if existing is None or self._deleted.get(existing):
+            name_rows[name] = row
+        self._dir_index.append(dir_id)
+        self._names.append(name)
+        self._sizes.append(size)
+        self._mtimes.append(int(mtime))
+        self._root_index.append(root)
+        if marked:
+            self._marks.set(row)
+        if self._filter is None or self._filter(row):
+            self._insert_view(row, position)
+        return row
+
+    def path(self, row: int) -> str:
+        return os.path.join(self._dirs[self._dir_index[row]], self._names[row])
+
+    def dir(self, row: int) -> str:
+        return self._dirs[self._dir_index[row]]
+
+    def dir_id(self, row: int) -> int:
+        return self._dir_index[row]
+
+    def name(self, row: int) -> str:
+        return self._names[row]
+
+    def size(self, row: int) -> int:
+        return self._sizes[row]
+
+    def mtime(self, row: int) -> int:
+        return self._mtimes[row]
+
+    def dirs(self) -> List[str]:
+        """所有目录，下标即目录编号"""
+        return self._dirs
+
+    def rows_in_dirs(self, dir_ids: Iterable[int]) -> List[int]:
+        """属于指定目录的行（包括已删除的行）"""
+        dir_ids = set(dir_ids)
+        return [row for row, dir_id in enumerate(self._dir_index) if dir_id in dir_ids]
+
+    def root(self, row: int) -> int:
+        return self._root_index[row]
+
+    def root_label(self, row: int) -> str:
+        root = self._root_index[row]
+        return self._roots[root] if root < len(self._roots) else ''
+
+    def is_marked(self, row: int) -> bool:
+        return self._marks.get(row)
+
+    def set_marked(self, row: int, marked: bool):
+        self._marks.set(row, marked)
+
+    def is_deleted(self, row: int) -> bool:
+        return self._deleted.get(row)
+
+    def rows(self) -> Iterator[int]:
+        """遍历未删除的行"""
+        for row in range(len(self._names)):
+            if not self._deleted.get(row):
+                yield row
+
+    def find(self, path: str, include_deleted: bool = False) -> Optional[int]:
+        """按路径查找行号，找不到时返回None"""
+        dir_path, name = os.path.split(path)
+        dir_id = self._dir_ids.get(dir_path)
+        if dir_id is None:
+            return None
+        row = self._dir_rows[dir_id].get(name)
+        if row is None or (not include_deleted and self._deleted.get(row)):
+            return None
+        return row
+
+    def find_many(self, paths: Iterable[str], include_deleted: bool = False) -> Dict[str, int]:
+        """批量按路径查找行号
+        参数:
+            include_deleted: 是否也查找已删除的行，同一路径有多行时优先返回未删除的行
+        返回:
+            Dict[str, int]: 找到的路径到行号的映射
+        """
+        found = {}
+        for path in paths:
+            row = self.find(path, include_deleted)
+            if row is not None:
+                found[path] = row
+        return found
+
+    def display_row(self, row: int) -> Tuple[str, str, str, str, str, str]:
+        """生成一行的显示内容，与 Config.COLUMNS 顺序一致"""
+        return (
+            '★' if self._marks.get(row) else '',
+            self._names[row],
+            FileUtils.format_size(self._sizes[row]),
+            datetime.fromtimestamp(self._mtimes[row]).strftime('%Y-%m-%d %H:%M:%S'),
+            self.root_label(row),
+            self.path(row)
+        )
+
+    # 删除和恢复
+
+    def remove(self, rows: Iterable[int]) -> Dict[int, int]:
+        """把行标记为已删除并移出视图
+        返回:
+            Dict[int, int]: 行号到删除前视图位置的映射，用于撤销时插回原处
+        """
+        rows = [row for row in rows if not self._deleted.get(row)]
+        positions = self.view_positions(rows)
+        for row in rows:
+            self._deleted.set(row)
+        self._deleted_count += len(rows)
+
+        if len(rows) <= 16:
+            # 少量删除直接从视图中移除，查找和移动都在 C 中完成
+            for row in rows:
+                if row in positions:
+                    self.view.remove(row)
+        else:
+            self.view = array('l', (row for row in self.view if not self._deleted.get(row)))
+        return positions
+
+    def revive(self, row: int, position: Optional[int] = None, size: int = None, mtime: float = None):
+        """恢复已删除的行，插回视图中的指定位置（默认追加到末尾）"""
+        if not self._deleted.get(row):
+            return
+        self._deleted.set(row, False)
+        self._deleted_count -= 1
+        if size is not None:
+            self._sizes[row] = size
+        if mtime is not None:
+            self._mtimes[row] = int(mtime)
+        if self._filter is None or self._filter(row):
+            self._insert_view(row, position)
+
+    def _insert_view(self, row: int, position: Optional[int]):
+        if position is None or position >= len(self.view):
+            self.view.append(row)
+        else:
+            self.view.insert(max(0, position), row)
+
+    # 视图
+
+    def view_row(self, position: int) -> int:
+        return self.view[position]
+
+    def view_position(self, row: int) -> Optional[int]:
+        """行在视图中的位置，不在视图中时返回None"""
+        try:
+            return self.view.index(row)
+        except ValueError:
+            return None
+
+    def view_positions(self, rows: Iterable[int]) -> Dict[int, int]:
+        """批量获取行在视图中的位置，不在视图中的行不包含在结果里"""
+        rows = set(rows)
+        if len(rows) <= 16:
+            positions = {row: self.view_position(row) for row in rows}
+            return {row: position for row, position in positions.items() if position is not None}
+        return {row: position for position, row in enumerate(self.view) if row in rows}
+
+    def _sort_key_func(self, key: str) -> Callable[[int], object]:
+        if key == 'size':
+            return self._sizes.__getitem__
+        if key == 'mtime':
+            return self._mtimes.__getitem__
+        if key == 'name':
+            return self._names.__getitem__
+        if key == 'mark':
+            return self._marks.get
+        if key == 'root':
+            return lambda row: (self.root_label(row), self._names[row])
+        if key == 'path':
+            return lambda row: (self._dirs[self._dir_index[row]], self._names[row])
+        raise ValueError(f'Unknown sort key: {key}')
+
+    def sort(self, key: Optional[str], reverse: bool = False):
+        """按列排序视图，key 为 None 时恢复扫描顺序"""
+        self.sort_key = key
+        self.sort_reverse = reverse
+        self.rebuild_view()
+
+    def set_filter(self, predicate: Optional[Callable[[int], bool]]):
+        """设置筛选条件，None 表示不筛选"""
+        self._filter = predicate
+        self.rebuild_view()
+
+    def rebuild_view(self):
+        """按筛选条件和排序重建视图"""
+        rows = self.rows()
+        if self._filter is not None:
+            rows = filter(self._filter, rows)
+        if self.sort_key is None:
+            self.view = array('l', rows)
+            if self.sort_reverse:
+                self.view.reverse()
+        else:
+            self.view = array('l', sorted(rows, key=self._sort_key_func(self.sort_key), reverse=self.sort_reverse))
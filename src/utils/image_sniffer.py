@@ -0,0 +1,136 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from config.config import Config
+from utils.perf import Perf
+from utils.scan_snapshot import ScanSnapshot
+from utils.wechat_dat import WeChatDat
+
+logger = logging.getLogger(__name__)
+
+class ImageSniffer:
+    """按文件头识别没有图片扩展名的图片
+
+    微信经常把图片保存为没有扩展名或扩展名不对的文件，或者加密保存为 .dat 文件（参见 WeChatDat）。
+    扩展名在 Config.SNIFF_EXTENSIONS 中的文件只读取开头 16 字节判断格式，读取在一个固定大小的线程池中进行。
+    识别结果保存在扫描快照中，下次扫描时大小和修改时间没有变化的文件不再读取。
+
+    一次扫描使用一个实例，扫描结束后调用 close 写回快照。
+    """
+
+    HEADER_SIZE = 16
+
+    def __init__(self, roots: Iterable[str], max_workers: Optional[int] = None,
+                 snapshot: Optional[ScanSnapshot] = None):
+        """
+        参数:
+            roots: 本次扫描的根目录，用于读取快照中的记录
+            max_workers: 读取文件头的线程数，默认 Config.SNIFF_WORKERS
+            snapshot: 扫描快照，默认使用全局实例
+        """
+        self.snapshot = snapshot or ScanSnapshot()
+        with Perf.span('scan.sniff.load'):
+            self._known = self.snapshot.load(roots)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._new: List[Tuple[str, int, float, str]] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or Config.SNIFF_WORKERS,
+                                            thread_name_prefix='sniff')
+        self.hits = 0
+        self.reads = 0
+        self.found = 0
+
+    @staticmethod
+    def detect(header: bytes) -> str:
+        """根据文件头判断图片格式
+        返回:
+            str: 对应的扩展名，例如 .jpg，不是已知的图片格式时返回空字符串
+        """
+        if header[:3] == b'\xff\xd8\xff':
+            return '.jpg'
+        if header[:8] == b'\x89PNG\r\n\x1a\n':
+            return '.png'
+        if header[:6] in (b'GIF87a', b'GIF89a'):
+            return '.gif'
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            return '.webp'
+        if header[:2] == b'BM' and len(header) >= 14:
+            return '.bmp'
+        return ''
+
+    @staticmethod
+    def sniff_file(file_path: str) -> Optional[str]:
+        """读取文件头判断图片格式，文件无法读取时返回None
+        .dat 文件还会检查是否为微信加密的图片，返回解码后的格式
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                header = f.read(ImageSniffer.HEADER_SIZE)
+        except OSError:
+            return None
+        kind = ImageSniffer.detect(header)
+        if not kind and WeChatDat.is_dat(file_path):
+            detected = WeChatDat.detect_key(header)
+            if detected:
+                kind = detected[1]
+        return kind
+
+    def classify(self, candidates: List[Tuple[str, int, float]]) -> List[Optional[str]]:
+        """识别一组文件，可以在多个扫描线程中同时调用
+
+        参数:
+            candidates: (路径, 大小, 修改时间) 列表
+        返回:
+            与输入对应的扩展名列表，不是图片时为空字符串，无法读取时为None
+        """
+        kinds: List[Optional[str]] = []
+        misses = []
+        known = self._known
+        for index, (path, size, mtime) in enumerate(candidates):
+            record = known.get(path)
+            if record is not None and record[0] == size and record[1] == mtime:
+                kinds.append(record[2])
+            elif size == 0:
+                kinds.append('')
+            else:
+                kinds.append(None)
+                misses.append(index)
+
+        new = []
+        batch_size = Config.SNIFF_BATCH_SIZE
+        with Perf.span('scan.sniff'):
+            for start in range(0, len(misses), batch_size):
+                batch = misses[start:start + batch_size]
+                # 分批提交，线程池的等待队列不会随目录中的文件数增长
+                results = self._executor.map(ImageSniffer.sniff_file, [candidates[index][0] for index in batch])
+                for index, kind in zip(batch, results):
+                    kinds[index] = kind
+                    if kind is not None:
+                        path, size, mtime = candidates[index]
+                        new.append((path, size, mtime, kind))
+
+        with self._lock:
+            self._seen.update(path for path, _, _ in candidates)
+            self._new.extend(new)
+            self.hits += len(candidates) - len(misses)
+            self.reads += len(misses)
+            self.found += sum(1 for kind in kinds if kind)
+        return kinds
+
+    def close(self, complete: bool = True):
+        """结束扫描，把新的识别结果写回快照
+
+        参数:
+            complete: 扫描是否完整结束，完整扫描时同时删除快照中本次没有见到的文件的记录
+        """
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            removed = [path for path in self._known if path not in self._seen] if complete else []
+            new = self._new
+            self._new = []
+        if new or removed:
+            self.snapshot.save(new, removed)
+        logger.info('Sniffed %d files (%d cached, %d read), found %d images',
+                    self.hits + self.reads, self.hits, self.reads, self.found)
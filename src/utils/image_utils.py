@@ -1,13 +1,20 @@
 from PIL import Image, ImageTk
 from typing import Tuple, Optional
+from utils.perf import Perf
+from utils.wechat_dat import WeChatDat
 
 class ImageUtils:
     @staticmethod
+    @Perf.timed('image.load_and_resize')
     def load_and_resize_image(file_path: str, max_width: int, max_height: int) -> Optional[Tuple[ImageTk.PhotoImage, Image.Image]]:
         """加载并调整图片大小"""
         try:
-            # 加载图片
-            image = Image.open(file_path)
+            # 加载图片，微信的 .dat 文件先在内存中解码
+            with Perf.span('image.open'):
+                if WeChatDat.is_dat(file_path):
+                    image = WeChatDat.open_image(file_path)
+                else:
+                    image = Image.open(file_path)
             
             # 计算缩放比例，保持纵横比
             img_width, img_height = image.size
@@ -15,10 +22,41 @@ class ImageUtils:
             new_width = int(img_width * ratio)
             new_height = int(img_height * ratio)
             
-            # 调整图片大小
-            resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # 调整图片大小（解码在这里发生）
+            with Perf.span('image.resize'):
+                resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
             
             # 返回原始图片
             return image, resized_image
         except Exception:
             return None
+    
+    @staticmethod
+    def decode_fit(file_path: str, max_width: int, max_height: int, fast: bool = False) -> Optional[Image.Image]:
+        """解码图片并缩小到不超过指定尺寸，JPEG 用 draft 在解码时直接按比例缩小
+        参数:
+            fast: 使用较快的缩放算法（缩略图），否则使用 LANCZOS
+        返回:
+            模式为 L、RGB 或 RGBA 的图片，无法解码时返回None
+        """
+        try:
+            with Perf.span('image.open'):
+                if WeChatDat.is_dat(file_path):
+                    image = WeChatDat.open_image(file_path)
+                else:
+                    image = Image.open(file_path)
+            image.draft('RGB', (max_width, max_height))
+            resample = Image.Resampling.BILINEAR if fast else Image.Resampling.LANCZOS
+            with Perf.span('image.resize'):
+                image.thumbnail((max_width, max_height), resample)
+            if image.mode not in ('L', 'RGB', 'RGBA'):
+                has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+            return image
+        except Exception:
+            return None
+    
+    @staticmethod
+    def load_thumbnail(file_path: str, size: int) -> Optional[Image.Image]:
+        """生成缩略图"""
+        return ImageUtils.decode_fit(file_path, size, size, fast=True)
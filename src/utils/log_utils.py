@@ -0,0 +1,130 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config.config import Config
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class RateLimitFilter(logging.Filter):
+    """限制逐文件调试日志的数量
+
+    同一位置、同一消息模板、级别不高于 max_level 的日志在每个时间窗口内最多输出 burst 条，
+    其余的只计数；窗口结束后下一条同类日志到来时附带一条汇总，说明省略了多少条。
+    默认只限制 DEBUG 日志，INFO 及以上的日志不受限制。
+    """
+
+    def __init__(self, burst: int, interval: float, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self._lock = threading.Lock()
+        # (logger 名称, 消息模板) -> [窗口开始时间, 已输出条数, 已省略条数]
+        self._windows: Dict[Tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f'{record.msg} (上个 {self.interval:g} 秒内省略了 {suppressed} 条同类日志)'
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+class LogUtils:
+    _listener: Optional[logging.handlers.QueueListener] = None
+
+    @staticmethod
+    def parse_level(level) -> int:
+        """把 'DEBUG'、'info' 或数字转换为日志级别"""
+        if isinstance(level, int):
+            return level
+        value = logging.getLevelName(str(level).upper())
+        if not isinstance(value, int):
+            raise ValueError(f'Unknown log level: {level}')
+        return value
+
+    @staticmethod
+    def setup(log_file: str = None, console: bool = True):
+        """设置日志
+
+        日志记录先放入队列，由后台线程写入滚动日志文件和控制台，记录日志的线程不等待磁盘 I/O。
+        参数:
+            log_file: 日志文件路径，默认 Config.LOG_FILE
+            console: 是否同时输出到控制台
+        """
+        if LogUtils._listener is not None:
+            return
+        # 各模块的日志级别可以在设置文件中覆盖
+        from utils.settings_utils import SettingsUtils
+        SettingsUtils.load_settings()
+
+        log_file = log_file or Config.LOG_FILE
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+        try:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=Config.LOG_MAX_BYTES,
+                backupCount=Config.LOG_BACKUP_COUNT,
+                encoding='utf-8',
+                delay=True
+            )
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"无法创建日志文件：{str(e)}")
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(LogUtils.parse_level(Config.LOG_CONSOLE_LEVEL))
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RateLimitFilter(Config.LOG_RATE_LIMIT_BURST, Config.LOG_RATE_LIMIT_INTERVAL))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LogUtils.parse_level(Config.LOG_LEVEL))
+        LogUtils.apply_module_levels(Config.LOG_MODULE_LEVELS)
+
+        LogUtils._listener = logging.handlers.QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        LogUtils._listener.start()
+        atexit.register(LogUtils.shutdown)
+
+    @staticmethod
+    def apply_module_levels(levels: Dict[str, str]):
+        """设置各模块的日志级别，例如 {'utils.tag_index': 'DEBUG'}"""
+        for name, level in levels.items():
+            try:
+                logging.getLogger(name).setLevel(LogUtils.parse_level(level))
+            except ValueError as e:
+                logging.getLogger(__name__).warning('%s', e)
+
+    @staticmethod
+    def shutdown():
+        """写完队列中剩余的日志"""
+        if LogUtils._listener is not None:
+            LogUtils._listener.stop()
+            LogUtils._listener = None
@@ -1,10 +1,10 @@
 import logging
 import os
-import traceback
 from typing import List, Optional, Dict
 from .tag_index import TagIndex
+from .finder_tags import FinderTagSync
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class MacOSUtils:
     # macOS 标签颜色映射
@@ -40,8 +40,8 @@ class MacOSUtils:
             
             # 获取目录权限信息
             dir_stat = os.stat(dir_path)
-            logging.debug(f'Directory permissions: {oct(dir_stat.st_mode)}')
-            logging.debug(f'Directory owner: {dir_stat.st_uid}, group: {dir_stat.st_gid}')
+            logger.debug('Directory permissions: %s', oct(dir_stat.st_mode))
+            logger.debug('Directory owner: %s, group: %s', dir_stat.st_uid, dir_stat.st_gid)
             
             # 检查当前用户是否有读写执行权限
             if not os.access(dir_path, os.R_OK | os.W_OK | os.X_OK):
@@ -59,14 +59,6 @@ class MacOSUtils:
         except Exception as e:
             return False, f'Error checking directory permissions: {str(e)}'
 
-
-
-
-
-
-
-
-
     @staticmethod
     def set_tag(file_path: str, tag_key: str) -> bool:
         """设置文件的标签颜色
@@ -80,138 +72,78 @@ class MacOSUtils:
             # 获取标签信息
             tag_info = MacOSUtils.TAGS.get(tag_key)
             if not tag_info:
-                logging.error(f'Invalid tag key: {tag_key}')
+                logger.error('Invalid tag key: %s', tag_key)
                 return False
             
             tag_color, tag_symbol, tag_name = tag_info
             
-            # 不再设置系统标签
-            
-            # 设置自定义标签索引
+            # 设置自定义标签索引，Finder 标签由后台线程同步
             if MacOSUtils._get_tag_index().set_tag(file_path, tag_key, tag_name, tag_color):
-                logging.debug(f'Added {tag_color} tag {tag_symbol}')
+                logger.debug('Added %s tag %s', tag_color, tag_symbol)
+                FinderTagSync().enqueue([file_path], tag_color)
                 return True
             return False
             
         except Exception as e:
-            logging.error(f'Unexpected error while setting tag: {str(e)}')
-            logging.debug(f'Exception traceback: {traceback.format_exc()}')
+            logger.error('Unexpected error while setting tag: %s', e)
+            logger.debug('Exception traceback', exc_info=True)
+            return False
+
+    @staticmethod
+    def set_tags(file_paths: List[str], tag_key: str) -> bool:
+        """在一个事务中为多个文件设置同一标签
+        参数:
+            file_paths: 文件路径列表
+            tag_key: 标签键值（1-7）
+        返回:
+            bool: 是否设置成功
+        """
+        tag_info = MacOSUtils.TAGS.get(tag_key)
+        if not tag_info:
+            logger.error('Invalid tag key: %s', tag_key)
             return False
-        logging.debug(f'Setting tag {tag_key} for file {file_path}')
         
+        tag_color, _, tag_name = tag_info
         try:
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                logging.error(f'File does not exist: {file_path}')
+            if not MacOSUtils._get_tag_index().set_tags(
+                [(file_path, tag_key, tag_name, tag_color) for file_path in file_paths]
+            ):
                 return False
-            
-            # 获取标签颜色
-            tag_info = MacOSUtils.TAGS.get(tag_key)
-            if not tag_info:
-                logging.error(f'Invalid tag key: {tag_key}')
+            FinderTagSync().enqueue(file_paths, tag_color)
+            return True
+        except Exception as e:
+            logger.error('Error setting tags: %s', e)
+            return False
+
+    @staticmethod
+    def get_tags(file_paths: List[str]) -> Dict[str, Dict[str, str]]:
+        """批量获取文件的标签信息
+        参数:
+            file_paths: 文件路径列表
+        返回:
+            Dict[str, Dict[str, str]]: 有标签的文件路径到标签信息的映射
+        """
+        try:
+            return MacOSUtils._get_tag_index().get_tags(file_paths)
+        except Exception as e:
+            logger.error('Error getting tags: %s', e)
+            return {}
+
+    @staticmethod
+    def remove_tags(file_paths: List[str]) -> bool:
+        """在一个事务中移除多个文件的标签
+        参数:
+            file_paths: 文件路径列表
+        返回:
+            bool: 是否移除成功
+        """
+        try:
+            if not MacOSUtils._get_tag_index().remove_tags(file_paths):
                 return False
-            
-            tag_color, tag_symbol, tag_name = tag_info
-            
-            # 创建临时目录
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # 生成临时文件路径
-                temp_file = os.path.join(temp_dir, os.path.basename(file_path))
-                logging.debug(f'Using temporary file: {temp_file}')
-                
-                try:
-                    # 复制文件到临时目录
-                    shutil.copy2(file_path, temp_file)
-                    logging.debug('File copied to temporary location')
-                    
-                    # 在临时文件上设置标签
-                    script = f'''
-                    tell application "Finder"
-                        try
-                            set theFile to POSIX file "{temp_file}" as alias
-                            set label index of theFile to {tag_key}
-                            set tags of theFile to {{"{tag_name}"}}
-                            return true
-                        on error errMsg
-                            return errMsg
-                        end try
-                    end tell
-                    '''
-                    
-                    result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True)
-                    logging.debug(f'AppleScript result: {result.stdout}')
-                    
-                    if result.returncode != 0:
-                        logging.error(f'Failed to set tag via AppleScript: {result.stderr}')
-                        return False
-                    
-                    # 验证标签是否设置成功
-                    verify_script = f'''
-                    tell application "Finder"
-                        try
-                            set theFile to POSIX file "{temp_file}" as alias
-                            return label index of theFile
-                        on error errMsg
-                            return errMsg
-                        end try
-                    end tell
-                    '''
-                    
-                    verify_result = subprocess.run(['osascript', '-e', verify_script], capture_output=True, text=True)
-                    logging.debug(f'Verify result: {verify_result.stdout}')
-                    
-                    if verify_result.returncode != 0:
-                        logging.error('Failed to verify tag')
-                        return False
-                    
-                    # 尝试覆盖原文件
-                    try:
-                        shutil.copy2(temp_file, file_path)
-                        logging.debug('Tagged file copied back to original location')
-                    except PermissionError:
-                        # 如果没有写权限，尝试使用sudo
-                        cmd = ['sudo', 'cp', temp_file, file_path]
-                        cp_result = subprocess.run(cmd, capture_output=True, text=True)
-                        if cp_result.returncode != 0:
-                            logging.error(f'Failed to copy file back: {cp_result.stderr}')
-                            return False
-                        logging.debug('Tagged file copied back using sudo')
-                    
-                    # 使用xattr设置标签
-                    if MacOSUtils._set_finder_tags(file_path, tag_name):
-                        logging.debug('Successfully set Finder tags using xattr')
-                    else:
-                        logging.warning('Failed to set Finder tags using xattr')
-                    
-                    # 刷新Finder以显示更新
-                    MacOSUtils._refresh_finder(file_path)
-                    
-                    # 再次使用AppleScript设置标签，确保生效
-                    final_script = f'''
-                    tell application "Finder"
-                        try
-                            set theFile to POSIX file "{file_path}" as alias
-                            set label index of theFile to {tag_key}
-                            set tags of theFile to {{"{tag_name}"}}
-                            return true
-                        on error errMsg
-                            return errMsg
-                        end try
-                    end tell
-                    '''
-                    subprocess.run(['osascript', '-e', final_script], capture_output=True, text=True)
-                    
-                    logging.debug(f'Added {tag_color} tag {tag_symbol}')
-                    logging.debug('Tag set successfully')
-                    return True
-                    
-                except Exception as e:
-                    logging.error(f'Error during temporary file operations: {str(e)}')
-                    return False
-            
+            FinderTagSync().enqueue(file_paths, None)
+            return True
         except Exception as e:
-            logging.error(f'Unexpected error while setting tag: {str(e)}')
-            logging.debug(f'Exception traceback: {traceback.format_exc()}')
+            logger.error('Error removing tags: %s', e)
             return False
 
     @staticmethod
@@ -226,7 +158,7 @@ class MacOSUtils:
             # 从自定义标签索引获取标签
             return MacOSUtils._get_tag_index().get_tag(file_path)
         except Exception as e:
-            logging.error(f'Error getting tag: {str(e)}')
+            logger.error('Error getting tag: %s', e)
             return None
 
     @staticmethod
@@ -243,7 +175,7 @@ class MacOSUtils:
         try:
             return MacOSUtils._get_tag_index().get_files_by_tag(tag_key, tag_name)
         except Exception as e:
-            logging.error(f'Error getting files by tag: {str(e)}')
+            logger.error('Error getting files by tag: %s', e)
             return []
 
     @staticmethod
@@ -257,23 +189,27 @@ class MacOSUtils:
             bool: 是否移除成功
         """
         try:
-            # 不再移除系统标签
-            
-            # 移除自定义标签索引
-            return MacOSUtils._get_tag_index().remove_tag(file_path)
+            # 移除自定义标签索引，Finder 标签由后台线程同步
+            if not MacOSUtils._get_tag_index().remove_tag(file_path):
+                return False
+            FinderTagSync().enqueue([file_path], None)
+            return True
         except Exception as e:
-            logging.error(f'Error removing tag: {str(e)}')
+            logger.error('Error removing tag: %s', e)
             return False
 
     @staticmethod
-    def cleanup_tags() -> int:
-        """清理数据库中不存在的文件记录
+    def cleanup_tags(stats: Optional[dict] = None) -> int:
+        """清理数据库中不存在的文件记录，被移动的文件会保留标签
         
+        Args:
+            stats: 如果提供，写入 relinked（找回的记录数）
+            
         Returns:
             int: 清理的记录数量
         """
         try:
-            return MacOSUtils._get_tag_index().cleanup_missing_files()
+            return MacOSUtils._get_tag_index().cleanup_missing_files(stats)
         except Exception as e:
-            logging.error(f'Error cleaning up tags: {str(e)}')
+            logger.error('Error cleaning up tags: %s', e)
             return 0
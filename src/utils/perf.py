@@ -0,0 +1,184 @@
+import functools
+import json
+import logging
+import math
+import threading
+import time
+from typing import Dict, List
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class _Histogram:
+    """对数分桶的耗时直方图，从 1 微秒到约 100 秒，每个 2 倍区间分 4 个桶"""
+    MIN_SECONDS = 1e-6
+    BUCKETS_PER_DOUBLING = 4
+    BUCKET_COUNT = 4 * 27
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = min(self.BUCKET_COUNT - 1,
+                        int(math.log2(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DOUBLING))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """返回分位数（取所在桶的上界）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.max, self.MIN_SECONDS * 2 ** ((index + 1) / self.BUCKETS_PER_DOUBLING))
+        return self.max
+
+class _Span:
+    """计时上下文，退出时把耗时记入直方图"""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        Perf.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class _NullSpan:
+    """未启用时使用的空上下文，不做任何事"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Perf:
+    """热点路径计时和计数
+
+    未启用时 span() 直接返回共享的空上下文，只多一次属性判断。
+    用法:
+        with Perf.span('tags.get'):
+            ...
+        Perf.count('scan.files')
+    """
+    enabled = Config.PERF_ENABLED
+
+    _lock = threading.Lock()
+    _histograms: Dict[str, _Histogram] = {}
+    _counters: Dict[str, int] = {}
+
+    @staticmethod
+    def set_enabled(enabled: bool):
+        Perf.enabled = enabled
+
+    @staticmethod
+    def span(name: str):
+        """返回计时上下文"""
+        if not Perf.enabled:
+            return _NULL_SPAN
+        return _Span(name)
+
+    @staticmethod
+    def timed(name: str):
+        """计时装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not Perf.enabled:
+                    return func(*args, **kwargs)
+                with _Span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def record(name: str, seconds: float):
+        """记录一次耗时"""
+        with Perf._lock:
+            histogram = Perf._histograms.get(name)
+            if histogram is None:
+                histogram = Perf._histograms[name] = _Histogram()
+            histogram.add(seconds)
+
+    @staticmethod
+    def count(name: str, value: int = 1):
+        """累加计数"""
+        if not Perf.enabled:
+            return
+        with Perf._lock:
+            Perf._counters[name] = Perf._counters.get(name, 0) + value
+
+    @staticmethod
+    def reset():
+        with Perf._lock:
+            Perf._histograms.clear()
+            Perf._counters.clear()
+
+    @staticmethod
+    def snapshot() -> dict:
+        """返回各阶段的统计信息（秒）"""
+        with Perf._lock:
+            spans = {
+                name: {
+                    'count': histogram.count,
+                    'total': histogram.total,
+                    'p50': histogram.percentile(0.5),
+                    'p99': histogram.percentile(0.99),
+                    'max': histogram.max
+                }
+                for name, histogram in Perf._histograms.items()
+            }
+            return {'spans': spans, 'counters': dict(Perf._counters)}
+
+    @staticmethod
+    def summary(limit: int = 5) -> str:
+        """按总耗时排序的单行摘要，用于状态栏"""
+        spans = Perf.snapshot()['spans']
+        top: List[str] = []
+        for name, stats in sorted(spans.items(), key=lambda item: item[1]['total'], reverse=True)[:limit]:
+            top.append(f"{name} p50 {Perf.format_seconds(stats['p50'])} "
+                       f"p99 {Perf.format_seconds(stats['p99'])} ×{stats['count']}")
+        return ' | '.join(top) if top else '暂无性能数据'
+
+    @staticmethod
+    def format_seconds(seconds: float) -> str:
+        if seconds < 1e-3:
+            return f'{seconds * 1e6:.0f}µs'
+        if seconds < 1:
+            return f'{seconds * 1e3:.1f}ms'
+        return f'{seconds:.2f}s'
+
+    @staticmethod
+    def dump(file_path: str) -> bool:
+        """把统计信息写入 JSON 文件
+        返回:
+            bool: 是否写入成功
+        """
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(Perf.snapshot(), f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            logger.error('Error dumping perf stats: %s', e)
+            return False
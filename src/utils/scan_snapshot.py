@@ -0,0 +1,113 @@
+import sqlite3
+import os
+import logging
+import threading
+from typing import Dict, Iterable, Tuple
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class ScanSnapshot:
+    """扫描快照
+
+    记录扫描时按文件头识别过的文件（路径、大小、修改时间和识别结果），
+    下次扫描时大小和修改时间都没有变化的文件直接使用记录的结果，不需要再读取文件。
+    """
+    _instance = None
+
+    # 识别规则变化时增加版本号，旧版本的记录全部丢弃
+    SCHEMA_VERSION = 2
+
+    def __new__(cls, db_path: str = None):
+        if cls._instance is None:
+            cls._instance = super(ScanSnapshot, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, db_path: str = None):
+        if self._initialized:
+            return
+        self._initialized = True
+        """初始化扫描快照
+
+        Args:
+            db_path: 数据库文件路径，如果为None则使用 Config.SCAN_SNAPSHOT
+        """
+        if db_path is None:
+            db_path = Config.SCAN_SNAPSHOT
+
+        # 确保目录存在
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """初始化数据库表"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                cursor.execute('DROP TABLE IF EXISTS sniffed_files')
+                cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+            # kind 为识别出的图片扩展名，不是图片时为空字符串
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sniffed_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime REAL,
+                    kind TEXT
+                )
+            ''')
+            conn.commit()
+
+    @staticmethod
+    def _prefix_range(root: str) -> Tuple[str, str]:
+        """根目录下所有路径所在的主键范围"""
+        prefix = root.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def load(self, roots: Iterable[str]) -> Dict[str, Tuple[int, float, str]]:
+        """读取根目录下的全部记录
+
+        Returns:
+            Dict: 路径 -> (大小, 修改时间, 识别结果)
+        """
+        records = {}
+        try:
+            with self._connect() as conn:
+                for root in roots:
+                    low, high = self._prefix_range(root)
+                    for path, size, mtime, kind in conn.execute(
+                            'SELECT path, size, mtime, kind FROM sniffed_files WHERE path >= ? AND path < ?',
+                            (low, high)):
+                        records[path] = (size, mtime, kind)
+        except Exception as e:
+            logger.error('Error loading scan snapshot: %s', e)
+        return records
+
+    def save(self, records: Iterable[Tuple[str, int, float, str]], removed: Iterable[str] = ()) -> bool:
+        """写入新的识别结果，并删除已不存在的文件的记录
+
+        Args:
+            records: (路径, 大小, 修改时间, 识别结果) 列表
+            removed: 要删除记录的路径
+
+        Returns:
+            bool: 是否写入成功
+        """
+        try:
+            with self._lock, self._connect() as conn:
+                conn.executemany('INSERT OR REPLACE INTO sniffed_files (path, size, mtime, kind) VALUES (?, ?, ?, ?)',
+                                 records)
+                conn.executemany('DELETE FROM sniffed_files WHERE path = ?', ((path,) for path in removed))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error('Error saving scan snapshot: %s', e)
+            return False
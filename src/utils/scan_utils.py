@@ -0,0 +1,288 @@
+import fnmatch
+import os
+import re
+import stat
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+from config.config import Config
+from utils.image_sniffer import ImageSniffer
+from utils.perf import Perf
+
+# 扫描结果，只包含 stat 信息，不依赖 tkinter 和 PIL
+ScanEntry = namedtuple('ScanEntry', ['path', 'dir', 'name', 'size', 'mtime', 'dev', 'ino'])
+
+class ScanUtils:
+    @staticmethod
+    def is_image(filename: str, extensions: Optional[Set[str]] = None) -> bool:
+        """按扩展名判断是否为图片"""
+        if extensions is None:
+            extensions = Config.IMAGE_EXTENSIONS
+        return os.path.splitext(filename)[1].lower() in extensions
+
+    @staticmethod
+    def default_exclude_dirs(root: str) -> List[str]:
+        """扫描根目录时默认的排除规则
+        Config.SCAN_EXCLUDE_DIRS 是按微信的目录结构设置的，只用于查找到的微信图片文件夹（及其子目录），
+        其他文件夹中同名的目录（例如 Video）可能有图片，默认不排除
+        """
+        if not Config.SCAN_EXCLUDE_DIRS:
+            return []
+        from utils.wechat_discovery import WeChatDiscovery
+        return list(Config.SCAN_EXCLUDE_DIRS) if WeChatDiscovery.is_wechat_folder(root) else []
+
+    @staticmethod
+    def dir_filter(exclude_dirs: List[str],
+                   include_dirs: Optional[List[str]] = None) -> Callable[[str], bool]:
+        """根据目录规则生成判断函数，返回 True 表示进入该目录
+
+        规则是目录名的通配符（不区分大小写），例如 Audio、*.db。名称匹配排除规则的目录整个子树都不遍历，
+        除非同时匹配包含规则。
+        参数:
+            exclude_dirs: 排除规则，空列表表示不排除
+            include_dirs: 包含规则，默认 Config.SCAN_INCLUDE_DIRS
+        """
+        if include_dirs is None:
+            include_dirs = Config.SCAN_INCLUDE_DIRS
+        exclude = ScanUtils._compile_dir_patterns(exclude_dirs)
+        if exclude is None:
+            return lambda name: True
+        include = ScanUtils._compile_dir_patterns(include_dirs)
+        if include is None:
+            return lambda name: not exclude(name.lower())
+        return lambda name: not exclude(name.lower()) or bool(include(name.lower()))
+
+    @staticmethod
+    def _compile_dir_patterns(patterns: List[str]) -> Optional[Callable[[str], object]]:
+        """把通配符规则编译为一个匹配小写目录名的函数，没有规则时返回None
+        不含通配符的规则直接查集合，其余合并为一个正则
+        """
+        names = {pattern.lower() for pattern in patterns if not any(char in pattern for char in '*?[')}
+        globs = [fnmatch.translate(pattern.lower()) for pattern in patterns if any(char in pattern for char in '*?[')]
+        if not globs:
+            return names.__contains__ if names else None
+        regex = re.compile('|'.join(globs))
+        if not names:
+            return regex.match
+        return lambda name: name in names or regex.match(name)
+
+    @staticmethod
+    def _make_sniffer(roots: List[str], sniff: Optional[bool]) -> Optional[ImageSniffer]:
+        """按参数或 Config.SCAN_SNIFF 决定是否按文件头识别图片"""
+        if sniff is None:
+            sniff = Config.SCAN_SNIFF
+        return ImageSniffer(roots) if sniff else None
+
+    @staticmethod
+    def entry_from_path(file_path: str) -> Optional[ScanEntry]:
+        """根据路径构造扫描结果，文件不存在时返回None"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return ScanEntry(file_path, os.path.dirname(file_path), os.path.basename(file_path),
+                         st.st_size, st.st_mtime, st.st_dev, st.st_ino)
+
+    @staticmethod
+    def matches(entry: ScanEntry,
+                min_size: Optional[int] = None,
+                max_size: Optional[int] = None,
+                newer_than: Optional[float] = None,
+                older_than: Optional[float] = None) -> bool:
+        """判断扫描结果是否满足大小和修改时间条件"""
+        if min_size is not None and entry.size < min_size:
+            return False
+        if max_size is not None and entry.size > max_size:
+            return False
+        if newer_than is not None and entry.mtime < newer_than:
+            return False
+        if older_than is not None and entry.mtime > older_than:
+            return False
+        return True
+
+    @staticmethod
+    def iter_images(folder_path: str,
+                    extensions: Optional[Set[str]] = None,
+                    min_size: Optional[int] = None,
+                    max_size: Optional[int] = None,
+                    newer_than: Optional[float] = None,
+                    older_than: Optional[float] = None,
+                    stats: Optional[dict] = None,
+                    changed_since: Optional[float] = None,
+                    exclude_dirs: Optional[List[str]] = None,
+                    include_dirs: Optional[List[str]] = None,
+                    sniff: Optional[bool] = None) -> Iterator[ScanEntry]:
+        """逐个产出文件夹下的图片文件
+
+        使用 scandir 遍历，stat 信息来自目录项，不需要额外的系统调用。
+
+        参数:
+            folder_path: 要扫描的文件夹
+            extensions: 图片扩展名集合，默认使用 Config.IMAGE_EXTENSIONS
+            min_size/max_size: 文件大小范围（字节）
+            newer_than/older_than: 修改时间范围（时间戳）
+            stats: 如果提供，扫描过程中更新 dirs/files 计数
+            changed_since: 只产出内容或属性在此时间之后变化的文件（比较 mtime 和 ctime 中较新的一个）
+            exclude_dirs/include_dirs: 目录规则，参见 dir_filter；排除规则默认为 default_exclude_dirs
+            sniff: 是否按文件头识别扩展名不是图片的文件，默认 Config.SCAN_SNIFF，参见 ImageSniffer
+        """
+        if extensions is None:
+            extensions = Config.IMAGE_EXTENSIONS
+        if stats is not None:
+            stats.setdefault('dirs', 0)
+            stats.setdefault('files', 0)
+        if exclude_dirs is None:
+            exclude_dirs = ScanUtils.default_exclude_dirs(folder_path)
+        descend = ScanUtils.dir_filter(exclude_dirs, include_dirs)
+        sniffer = ScanUtils._make_sniffer([folder_path], sniff)
+
+        pending = [folder_path]
+        complete = False
+        try:
+            while pending:
+                current = pending.pop()
+                listing = ScanUtils._scan_dir(current, extensions, descend, changed_since, sniffer)
+                if listing is None:
+                    continue
+                results, subdirs, files = listing
+                if stats is not None:
+                    stats['dirs'] += 1
+                    stats['files'] += files
+
+                for result in results:
+                    if ScanUtils.matches(result, min_size, max_size, newer_than, older_than):
+                        yield result
+
+                # 倒序入栈，保持与 os.walk 相近的遍历顺序
+                pending.extend(sorted(subdirs, reverse=True))
+            complete = True
+        finally:
+            if sniffer is not None:
+                sniffer.close(complete)
+
+    @staticmethod
+    def _scan_dir(current: str, extensions: Set[str], descend: Callable[[str], bool],
+                  changed_since: Optional[float] = None,
+                  sniffer: Optional[ImageSniffer] = None) -> Optional[Tuple[List[ScanEntry], List[str], int]]:
+        """列出一个目录，被目录规则排除的子目录不返回
+        提供 sniffer 时，扩展名在 Config.SNIFF_EXTENSIONS 中的文件按文件头识别
+        返回:
+            (图片文件, 子目录, 文件总数)，目录无法读取时返回None
+        """
+        try:
+            with Perf.span('scan.scandir'), os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            return None
+
+        results = []
+        subdirs = []
+        files = 0
+        unknown = []
+        sniff_extensions = Config.SNIFF_EXTENSIONS if sniffer is not None else ()
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if descend(entry.name):
+                        subdirs.append(entry.path)
+                    continue
+                files += 1
+                extension = os.path.splitext(entry.name)[1].lower()
+                if extension not in extensions:
+                    if extension in sniff_extensions:
+                        unknown.append((entry, entry.stat()))
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            if changed_since is not None and max(st.st_mtime, st.st_ctime) < changed_since:
+                continue
+            results.append(ScanEntry(entry.path, current, entry.name, st.st_size, st.st_mtime, st.st_dev, st.st_ino))
+
+        if unknown:
+            kinds = sniffer.classify([(entry.path, st.st_size, st.st_mtime) for entry, st in unknown])
+            for (entry, st), kind in zip(unknown, kinds):
+                if kind not in extensions:
+                    continue
+                # 未变化的文件也要识别，快照才能区分它们和已删除的文件，所以在识别之后再比较时间
+                if changed_since is not None and max(st.st_mtime, st.st_ctime) < changed_since:
+                    continue
+                results.append(ScanEntry(entry.path, current, entry.name, st.st_size, st.st_mtime,
+                                         st.st_dev, st.st_ino))
+        return results, subdirs, files
+
+    @staticmethod
+    def iter_images_multi(roots: List[str],
+                          extensions: Optional[Set[str]] = None,
+                          stats: Optional[List[dict]] = None,
+                          max_workers: Optional[int] = None,
+                          exclude_dirs: Optional[List[str]] = None,
+                          include_dirs: Optional[List[str]] = None,
+                          sniff: Optional[bool] = None) -> Iterator[Tuple[int, List[ScanEntry]]]:
+        """并发扫描多个根目录，所有根目录共用一个线程池
+
+        以目录为单位提交任务，大的根目录不会独占线程，小的根目录也能尽早扫描完。
+        参数:
+            roots: 要扫描的根目录
+            extensions: 图片扩展名集合，默认使用 Config.IMAGE_EXTENSIONS
+            stats: 如果提供，每个根目录一个 dict，扫描过程中更新 dirs/files/found 计数，扫描完成后 done 为 True
+            max_workers: 线程数，默认 Config.SCAN_WORKERS
+            exclude_dirs/include_dirs: 目录规则，参见 dir_filter；排除规则默认按各根目录取 default_exclude_dirs
+            sniff: 是否按文件头识别扩展名不是图片的文件，默认 Config.SCAN_SNIFF
+        返回:
+            逐个目录产出 (根目录下标, 该目录中的图片文件)
+        """
+        if extensions is None:
+            extensions = Config.IMAGE_EXTENSIONS
+        if stats is None:
+            stats = [{} for _ in roots]
+        for root_stats in stats:
+            root_stats.update(dirs=0, files=0, found=0, done=False)
+        descends = [ScanUtils.dir_filter(ScanUtils.default_exclude_dirs(root) if exclude_dirs is None else exclude_dirs,
+                                         include_dirs)
+                    for root in roots]
+        sniffer = ScanUtils._make_sniffer(roots, sniff)
+
+        outstanding = [0] * len(roots)
+        complete = False
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or Config.SCAN_WORKERS) as executor:
+                futures = {}
+
+                def submit(index: int, path: str):
+                    futures[executor.submit(ScanUtils._scan_dir, path, extensions, descends[index], None, sniffer)] = index
+                    outstanding[index] += 1
+
+                try:
+                    for index, root in enumerate(roots):
+                        submit(index, root)
+
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            index = futures.pop(future)
+                            outstanding[index] -= 1
+                            listing = future.result()
+                            root_stats = stats[index]
+                            if listing is not None:
+                                results, subdirs, files = listing
+                                root_stats['dirs'] += 1
+                                root_stats['files'] += files
+                                root_stats['found'] += len(results)
+                                for subdir in subdirs:
+                                    submit(index, subdir)
+                                if results:
+                                    yield index, results
+                            if not outstanding[index]:
+                                root_stats['done'] = True
+                    complete = True
+                finally:
+                    # 提前结束时取消还没开始的目录
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if sniffer is not None:
+                sniffer.close(complete)
@@ -15,8 +15,26 @@ class SettingsUtils:
                 with open(cls.SETTINGS_FILE, 'r', encoding='utf-8') as f:
                     settings = json.load(f)
                     # 更新配置
-                    if 'cache_threshold' in settings:
-                        Config.CACHE_THRESHOLD = settings['cache_threshold']
+                    if 'cache_max_size_mb' in settings:
+                        Config.CACHE_MAX_SIZE_MB = settings['cache_max_size_mb']
+                    if 'cache_max_age_days' in settings:
+                        Config.CACHE_MAX_AGE_DAYS = settings['cache_max_age_days']
+                    if 'log_level' in settings:
+                        Config.LOG_LEVEL = settings['log_level']
+                    if 'log_levels' in settings:
+                        Config.LOG_MODULE_LEVELS = settings['log_levels']
+                    if 'scan_exclude_dirs' in settings:
+                        exclude_dirs = settings['scan_exclude_dirs']
+                        # 旧版本的默认规则排除了 File 目录，但其中可能有图片，改用新的默认规则
+                        if exclude_dirs == ['Audio', 'Video', 'Voice', 'File', 'OpenData', '*.db']:
+                            exclude_dirs = list(Config.SCAN_EXCLUDE_DIRS)
+                        Config.SCAN_EXCLUDE_DIRS = exclude_dirs
+                    if 'scan_include_dirs' in settings:
+                        Config.SCAN_INCLUDE_DIRS = settings['scan_include_dirs']
+                    if 'scan_sniff' in settings:
+                        Config.SCAN_SNIFF = settings['scan_sniff']
+                    if 'wechat_folder_cache' in settings:
+                        Config.WECHAT_FOLDER_CACHE = settings['wechat_folder_cache']
         except Exception as e:
             print(f"加载设置失败：{str(e)}")
     
@@ -29,7 +47,14 @@ class SettingsUtils:
             
             # 收集当前设置
             settings = {
-                'cache_threshold': Config.CACHE_THRESHOLD
+                'cache_max_size_mb': Config.CACHE_MAX_SIZE_MB,
+                'cache_max_age_days': Config.CACHE_MAX_AGE_DAYS,
+                'log_level': Config.LOG_LEVEL,
+                'log_levels': Config.LOG_MODULE_LEVELS,
+                'scan_exclude_dirs': Config.SCAN_EXCLUDE_DIRS,
+                'scan_include_dirs': Config.SCAN_INCLUDE_DIRS,
+                'scan_sniff': Config.SCAN_SNIFF,
+                'wechat_folder_cache': Config.WECHAT_FOLDER_CACHE
             }
             
             # 保存到文件
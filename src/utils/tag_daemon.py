@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from typing import Callable, Dict, List, Optional
+
+from config.config import Config
+from utils.macos_utils import MacOSUtils
+
+logger = logging.getLogger(__name__)
+
+class _TagRequestHandler(socketserver.StreamRequestHandler):
+    """每行一个 JSON 请求，按顺序每行返回一个 JSON 响应，客户端可以连续发送多个请求"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = {'ok': True, 'result': self.server.tag_daemon.dispatch(request)}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if response.get('result') == 'bye':
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+class TagDaemon:
+    """标签服务
+
+    借助标签索引的内存缓存常驻全部标签，通过 Unix 域套接字为其他进程提供标签查询和设置。
+    界面和 --no-daemon 的命令行仍然直接写数据库，每次查询前检查数据库版本，其他进程写入后重新加载缓存。
+    """
+
+    def __init__(self, socket_path: str = None):
+        self.socket_path = socket_path or Config.TAG_DAEMON_SOCKET
+        self.index = MacOSUtils._get_tag_index()
+        # 启动时预热缓存
+        self.index.get_all_tags()
+
+    def dispatch(self, request: dict):
+        """执行一个请求"""
+        op = request.get('op')
+        if op == 'ping':
+            return 'pong'
+        if op == 'get':
+            self.index.refresh_if_changed()
+            return self.index.get_tags(request['paths'])
+        if op == 'set':
+            tag_key = request['tag_key']
+            if tag_key not in MacOSUtils.TAGS:
+                raise ValueError(f'Invalid tag key: {tag_key}')
+            if not MacOSUtils.set_tags(request['paths'], tag_key):
+                raise RuntimeError('Error setting tags in database')
+            return True
+        if op == 'remove':
+            if not MacOSUtils.remove_tags(request['paths']):
+                raise RuntimeError('Error removing tags from database')
+            return True
+        if op == 'list':
+            self.index.refresh_if_changed()
+            return self.index.get_files_by_tag(request.get('tag_key'))
+        if op == 'cleanup':
+            stats = {}
+            removed = MacOSUtils.cleanup_tags(stats)
+            return {'removed': removed, 'relinked': stats.get('relinked', 0)}
+        if op == 'shutdown':
+            return 'bye'
+        raise ValueError(f'Unknown op: {op}')
+
+    def serve_forever(self):
+        """启动服务，直到收到 shutdown 请求"""
+        if os.path.exists(self.socket_path):
+            if TagDaemonClient.connect(self.socket_path):
+                raise RuntimeError(f'Tag daemon already running at {self.socket_path}')
+            # 上次异常退出遗留的套接字文件
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, _TagRequestHandler)
+        server.daemon_threads = True
+        server.tag_daemon = self
+        os.chmod(self.socket_path, 0o600)
+        logger.info('Tag daemon listening on %s', self.socket_path)
+        try:
+            server.serve_forever()
+        finally:
+            # 先删除套接字文件，避免新的客户端连接到正在关闭的服务
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            server.server_close()
+
+class TagDaemonClient:
+    """标签服务客户端，接口与 MacOSUtils 的批量标签方法一致
+
+    fallback 为 True 时，服务断开或超时后输出一条警告，之后的标签操作都改为直接访问数据库
+    """
+
+    TAGS = MacOSUtils.TAGS
+
+    def __init__(self, sock: socket.socket, fallback: bool = False):
+        self._sock = sock
+        self._reader = sock.makefile('rb')
+        self.fallback = fallback
+        # 已改为直接访问数据库
+        self.failed = False
+
+    @staticmethod
+    def connect(socket_path: str = None, fallback: bool = False) -> Optional['TagDaemonClient']:
+        """连接标签服务，服务未运行时返回None"""
+        socket_path = socket_path or Config.TAG_DAEMON_SOCKET
+        if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(Config.TAG_DAEMON_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            sock.close()
+            if fallback:
+                logger.warning('Tag daemon is not responding (%s), using the database directly', e)
+            return None
+        return TagDaemonClient(sock, fallback)
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def _call(self, name: str, send: Callable, *args):
+        """通过服务执行 send，连接断开或超时且允许回退时改用 MacOSUtils 的同名方法"""
+        if not self.failed:
+            try:
+                return send()
+            except OSError as e:
+                # 超时后连接中可能还有未读取的响应，不能继续使用
+                if not self.fallback:
+                    raise
+                logger.warning('Lost connection to the tag daemon (%s), using the database directly', e)
+                self.failed = True
+                self.close()
+        return getattr(MacOSUtils, name)(*args)
+
+    def pipeline(self, requests: List[dict], timeout: Optional[float] = None) -> list:
+        """连续发送多个请求后再依次读取响应
+        参数:
+            timeout: 等待响应的超时（秒），默认 Config.TAG_DAEMON_TIMEOUT
+        """
+        self._sock.settimeout(timeout or Config.TAG_DAEMON_TIMEOUT)
+        payload = b''.join(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n'
+                           for request in requests)
+        # 在单独线程中发送，避免服务端响应填满缓冲区时双方互相等待
+        def send():
+            try:
+                self._sock.sendall(payload)
+            except OSError:
+                # 连接断开或超时时读取响应也会失败，由读取方报告
+                pass
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        results = []
+        for _ in requests:
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError('Tag daemon closed the connection')
+            response = json.loads(line)
+            if not response['ok']:
+                raise RuntimeError(response['error'])
+            results.append(response['result'])
+        sender.join()
+        return results
+
+    def request(self, op: str, timeout: Optional[float] = None, **params):
+        """发送单个请求"""
+        return self.pipeline([dict(params, op=op)], timeout)[0]
+
+    def _chunked(self, op: str, paths: List[str], **params) -> list:
+        """大批量路径分多个请求流水线发送"""
+        size = Config.TAG_DAEMON_CHUNK_SIZE
+        return self.pipeline([dict(params, op=op, paths=paths[i:i + size])
+                              for i in range(0, len(paths), size)])
+
+    def set_tags(self, file_paths: List[str], tag_key: str) -> bool:
+        return self._call('set_tags', lambda: all(self._chunked('set', file_paths, tag_key=tag_key)),
+                          file_paths, tag_key)
+
+    def remove_tags(self, file_paths: List[str]) -> bool:
+        return self._call('remove_tags', lambda: all(self._chunked('remove', file_paths)), file_paths)
+
+    def get_tags(self, file_paths: List[str]) -> Dict[str, Dict[str, str]]:
+        def send():
+            result = {}
+            for tags in self._chunked('get', file_paths):
+                result.update(tags)
+            return result
+        return self._call('get_tags', send, file_paths)
+
+    def get_files_by_tag(self, tag_key: Optional[str] = None) -> List[str]:
+        return self._call('get_files_by_tag', lambda: self.request('list', tag_key=tag_key), tag_key)
+
+    def cleanup_tags(self, stats: Optional[dict] = None) -> int:
+        def send():
+            # 清理要检查每个文件是否存在并查找被移动的文件，使用较长的超时
+            result = self.request('cleanup', Config.TAG_DAEMON_LONG_TIMEOUT)
+            if stats is not None:
+                stats['relinked'] = result['relinked']
+            return result['removed']
+        return self._call('cleanup_tags', send, stats)
+
+    def shutdown(self):
+        self.request('shutdown')
@@ -1,18 +1,43 @@
 import sqlite3
 import os
 import logging
-from typing import List, Optional, Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, List, Optional, Dict, Tuple
 from pathlib import Path
+from .perf import Perf
+
+if TYPE_CHECKING:
+    # 扫描模块会加载线程池和进程池，只在清理时导入，不拖慢每次标签操作
+    from .scan_utils import ScanEntry
+
+logger = logging.getLogger(__name__)
 
 class TagIndex:
     _instance = None
-    
+
+    # 批量查询时每条 SQL 的参数个数
+    QUERY_CHUNK_SIZE = 500
+
+    # 两次检查数据库版本（其他进程是否写入过标签）的最短间隔（秒）
+    VERSION_CHECK_INTERVAL = 1.0
+
+    # 清理时在缺失文件上方最多几层目录中查找被移动的文件
+    RELINK_SEARCH_LEVELS = 2
+
+    # 移除标签的记录保留的秒数，超过后在清理时删除
+    REMOVED_TAGS_MAX_AGE = 90 * 24 * 3600
+
+    # 内存缓存最多保存的记录数，标签总数不超过此值时全部加载到内存
+    CACHE_MAX_ENTRIES = 1000000
+
     def __new__(cls, db_path: str = None):
         if cls._instance is None:
             cls._instance = super(TagIndex, cls).__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self, db_path: str = None):
         if self._initialized:
             return
@@ -31,6 +56,19 @@ class TagIndex:
         
         self.db_path = db_path
         self._init_db()
+        
+        # 内存缓存：文件路径 -> 共享的 (tag_key, tag_name, tag_color) 元组，
+        # 相同标签的记录共用同一个元组；None 表示已确认没有标签
+        self._lock = threading.RLock()
+        self._cache: OrderedDict = OrderedDict()
+        self._tag_values: Dict[Tuple[str, str, str], Tuple[str, str, str]] = {}
+        self._cache_loaded = False
+        # 为 True 时缓存包含全部标签，未命中即表示没有标签
+        self._cache_complete = False
+        # 写入标签和检查数据库版本共用的连接，以及加载缓存时的数据库版本
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._checked_at = 0.0
 
     def _init_db(self):
         """初始化数据库表"""
@@ -46,8 +84,137 @@ class TagIndex:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            # 记录文件身份（设备号、inode、大小、修改时间），用于在文件移动后找回标签
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(file_tags)')}
+            for column, column_type in (('dev', 'INTEGER'), ('inode', 'INTEGER'),
+                                        ('size', 'INTEGER'), ('mtime', 'REAL')):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE file_tags ADD COLUMN {column} {column_type}')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_file_tags_identity
+                ON file_tags (dev, inode)
+            ''')
+            # 记录移除过标签的文件和移除时间，增量对账时据此清除 Finder 中残留的标签
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS removed_tags (
+                    file_path TEXT PRIMARY KEY,
+                    removed_at REAL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_removed_tags_removed_at
+                ON removed_tags (removed_at)
+            ''')
+            # 记录每个根目录上次标签对账的时间
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reconcile_state (
+                    root TEXT PRIMARY KEY,
+                    last_run REAL
+                )
+            ''')
             conn.commit()
 
+    def _tag_value(self, tag_key: str, tag_name: str, tag_color: str) -> Tuple[str, str, str]:
+        """返回共享的标签元组"""
+        value = (tag_key, tag_name, tag_color)
+        return self._tag_values.setdefault(value, value)
+
+    @staticmethod
+    def _to_dict(value: Tuple[str, str, str]) -> Dict[str, str]:
+        return {
+            'tag_key': value[0],
+            'tag_name': value[1],
+            'tag_color': value[2]
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        """本实例写入标签使用的连接，调用时需持有锁"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def _read_data_version(self) -> int:
+        """数据库版本，其他连接（包括其他进程）提交修改后会变化，本实例的连接提交时不变"""
+        return self._connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def refresh_if_changed(self) -> bool:
+        """其他进程修改过数据库时丢弃内存缓存
+        
+        Returns:
+            bool: 是否丢弃了缓存
+        """
+        with self._lock:
+            if not self._cache_loaded:
+                return False
+            self._checked_at = time.monotonic()
+            try:
+                if self._read_data_version() == self._data_version:
+                    return False
+            except Exception as e:
+                logger.error('Error checking tag database version: %s', e)
+                return False
+            self.invalidate_cache()
+            return True
+
+    def _ensure_cache(self):
+        """首次使用时加载缓存，标签数超过上限时只按需缓存
+        
+        已加载时检查数据库版本，其他进程（界面、命令行或标签服务）写入过标签时重新加载；
+        检查本身也要访问数据库，每 VERSION_CHECK_INTERVAL 秒最多检查一次，频繁的查询只读内存
+        """
+        if self._cache_loaded and (time.monotonic() - self._checked_at < self.VERSION_CHECK_INTERVAL
+                                   or not self.refresh_if_changed()):
+            return
+        with self._lock:
+            if self._cache_loaded:
+                return
+            try:
+                with Perf.span('tags.cache_load'):
+                    conn = self._connection()
+                    # 先记录版本再读取，读取期间其他进程的修改会在下次检查时发现
+                    self._data_version = self._read_data_version()
+                    self._checked_at = time.monotonic()
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT COUNT(*) FROM file_tags')
+                    if cursor.fetchone()[0] <= self.CACHE_MAX_ENTRIES:
+                        cursor.execute('SELECT file_path, tag_key, tag_name, tag_color FROM file_tags')
+                        for file_path, tag_key, tag_name, tag_color in cursor.fetchall():
+                            self._cache[file_path] = self._tag_value(tag_key, tag_name, tag_color)
+                        self._cache_complete = True
+            except Exception as e:
+                logger.error('Error loading tag cache: %s', e)
+            self._cache_loaded = True
+
+    def _cache_put(self, file_path: str, value: Optional[Tuple[str, str, str]]):
+        """写入缓存，超过上限时淘汰最久未使用的记录"""
+        if self._cache_complete and value is None:
+            self._cache.pop(file_path, None)
+            return
+        self._cache[file_path] = value
+        self._cache.move_to_end(file_path)
+        if len(self._cache) > self.CACHE_MAX_ENTRIES:
+            # 淘汰后缓存不再完整
+            self._cache_complete = False
+            while len(self._cache) > self.CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def invalidate_cache(self):
+        """丢弃内存缓存，下次访问时重新加载"""
+        with self._lock:
+            self._cache.clear()
+            self._tag_values.clear()
+            self._cache_loaded = False
+            self._cache_complete = False
+
+    @staticmethod
+    def _identity(file_path: str) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[float]]:
+        """读取文件身份 (dev, inode, size, mtime)，文件不存在时全部为None"""
+        try:
+            st = os.stat(file_path)
+            return st.st_dev, st.st_ino, st.st_size, st.st_mtime
+        except OSError:
+            return None, None, None, None
+
     def set_tag(self, file_path: str, tag_key: str, tag_name: str, tag_color: str) -> bool:
         """设置文件的标签
         
@@ -60,18 +227,39 @@ class TagIndex:
         Returns:
             bool: 是否设置成功
         """
+        return self.set_tags([(file_path, tag_key, tag_name, tag_color)])
+
+    @Perf.timed('tags.set')
+    def set_tags(self, entries: List[Tuple[str, str, str, str]]) -> bool:
+        """在一个事务中批量设置标签
+        
+        Args:
+            entries: (file_path, tag_key, tag_name, tag_color) 列表
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        self._ensure_cache()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO file_tags 
-                    (file_path, tag_key, tag_name, tag_color)
-                    VALUES (?, ?, ?, ?)
-                ''', (file_path, tag_key, tag_name, tag_color))
-                conn.commit()
+            # 在加锁之前读取文件身份
+            rows = [entry + self._identity(entry[0]) for entry in entries]
+            with self._lock:
+                # 使用本实例的连接写入，不改变该连接看到的数据库版本，缓存不会因此失效
+                with self._connection() as conn:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO file_tags
+                        (file_path, tag_key, tag_name, tag_color, dev, inode, size, mtime)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', rows)
+                    conn.executemany('DELETE FROM removed_tags WHERE file_path = ?',
+                                     ((entry[0],) for entry in entries))
+                    conn.commit()
+                # 写入数据库成功后再更新缓存
+                for file_path, tag_key, tag_name, tag_color in entries:
+                    self._cache_put(file_path, self._tag_value(tag_key, tag_name, tag_color))
                 return True
         except Exception as e:
-            logging.error(f'Error setting tag in database: {str(e)}')
+            logger.error('Error setting tag in database: %s', e)
             return False
 
     def get_tag(self, file_path: str) -> Optional[Dict[str, str]]:
@@ -83,26 +271,60 @@ class TagIndex:
         Returns:
             Optional[Dict[str, str]]: 标签信息，包含tag_key, tag_name, tag_color
         """
+        tags = self.get_tags([file_path])
+        return tags.get(file_path)
+
+    @Perf.timed('tags.get')
+    def get_tags(self, file_paths: List[str]) -> Dict[str, Dict[str, str]]:
+        """批量获取文件的标签信息
+        
+        Args:
+            file_paths: 文件路径列表
+            
+        Returns:
+            Dict[str, Dict[str, str]]: 有标签的文件路径到标签信息的映射
+        """
+        self._ensure_cache()
+        result = {}
+        missing = []
+        with self._lock:
+            for file_path in file_paths:
+                if file_path in self._cache:
+                    value = self._cache[file_path]
+                    if value is not None:
+                        result[file_path] = self._to_dict(value)
+                    if not self._cache_complete:
+                        self._cache.move_to_end(file_path)
+                elif not self._cache_complete:
+                    missing.append(file_path)
+        if not missing:
+            return result
+            
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            found = {}
+            with Perf.span('tags.get.sqlite'), sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT tag_key, tag_name, tag_color
-                    FROM file_tags
-                    WHERE file_path = ?
-                ''', (file_path,))
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'tag_key': result[0],
-                        'tag_name': result[1],
-                        'tag_color': result[2]
-                    }
-                return None
+                # 分块查询，避免超过 SQLite 参数数量上限
+                for i in range(0, len(missing), self.QUERY_CHUNK_SIZE):
+                    chunk = missing[i:i + self.QUERY_CHUNK_SIZE]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        SELECT file_path, tag_key, tag_name, tag_color
+                        FROM file_tags
+                        WHERE file_path IN ({placeholders})
+                    ''', chunk)
+                    for file_path, tag_key, tag_name, tag_color in cursor.fetchall():
+                        found[file_path] = self._tag_value(tag_key, tag_name, tag_color)
+            with self._lock:
+                for file_path in missing:
+                    value = found.get(file_path)
+                    self._cache_put(file_path, value)
+                    if value is not None:
+                        result[file_path] = self._to_dict(value)
+            return result
         except Exception as e:
-            logging.error(f'Error getting tag from database: {str(e)}')
-            return None
+            logger.error('Error getting tags from database: %s', e)
+            return result
 
     def remove_tag(self, file_path: str) -> bool:
         """移除文件的标签
@@ -113,14 +335,33 @@ class TagIndex:
         Returns:
             bool: 是否移除成功
         """
+        return self.remove_tags([file_path])
+
+    @Perf.timed('tags.remove')
+    def remove_tags(self, file_paths: List[str]) -> bool:
+        """在一个事务中批量移除标签
+        
+        Args:
+            file_paths: 文件路径列表
+            
+        Returns:
+            bool: 是否移除成功
+        """
+        self._ensure_cache()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM file_tags WHERE file_path = ?', (file_path,))
-                conn.commit()
+            with self._lock:
+                removed_at = time.time()
+                with self._connection() as conn:
+                    conn.executemany('DELETE FROM file_tags WHERE file_path = ?',
+                                     ((file_path,) for file_path in file_paths))
+                    conn.executemany('INSERT OR REPLACE INTO removed_tags (file_path, removed_at) VALUES (?, ?)',
+                                     ((file_path, removed_at) for file_path in file_paths))
+                    conn.commit()
+                for file_path in file_paths:
+                    self._cache_put(file_path, None)
                 return True
         except Exception as e:
-            logging.error(f'Error removing tag from database: {str(e)}')
+            logger.error('Error removing tag from database: %s', e)
             return False
 
     def get_files_by_tag(self, tag_key: Optional[str] = None, tag_name: Optional[str] = None) -> List[str]:
@@ -133,6 +374,13 @@ class TagIndex:
         Returns:
             List[str]: 文件路径列表
         """
+        self._ensure_cache()
+        with self._lock:
+            if self._cache_complete:
+                return [file_path for file_path, value in self._cache.items()
+                        if value is not None
+                        and (not tag_key or value[0] == tag_key)
+                        and (tag_key or not tag_name or value[1] == tag_name)]
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
@@ -145,29 +393,219 @@ class TagIndex:
                     
                 return [row[0] for row in cursor.fetchall()]
         except Exception as e:
-            logging.error(f'Error getting files by tag from database: {str(e)}')
+            logger.error('Error getting files by tag from database: %s', e)
+            return []
+
+    def get_all_tags(self) -> Dict[str, str]:
+        """获取全部文件的标签键值
+        
+        Returns:
+            Dict[str, str]: 文件路径到标签键值的映射
+        """
+        self._ensure_cache()
+        with self._lock:
+            if self._cache_complete:
+                return {file_path: value[0] for file_path, value in self._cache.items() if value is not None}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT file_path, tag_key FROM file_tags')
+                return dict(cursor.fetchall())
+        except Exception as e:
+            logger.error('Error getting all tags from database: %s', e)
+            return {}
+
+    def get_files_changed_since(self, root: str, since: float) -> List[str]:
+        """获取目录下在指定时间之后设置或移除过标签的文件
+        
+        Args:
+            root: 根目录
+            since: 时间戳
+            
+        Returns:
+            List[str]: 文件路径列表
+        """
+        prefix = os.path.join(root, '')
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                # created_at 精确到秒，多取一秒避免遗漏
+                cursor.execute('''
+                    SELECT file_path FROM file_tags
+                    WHERE file_path >= ? AND file_path < ?
+                    AND created_at >= datetime(?, 'unixepoch')
+                    UNION
+                    SELECT file_path FROM removed_tags
+                    WHERE file_path >= ? AND file_path < ?
+                    AND removed_at >= ?
+                ''', (prefix, upper, int(since) - 1, prefix, upper, since - 1))
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error('Error getting changed tags from database: %s', e)
             return []
 
-    def cleanup_missing_files(self) -> int:
+    def get_last_reconcile(self, root: str) -> Optional[float]:
+        """获取根目录上次对账的时间，从未对账时返回None"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT last_run FROM reconcile_state WHERE root = ?', (root,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error('Error getting reconcile state: %s', e)
+            return None
+
+    def set_last_reconcile(self, root: str, last_run: float) -> bool:
+        """记录根目录的对账时间"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('INSERT OR REPLACE INTO reconcile_state (root, last_run) VALUES (?, ?)',
+                             (root, last_run))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error('Error saving reconcile state: %s', e)
+            return False
+
+    @Perf.timed('tags.relink')
+    def relink_moved(self, entries: Iterable['ScanEntry']) -> Dict[str, str]:
+        """把移动过的文件重新关联到原来的标签
+        
+        扫描结果中没有标签的文件，如果设备号、inode、大小和修改时间都与某条标签记录相同，
+        且记录中的原路径已不存在，则认为文件被移动或改名，把标签记录改到新路径。
+        
+        Args:
+            entries: 扫描结果
+            
+        Returns:
+            Dict[str, str]: 原路径到新路径的映射
+        """
+        moved = {}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                # 扫描结果放入临时表，借助身份索引一次联表找出候选；
+                # 遍历可能较慢，写入临时表时不持有锁
+                cursor.execute('''
+                    CREATE TEMP TABLE scan_identity (
+                        file_path TEXT, dev INTEGER, inode INTEGER, size INTEGER, mtime REAL
+                    )
+                ''')
+                cursor.executemany('INSERT INTO scan_identity VALUES (?, ?, ?, ?, ?)',
+                                   ((entry.path, entry.dev, entry.ino, entry.size, entry.mtime)
+                                    for entry in entries))
+                with self._lock:
+                    cursor.execute('''
+                        SELECT f.file_path, s.file_path
+                        FROM scan_identity s
+                        JOIN file_tags f
+                        ON f.dev = s.dev AND f.inode = s.inode AND f.size = s.size AND f.mtime = s.mtime
+                        WHERE f.file_path != s.file_path
+                        AND NOT EXISTS (SELECT 1 FROM file_tags t WHERE t.file_path = s.file_path)
+                    ''')
+                    targets = set()
+                    for old_path, new_path in cursor.fetchall():
+                        # 原路径仍然存在说明是硬链接，不做处理
+                        if old_path in moved or new_path in targets or os.path.exists(old_path):
+                            continue
+                        moved[old_path] = new_path
+                        targets.add(new_path)
+                    cursor.executemany('UPDATE file_tags SET file_path = ? WHERE file_path = ?',
+                                       ((new_path, old_path) for old_path, new_path in moved.items()))
+                    cursor.execute('DROP TABLE scan_identity')
+                    conn.commit()
+                    if self._cache_loaded:
+                        for old_path, new_path in moved.items():
+                            value = self._cache.pop(old_path, None)
+                            if value is not None:
+                                self._cache_put(new_path, value)
+                            else:
+                                self._cache.pop(new_path, None)
+            if moved:
+                logger.info('Relinked tags of %s moved files', len(moved))
+            return moved
+        except Exception as e:
+            logger.error('Error relinking moved files: %s', e)
+            return {}
+
+    @staticmethod
+    def _search_roots(missing_paths: List[str]) -> List[str]:
+        """缺失文件最近的仍存在的上级目录，用于查找移动后的文件
+        
+        最多向上查找 RELINK_SEARCH_LEVELS 层；文件所在的卷未挂载或整个账号目录被删除时，
+        最近的上级目录会是 /Volumes、/Users 之类的大目录。顶层目录、挂载点、用户主目录和 ~/Library 都不搜索。
+        """
+        home = os.path.expanduser('~')
+        excluded = {home, os.path.join(home, 'Library')}
+        roots = set()
+        for file_path in missing_paths:
+            current = os.path.dirname(file_path)
+            for _ in range(TagIndex.RELINK_SEARCH_LEVELS):
+                if os.path.isdir(current):
+                    break
+                current = os.path.dirname(current)
+            if (current in excluded or len(Path(current).parts) <= 2
+                    or not os.path.isdir(current) or os.path.ismount(current)):
+                continue
+            roots.add(current)
+        # 去掉被其他搜索目录包含的目录
+        result = []
+        for root in sorted(roots):
+            if not result or not root.startswith(os.path.join(result[-1], '')):
+                result.append(root)
+        return result
+
+    def cleanup_missing_files(self, stats: Optional[dict] = None) -> int:
         """清理数据库中不存在的文件记录
         
+        清理前先在缺失文件附近查找被移动的文件，找到的文件保留标签并更新路径。
+        
+        Args:
+            stats: 如果提供，写入 relinked（找回的记录数）
+            
         Returns:
             int: 清理的记录数量
         """
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT file_path FROM file_tags')
+                cursor.execute('SELECT file_path, dev FROM file_tags')
                 all_files = cursor.fetchall()
                 
-                removed_count = 0
-                for (file_path,) in all_files:
-                    if not os.path.exists(file_path):
-                        cursor.execute('DELETE FROM file_tags WHERE file_path = ?', (file_path,))
-                        removed_count += 1
-                
+                missing = []
+                backfill = []
+                for file_path, dev in all_files:
+                    identity = self._identity(file_path)
+                    if identity[0] is None:
+                        missing.append(file_path)
+                    elif dev is None:
+                        # 旧版记录没有文件身份，补充
+                        backfill.append(identity + (file_path,))
+                cursor.executemany('UPDATE file_tags SET dev = ?, inode = ?, size = ?, mtime = ? WHERE file_path = ?',
+                                   backfill)
+                conn.commit()
+
+            moved = {}
+            if missing:
+                from .scan_utils import ScanUtils
+                for root in self._search_roots(missing):
+                    moved.update(self.relink_moved(ScanUtils.iter_images(root)))
+            if stats is not None:
+                stats['relinked'] = len(moved)
+
+            removed = [file_path for file_path in missing if file_path not in moved]
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany('DELETE FROM file_tags WHERE file_path = ?',
+                                 ((file_path,) for file_path in removed))
+                # 移除记录只用于增量对账，删除过旧的记录
+                conn.execute('DELETE FROM removed_tags WHERE removed_at < ?',
+                             (time.time() - self.REMOVED_TAGS_MAX_AGE,))
                 conn.commit()
-                return removed_count
+            return len(removed)
         except Exception as e:
-            logging.error(f'Error cleaning up database: {str(e)}')
+            logger.error('Error cleaning up database: %s', e)
             return 0
+        finally:
+            self.invalidate_cache()
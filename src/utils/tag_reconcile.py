@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from config.config import Config
+from utils.finder_tags import FinderTags
+from utils.macos_utils import MacOSUtils
+from utils.scan_utils import ScanUtils
+
+logger = logging.getLogger(__name__)
+
+# 对账方向
+TO_FINDER = 'to-finder'  # 以标签索引为准，写入 Finder 标签
+TO_INDEX = 'to-index'    # 以 Finder 标签为准，写入标签索引
+
+class TagReconciler:
+    """标签索引与 Finder 标签对账
+
+    使用 scandir 遍历根目录，分批并行读取扩展属性，与标签索引比较后按指定方向批量修正。
+    增量模式只检查上次对账之后 mtime/ctime 变化的文件（设置扩展属性会更新 ctime），
+    以及上次对账之后在标签索引中设置或移除过标签的文件。
+    """
+
+    def __init__(self, tag_store=MacOSUtils, direction: str = TO_FINDER,
+                 dry_run: bool = False, workers: int = None):
+        """
+        参数:
+            tag_store: 标签读写接口，MacOSUtils 或 TagDaemonClient
+            direction: 对账方向，TO_FINDER 或 TO_INDEX
+            dry_run: 只比较不修改
+            workers: 读写扩展属性的线程数
+        """
+        self.tag_store = tag_store
+        self.direction = direction
+        self.dry_run = dry_run
+        self.workers = workers or Config.MAX_WORKERS
+        # Finder 颜色名称 -> 标签键值
+        self.color_keys = {color: key for key, (color, _, _) in MacOSUtils.TAGS.items()}
+        self.changes: List[dict] = []
+        self.errors: List[dict] = []
+        self.stats = {'checked': 0, 'changed': 0, 'errors': 0}
+
+    def _iter_paths(self, root: str, since: Optional[float]) -> Iterator[str]:
+        """产出需要检查的文件"""
+        seen = set()
+        for entry in ScanUtils.iter_images(root, changed_since=since):
+            if since is not None:
+                seen.add(entry.path)
+            yield entry.path
+        if since is not None:
+            # 文件本身没有变化、但标签索引中设置或移除过标签的文件
+            for file_path in MacOSUtils._get_tag_index().get_files_changed_since(root, since):
+                if file_path not in seen and os.path.exists(file_path):
+                    yield file_path
+
+    def _read_finder_tags(self, executor: ThreadPoolExecutor, file_paths: List[str]) -> Dict[str, Optional[str]]:
+        """并行读取 Finder 颜色标签"""
+        def read(file_path):
+            try:
+                return FinderTags.get_color_tag(file_path)
+            except OSError as e:
+                return e
+
+        result = {}
+        for file_path, value in zip(file_paths, executor.map(read, file_paths)):
+            if isinstance(value, OSError):
+                self._record_error(file_path, value)
+            else:
+                result[file_path] = value
+        return result
+
+    def _record_error(self, file_path: str, error: Exception):
+        self.stats['errors'] += 1
+        self.errors.append({'path': file_path, 'error': str(error)})
+
+    def _process_batch(self, executor: ThreadPoolExecutor, file_paths: List[str]):
+        """比较并修正一批文件"""
+        finder_tags = self._read_finder_tags(executor, file_paths)
+        index_tags = self.tag_store.get_tags(list(finder_tags))
+        self.stats['checked'] += len(finder_tags)
+
+        # 按目标颜色分组，批量写入
+        to_finder: Dict[str, Optional[str]] = {}
+        to_index: Dict[Optional[str], List[str]] = {}
+        for file_path, finder_color in finder_tags.items():
+            index_info = index_tags.get(file_path)
+            index_color = index_info['tag_color'] if index_info else None
+            if index_color == finder_color:
+                continue
+            self.changes.append({'path': file_path, 'index': index_color, 'finder': finder_color})
+            if self.direction == TO_FINDER:
+                to_finder[file_path] = index_color
+            else:
+                to_index.setdefault(finder_color, []).append(file_path)
+        self.stats['changed'] += len(to_finder) + sum(len(paths) for paths in to_index.values())
+        if self.dry_run:
+            return
+
+        def write(item):
+            try:
+                FinderTags.apply(*item)
+                return None
+            except OSError as e:
+                return e
+
+        items = list(to_finder.items())
+        for (file_path, _), error in zip(items, executor.map(write, items)):
+            if error is not None:
+                self._record_error(file_path, error)
+
+        for finder_color, paths in to_index.items():
+            if finder_color is None:
+                success = self.tag_store.remove_tags(paths)
+            else:
+                success = self.tag_store.set_tags(paths, self.color_keys[finder_color])
+            if not success:
+                for file_path in paths:
+                    self._record_error(file_path, RuntimeError('Error writing tag index'))
+
+    def reconcile(self, root: str, full: bool = False) -> dict:
+        """对账一个根目录
+        参数:
+            root: 根目录
+            full: 忽略上次对账时间，检查全部文件
+        返回:
+            dict: 本次对账的统计信息
+        """
+        root = os.path.abspath(root)
+        index = MacOSUtils._get_tag_index()
+        since = None if full else index.get_last_reconcile(root)
+        # 移除标签的记录只保留一段时间，距上次对账太久时检查全部文件
+        if since is not None and since < time.time() - index.REMOVED_TAGS_MAX_AGE:
+            since = None
+        started = time.time()
+        stats_before = dict(self.stats)
+
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for file_path in self._iter_paths(root, since):
+                batch.append(file_path)
+                if len(batch) >= Config.RECONCILE_BATCH_SIZE:
+                    self._process_batch(executor, batch)
+                    batch = []
+            if batch:
+                self._process_batch(executor, batch)
+
+        # 记录本次开始时间，对账期间发生的变化留给下次
+        if not self.dry_run:
+            index.set_last_reconcile(root, started)
+
+        result = {key: self.stats[key] - stats_before[key] for key in self.stats}
+        result.update({'root': root, 'incremental': since is not None,
+                       'elapsed': round(time.time() - started, 3)})
+        logger.debug('Reconciled %s: %s', root, result)
+        return result
+
+    def write_report(self, report_path: str, roots: List[dict]):
+        """写入 JSON 对账报告"""
+        report = {
+            'direction': self.direction,
+            'dry_run': self.dry_run,
+            'roots': roots,
+            'changes': self.changes,
+            'errors': self.errors
+        }
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
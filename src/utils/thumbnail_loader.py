@@ -0,0 +1,89 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+from config.config import Config
+from utils.perf import Perf
+
+logger = logging.getLogger(__name__)
+
+class ThumbnailLoader:
+    """在后台线程中生成缩略图
+
+    schedule 每次给出当前需要的全部文件，按优先级排列（先可见的，再预读的）。新的请求替换旧的队列，
+    滚动离开的文件还没开始解码就被丢弃，正在解码的文件完成后照常返回。
+    结果放入队列，由界面线程用 take_results 取走并转换为 PhotoImage（Tk 对象只能在界面线程中创建）。
+    """
+
+    def __init__(self, size: int, max_workers: Optional[int] = None,
+                 decode: Optional[Callable[[str, int], object]] = None):
+        """
+        参数:
+            size: 缩略图的最大边长
+            max_workers: 解码线程数，默认 Config.THUMB_WORKERS
+            decode: 解码函数 (路径, 边长) -> PIL 图片或None，默认 ImageUtils.load_thumbnail
+        """
+        if decode is None:
+            from utils.image_utils import ImageUtils
+            decode = ImageUtils.load_thumbnail
+        self.size = size
+        self._decode = decode
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._running = 0
+        self._results: deque = deque()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'thumb-{index}', daemon=True)
+            for index in range(max_workers or Config.THUMB_WORKERS)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def schedule(self, paths: List[str]):
+        """替换等待解码的文件，paths 按优先级从高到低排列"""
+        with self._cond:
+            self._queue = deque(paths)
+            if paths:
+                self._cond.notify(min(len(paths), len(self._threads)))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._queue.popleft()
+                self._running += 1
+            try:
+                with Perf.span('thumb.decode'):
+                    image = self._decode(path, self.size)
+            except Exception as e:
+                logger.debug('Error creating thumbnail for %s: %s', path, e)
+                image = None
+            with self._cond:
+                self._running -= 1
+                self._results.append((path, image))
+
+    def take_results(self, limit: int) -> List[Tuple[str, object]]:
+        """取出最多 limit 个已完成的缩略图，解码失败的图片为None"""
+        results = []
+        with self._cond:
+            while self._results and len(results) < limit:
+                results.append(self._results.popleft())
+        return results
+
+    @property
+    def busy(self) -> bool:
+        """是否还有等待、正在解码或未取走的缩略图"""
+        with self._cond:
+            return bool(self._queue or self._running or self._results)
+
+    def close(self):
+        """停止解码线程"""
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
@@ -0,0 +1,151 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config.config import Config
+from utils.settings_utils import SettingsUtils
+
+logger = logging.getLogger(__name__)
+
+class WeChatDiscovery:
+    """查找微信的图片文件夹
+
+    支持的目录结构（账号目录可以在基础目录下一层或两层）:
+        <基础目录>/<版本>/<账号>/Message                    旧版 macOS 微信
+        <基础目录>/<账号>/msg/attach                       4.x 的 xwechat_files
+        <基础目录>/<账号>/FileStorage/Image                Windows 的 WeChat Files
+
+    结果按基础目录缓存在设置文件中，同时记录基础目录和各子目录（版本目录或账号目录）的修改时间，
+    以及还没有图片文件夹的账号目录（和其中 msg 之类的上级目录）的修改时间。
+    新增或删除账号、已有账号中新建图片文件夹都会改变这些目录的修改时间，
+    下次查找时据此判断缓存是否失效，不需要重新遍历。
+    """
+
+    @staticmethod
+    def _mtime_ns(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _subdirs(path: str) -> List[str]:
+        try:
+            with os.scandir(path) as it:
+                return sorted(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            return []
+
+    @staticmethod
+    def _account_folder(account_path: str) -> Optional[str]:
+        """账号目录下的图片文件夹，不是账号目录时返回None"""
+        for layout in Config.WECHAT_LAYOUTS:
+            folder = os.path.join(account_path, layout)
+            if os.path.isdir(folder):
+                return folder
+        return None
+
+    @staticmethod
+    def _watched_dirs(account_path: str) -> List[str]:
+        """没有图片文件夹的账号目录，以及各布局中已存在的上级目录（例如 msg），
+        之后新建图片文件夹时其中某个目录的修改时间会变化"""
+        paths = [account_path]
+        for layout in Config.WECHAT_LAYOUTS:
+            parent = os.path.dirname(layout)
+            if parent and os.path.isdir(os.path.join(account_path, parent)):
+                paths.append(os.path.join(account_path, parent))
+        return paths
+
+    @staticmethod
+    def _scan_child(child: str) -> Tuple[List[str], Dict[str, Optional[int]]]:
+        """检查基础目录的一个子目录：它本身是账号目录，或者是包含账号目录的版本目录
+        返回:
+            (找到的图片文件夹, 需要记录修改时间的目录)
+        """
+        folder = WeChatDiscovery._account_folder(child)
+        if folder:
+            return [folder], {}
+        folders = []
+        watched = {}
+        for account_path in WeChatDiscovery._subdirs(child):
+            folder = WeChatDiscovery._account_folder(account_path)
+            if folder:
+                folders.append(folder)
+                continue
+            for path in WeChatDiscovery._watched_dirs(account_path):
+                watched[path] = WeChatDiscovery._mtime_ns(path)
+        return folders, watched
+
+    @staticmethod
+    def _is_valid(base_path: str, cached: Dict) -> bool:
+        """缓存记录的目录修改时间都没有变化，且找到的文件夹仍然存在"""
+        # 旧版缓存没有记录账号目录，重新查找一次
+        if 'accounts' not in cached:
+            return False
+        if WeChatDiscovery._mtime_ns(base_path) != cached.get('mtime_ns'):
+            return False
+        for directories in (cached.get('children', {}), cached['accounts']):
+            for path, mtime_ns in directories.items():
+                if WeChatDiscovery._mtime_ns(path) != mtime_ns:
+                    return False
+        return all(os.path.isdir(folder) for folder in cached.get('folders', []))
+
+    @staticmethod
+    def discover(base_path: str, max_workers: Optional[int] = None) -> Dict:
+        """遍历基础目录，各子目录并行检查
+        返回:
+            Dict: 缓存记录，包含 folders、mtime_ns、children 和 accounts
+        """
+        mtime_ns = WeChatDiscovery._mtime_ns(base_path)
+        if mtime_ns is None:
+            return {'mtime_ns': None, 'children': {}, 'accounts': {}, 'folders': []}
+
+        children = WeChatDiscovery._subdirs(base_path)
+        with ThreadPoolExecutor(max_workers=max_workers or Config.SCAN_WORKERS) as executor:
+            results = list(executor.map(WeChatDiscovery._scan_child, children))
+
+        accounts = {}
+        for _, watched in results:
+            accounts.update(watched)
+        return {
+            'mtime_ns': mtime_ns,
+            'children': {child: WeChatDiscovery._mtime_ns(child) for child in children},
+            'accounts': accounts,
+            'folders': [folder for folders, _ in results for folder in folders]
+        }
+
+    @staticmethod
+    def find_folders(base_paths: Optional[List[str]] = None, use_cache: bool = True) -> List[str]:
+        """查找所有微信图片文件夹
+        参数:
+            base_paths: 基础目录，默认 Config.WECHAT_BASE_PATHS
+            use_cache: 是否使用并更新设置文件中的缓存
+        """
+        if base_paths is None:
+            base_paths = Config.WECHAT_BASE_PATHS
+
+        folders = []
+        changed = False
+        for base_path in base_paths:
+            cached = Config.WECHAT_FOLDER_CACHE.get(base_path) if use_cache else None
+            if cached is None or not WeChatDiscovery._is_valid(base_path, cached):
+                cached = WeChatDiscovery.discover(base_path)
+                logger.info('Discovered %d WeChat folders under %s', len(cached['folders']), base_path)
+                if use_cache:
+                    Config.WECHAT_FOLDER_CACHE[base_path] = cached
+                    changed = True
+            folders.extend(folder for folder in cached['folders'] if folder not in folders)
+
+        if changed:
+            SettingsUtils.save_settings()
+        return folders
+
+    @staticmethod
+    def is_wechat_folder(path: str) -> bool:
+        """路径是否为查找到的微信图片文件夹或其中的子目录"""
+        path = os.path.abspath(path)
+        for folder in WeChatDiscovery.find_folders():
+            if path == folder or path.startswith(folder.rstrip(os.sep) + os.sep):
+                return True
+        return False
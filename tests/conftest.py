@@ -0,0 +1,55 @@
+import os
+import sys
+
+# 与 src/main.py 相同，以 src 为根目录导入 utils、commands 等模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_wechat_discovery(monkeypatch):
+    """不查找本机的微信文件夹，也不改写设置文件"""
+    from config.config import Config
+
+    monkeypatch.setattr(Config, 'WECHAT_BASE_PATHS', [])
+    monkeypatch.setattr(Config, 'WECHAT_FOLDER_CACHE', {})
+
+
+@pytest.fixture
+def tag_index(tmp_path):
+    """使用临时数据库的全局标签索引"""
+    from utils.tag_index import TagIndex
+
+    saved = TagIndex._instance
+    TagIndex._instance = None
+    index = TagIndex(str(tmp_path / 'tags.db'))
+    yield index
+    TagIndex._instance = saved
+
+
+@pytest.fixture
+def cache_manifest(tmp_path, monkeypatch):
+    """使用临时缓存目录和清单的全局缓存清单"""
+    from config.config import Config
+    from utils.cache_manifest import CacheManifest
+
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(cache_dir))
+    monkeypatch.setattr(Config, 'CACHE_MANIFEST', str(cache_dir / 'manifest.db'))
+    saved = CacheManifest._instance
+    CacheManifest._instance = None
+    yield CacheManifest()
+    CacheManifest._instance = saved
+
+
+@pytest.fixture
+def scan_snapshot(tmp_path):
+    """使用临时数据库的全局扫描快照"""
+    from utils.scan_snapshot import ScanSnapshot
+
+    saved = ScanSnapshot._instance
+    ScanSnapshot._instance = None
+    snapshot = ScanSnapshot(str(tmp_path / 'scan_snapshot.db'))
+    yield snapshot
+    ScanSnapshot._instance = saved
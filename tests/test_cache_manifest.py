@@ -0,0 +1,50 @@
+import argparse
+import time
+
+from commands.delete_command import handle_delete_command, setup_delete_parser
+from config.config import Config
+from utils.cache_manifest import CacheManifest
+from utils.cache_utils import CacheUtils
+
+
+def _states(manifest):
+    with manifest._connect() as conn:
+        return dict(conn.execute('SELECT cache_key, state FROM cache_entries'))
+
+
+def test_recover_pending_after_crash(tmp_path, cache_manifest):
+    moved_path = tmp_path / 'cache' / 'ab' / 'moved.jpg'
+    moved_path.parent.mkdir(parents=True)
+    moved_path.write_bytes(b'x')
+    old = time.time() - Config.CACHE_RECOVER_AFTER - 10
+    cache_manifest.begin_batch([
+        ('moved', str(moved_path), '/photos/moved.jpg', 1, old, 'b1', 0),
+        ('lost', str(tmp_path / 'cache' / 'lost.jpg'), '/photos/lost.jpg', 1, old, 'b1', 1),
+        ('running', str(tmp_path / 'cache' / 'running.jpg'), '/photos/running.jpg', 1, time.time(), 'b2', 0),
+    ])
+
+    # 模拟进程崩溃后重新打开清单
+    CacheManifest._instance = None
+    manifest = CacheManifest()
+
+    # 已移动的记录确认，未移动的丢弃，其他进程正在移动的较新记录保持不变
+    assert _states(manifest) == {'moved': CacheManifest.STATE_CACHED, 'running': CacheManifest.STATE_PENDING}
+    assert [entry['original_path'] for entry in manifest.get_all_entries()] == ['/photos/moved.jpg']
+
+
+def test_undo_restores_every_chunk_of_one_delete(tmp_path, cache_manifest, tag_index):
+    folder = tmp_path / 'photos'
+    folder.mkdir()
+    for index in range(14):
+        (folder / f'{index}.jpg').write_bytes(b'x')
+
+    parser = argparse.ArgumentParser()
+    setup_delete_parser(parser.add_subparsers(dest='command'))
+    handle_delete_command(parser.parse_args(['delete', str(folder), '--batch-size', '5', '--workers', '3']))
+    assert not list(folder.iterdir())
+    assert len(cache_manifest.list_batches()) == 1
+
+    restored = CacheUtils.undo_last_delete()
+    assert len(restored) == 14
+    assert sorted(path.name for path in folder.iterdir()) == sorted(f'{index}.jpg' for index in range(14))
+    assert cache_manifest.count_entries() == 0
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from utils.cache_purger import CachePurger
+
+@pytest.fixture
+def purger():
+    saved = CachePurger._instance
+    CachePurger._instance = None
+    yield CachePurger()
+    CachePurger._instance = saved
+
+def test_overlapping_pauses_are_counted(purger):
+    purger.pause()
+    purger.pause()
+    purger.resume()
+    assert not purger._io_idle.is_set()
+    purger.resume()
+    assert purger._io_idle.is_set()
+
+    # 多余的 resume 不会让之后的暂停失效
+    purger.resume()
+    purger.pause()
+    assert not purger._io_idle.is_set()
+    purger.resume()
+
+def test_concurrent_pause_resume(purger):
+    def scan():
+        for _ in range(1000):
+            purger.pause()
+            purger.resume()
+
+    threads = [threading.Thread(target=scan) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert purger._pause_count == 0
+    assert purger._io_idle.is_set()
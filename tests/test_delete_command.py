@@ -0,0 +1,61 @@
+import argparse
+import io
+import sys
+
+from commands.delete_command import _collect_candidates, setup_delete_parser
+
+
+def _parse(argv):
+    parser = argparse.ArgumentParser()
+    setup_delete_parser(parser.add_subparsers(dest='command'))
+    return parser.parse_args(['delete'] + argv)
+
+
+def _tree(tmp_path):
+    for name in ('a/1.jpg', 'a/2.jpg', 'a/sub/4.png', 'b/3.jpg'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    return tmp_path
+
+
+def _paths(entries, root):
+    return sorted(str(entry.path)[len(str(root)) + 1:] for entry in entries)
+
+
+def test_folder_and_color_intersect(tmp_path, tag_index):
+    root = _tree(tmp_path)
+    for name in ('a/1.jpg', 'b/3.jpg'):
+        tag_index.set_tag(str(root / name), '1', 'Red', 'Red')
+
+    entries = _collect_candidates(_parse([str(root / 'a'), '--color', '1']))
+    assert _paths(entries, root) == ['a/1.jpg']
+
+
+def test_color_without_folder_selects_all_tagged(tmp_path, tag_index):
+    root = _tree(tmp_path)
+    for name in ('a/1.jpg', 'b/3.jpg'):
+        tag_index.set_tag(str(root / name), '1', 'Red', 'Red')
+
+    entries = _collect_candidates(_parse(['--color', '1']))
+    assert _paths(entries, root) == ['a/1.jpg', 'b/3.jpg']
+
+
+def test_folder_and_stdin_intersect(tmp_path, tag_index, monkeypatch):
+    root = _tree(tmp_path)
+    listing = '\n'.join(str(root / name) for name in ('a/2.jpg', 'a/sub/4.png', 'b/3.jpg')) + '\n'
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(listing.encode())))
+
+    entries = _collect_candidates(_parse([str(root / 'a'), '--stdin']))
+    assert _paths(entries, root) == ['a/2.jpg', 'a/sub/4.png']
+
+
+def test_folder_color_and_stdin_intersect(tmp_path, tag_index, monkeypatch):
+    root = _tree(tmp_path)
+    for name in ('a/1.jpg', 'a/2.jpg', 'b/3.jpg'):
+        tag_index.set_tag(str(root / name), '1', 'Red', 'Red')
+    listing = '\n'.join(str(root / name) for name in ('a/2.jpg', 'b/3.jpg')) + '\n'
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(listing.encode())))
+
+    entries = _collect_candidates(_parse([str(root / 'a'), '--color', '1', '--stdin']))
+    assert _paths(entries, root) == ['a/2.jpg']
@@ -0,0 +1,40 @@
+import os
+
+from utils.catalog_query import CatalogIndex, CatalogQuery
+from utils.image_catalog import ImageCatalog
+
+def make_catalog():
+    catalog = ImageCatalog()
+    catalog.add(os.path.join('/a', 'x.jpg'), 100, 1_600_000_000)
+    catalog.add(os.path.join('/a', 'y.png'), 3 * 1024 * 1024, 1_700_000_000, marked=True)
+    catalog.add(os.path.join('/b', 'x.jpg'), 200, 1_600_000_000)
+    return catalog
+
+def test_find_many_matches_directory_and_name():
+    catalog = make_catalog()
+    found = catalog.find_many([os.path.join('/b', 'x.jpg'), os.path.join('/a', 'y.png'),
+                               os.path.join('/c', 'x.jpg'), os.path.join('/a', 'z.jpg')])
+    assert found == {os.path.join('/b', 'x.jpg'): 2, os.path.join('/a', 'y.png'): 1}
+
+def test_find_many_skips_deleted_rows_unless_asked():
+    catalog = make_catalog()
+    path = os.path.join('/a', 'x.jpg')
+    catalog.remove([0])
+    assert catalog.find(path) is None
+    assert catalog.find_many([path]) == {}
+    assert catalog.find_many([path], include_deleted=True) == {path: 0}
+
+    # 删除后重新加入同一路径，查找返回新行
+    row = catalog.add(path, 100, 1_600_000_000)
+    assert catalog.find(path) == row
+    catalog.revive(0)
+    assert catalog.find(path) == row
+
+def test_query_combines_conditions():
+    catalog = make_catalog()
+    index = CatalogIndex(catalog)
+    index.update()
+    assert index.search(CatalogQuery.parse('x.jpg')) == {0, 2}
+    assert index.search(CatalogQuery.parse('*.jpg in:/b')) == {2}
+    assert index.search(CatalogQuery.parse('size:>1MB tag:any')) == {1}
+    assert index.search(CatalogQuery.parse('tag:none date:2020')) == {0, 2}
@@ -0,0 +1,32 @@
+import os
+
+from utils.image_sniffer import ImageSniffer
+from utils.scan_utils import ScanUtils
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 24
+
+def test_detect_formats():
+    assert ImageSniffer.detect(b'\xff\xd8\xff\xe0' + b'\0' * 12) == '.jpg'
+    assert ImageSniffer.detect(PNG[:16]) == '.png'
+    assert ImageSniffer.detect(b'GIF89a' + b'\0' * 10) == '.gif'
+    assert ImageSniffer.detect(b'RIFF\0\0\0\0WEBPVP8 ') == '.webp'
+    assert ImageSniffer.detect(b'hello world text') == ''
+
+def test_scan_finds_extensionless_image(tmp_path, scan_snapshot):
+    (tmp_path / 'photo').write_bytes(PNG)
+    (tmp_path / 'notes').write_bytes(b'not an image at all')
+    (tmp_path / 'empty').write_bytes(b'')
+    (tmp_path / 'a.jpg').write_bytes(b'x')
+
+    def scan(**kwargs):
+        return sorted(entry.name for entry in ScanUtils.iter_images(str(tmp_path), exclude_dirs=[], **kwargs))
+
+    assert scan(sniff=False) == ['a.jpg']
+    assert scan(sniff=True) == ['a.jpg', 'photo']
+
+    # 第二次扫描使用快照中的识别结果，不再读取文件
+    sniffer = ImageSniffer([str(tmp_path)], snapshot=scan_snapshot)
+    st = os.stat(tmp_path / 'photo')
+    assert sniffer.classify([(str(tmp_path / 'photo'), st.st_size, st.st_mtime)]) == ['.png']
+    assert sniffer.hits == 1 and sniffer.reads == 0
+    sniffer.close()
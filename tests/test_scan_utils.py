@@ -0,0 +1,48 @@
+import os
+
+from utils.scan_utils import ScanUtils
+from utils.wechat_discovery import WeChatDiscovery
+
+def make_tree(root):
+    """微信图片文件夹的目录结构，语音和视频目录中也放一张图片"""
+    files = ['a.jpg', 'notes.txt', 'Video/v.jpg', 'Audio/x.png', 'File/f.png', 'chat.db/img.png',
+             'Video/keep/k.jpg']
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    return root
+
+def found(root, **kwargs):
+    return sorted(os.path.relpath(entry.path, root) for entry in ScanUtils.iter_images(str(root), **kwargs))
+
+def test_excluded_dirs_are_pruned(tmp_path):
+    root = make_tree(tmp_path)
+    stats = {}
+    assert found(root, stats=stats, exclude_dirs=['Audio', 'video', '*.db']) == \
+        ['File/f.png', 'a.jpg']
+    # 被排除的目录不会被列出
+    assert stats['dirs'] == 2
+    # 扩展名不是图片的文件计入文件数，但不产出
+    assert stats['files'] == 3
+
+def test_include_rule_overrides_exclude(tmp_path):
+    root = make_tree(tmp_path)
+    assert found(root, exclude_dirs=['Video'], include_dirs=['video']) == \
+        sorted(['Audio/x.png', 'File/f.png', 'Video/keep/k.jpg', 'Video/v.jpg', 'a.jpg', 'chat.db/img.png'])
+
+def test_default_excludes_only_apply_to_wechat_folders(tmp_path, monkeypatch):
+    wechat = make_tree(tmp_path / 'wechat')
+    other = make_tree(tmp_path / 'other')
+    monkeypatch.setattr(WeChatDiscovery, 'find_folders', staticmethod(lambda: [str(wechat)]))
+
+    assert 'Video/v.jpg' in found(other)
+    assert found(wechat) == ['File/f.png', 'a.jpg']
+    assert found(wechat / 'File') == ['f.png']
+
+    stats = [{}, {}]
+    results = {}
+    for index, entries in ScanUtils.iter_images_multi([str(wechat), str(other)], stats=stats, max_workers=2):
+        results.setdefault(index, []).extend(entries)
+    assert len(results[0]) == 2
+    assert len(results[1]) == 6
@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# 标签命令不应加载的模块：线程池、进程池、图形界面和图片解码
+HEAVY_MODULES = ['concurrent.futures', 'multiprocessing', 'tkinter', 'PIL']
+
+
+def _modules_after(argv, tmp_path):
+    """在子进程中运行 main.py，退出前返回已加载的模块"""
+    script = (
+        'import atexit, json, sys\n'
+        f'sys.argv = {json.dumps(["main.py"] + argv)}\n'
+        f'sys.path.insert(0, {SRC_DIR!r})\n'
+        'atexit.register(lambda: print("MODULES=" + json.dumps(sorted(sys.modules)), file=sys.__stderr__))\n'
+        'import runpy\n'
+        f'runpy.run_path({os.path.join(SRC_DIR, "main.py")!r}, run_name="__main__")\n'
+    )
+    env = dict(os.environ, HOME=str(tmp_path))
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=str(tmp_path), env=env, timeout=60)
+    for line in result.stderr.splitlines():
+        if line.startswith('MODULES='):
+            return set(json.loads(line[len('MODULES='):]))
+    raise AssertionError(result.stderr)
+
+
+def test_tag_get_skips_heavy_modules(tmp_path):
+    modules = _modules_after(['tag', '--no-daemon', 'get', str(tmp_path / 'x.jpg')], tmp_path)
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    assert not loaded, f'tag get 加载了 {loaded}'
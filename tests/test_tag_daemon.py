@@ -0,0 +1,40 @@
+import socket
+
+import pytest
+
+from config.config import Config
+from utils.macos_utils import MacOSUtils
+from utils.tag_daemon import TagDaemonClient
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='需要 Unix 套接字')
+
+def test_stale_socket_falls_back(tmp_path):
+    path = str(tmp_path / 'tagd.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.close()
+    assert TagDaemonClient.connect(path, fallback=True) is None
+
+def test_timeout_falls_back_to_database(tmp_path, tag_index, monkeypatch):
+    monkeypatch.setattr(Config, 'TAG_DAEMON_TIMEOUT', 0.2)
+    image = tmp_path / 'a.jpg'
+    image.write_bytes(b'x')
+    MacOSUtils.set_tags([str(image)], '1')
+
+    # 接受连接但从不响应的服务
+    path = str(tmp_path / 'tagd.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    try:
+        client = TagDaemonClient.connect(path, fallback=True)
+        assert client.get_tags([str(image)])[str(image)]['tag_key'] == '1'
+        assert client.failed
+        assert client.get_files_by_tag('1') == [str(image)]
+
+        strict = TagDaemonClient.connect(path)
+        with pytest.raises(OSError):
+            strict.get_tags([str(image)])
+        strict.close()
+    finally:
+        server.close()
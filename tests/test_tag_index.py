@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from utils.tag_index import TagIndex
+
+
+@pytest.fixture
+def open_index(tmp_path):
+    """在同一个数据库上创建多个 TagIndex 实例，模拟界面、命令行和标签服务各自的进程"""
+    db_path = str(tmp_path / 'tags.db')
+    saved = TagIndex._instance
+
+    def factory() -> TagIndex:
+        TagIndex._instance = None
+        return TagIndex(db_path)
+
+    yield factory
+    TagIndex._instance = saved
+
+
+def test_cache_sees_writes_from_another_instance(open_index, monkeypatch):
+    monkeypatch.setattr(TagIndex, 'VERSION_CHECK_INTERVAL', 0)
+    gui = open_index()
+    cli = open_index()
+    gui.set_tag('/photos/a.jpg', '1', 'Red', 'Red')
+    assert gui.get_files_by_tag('1') == ['/photos/a.jpg']
+    assert cli.get_all_tags() == {'/photos/a.jpg': '1'}
+
+    cli.set_tags([('/photos/b.jpg', '1', 'Red', 'Red')])
+    cli.remove_tag('/photos/a.jpg')
+
+    assert gui.get_files_by_tag('1') == ['/photos/b.jpg']
+    assert gui.get_all_tags() == {'/photos/b.jpg': '1'}
+    assert gui.get_tag('/photos/a.jpg') is None
+
+
+def test_own_writes_keep_cache(open_index):
+    index = open_index()
+    index.set_tag('/photos/a.jpg', '2', 'Orange', 'Orange')
+    index.get_all_tags()
+    index.set_tag('/photos/b.jpg', '2', 'Orange', 'Orange')
+    index.remove_tag('/photos/a.jpg')
+    assert not index.refresh_if_changed()
+    assert index.get_all_tags() == {'/photos/b.jpg': '2'}
+
+
+def test_removed_tags_count_as_changed(open_index):
+    index = open_index()
+    index.set_tag('/photos/a.jpg', '1', 'Red', 'Red')
+    since = time.time() + 60
+    assert index.get_files_changed_since('/photos', since) == []
+
+    index.remove_tag('/photos/a.jpg')
+    assert index.get_files_changed_since('/photos', time.time()) == ['/photos/a.jpg']
+    assert index.get_files_changed_since('/other', 0) == []
+
+
+def test_version_check_is_throttled(open_index, monkeypatch):
+    monkeypatch.setattr(TagIndex, 'VERSION_CHECK_INTERVAL', 3600)
+    gui = open_index()
+    cli = open_index()
+    gui.set_tag('/photos/a.jpg', '1', 'Red', 'Red')
+    assert gui.get_all_tags() == {'/photos/a.jpg': '1'}
+
+    cli.set_tag('/photos/b.jpg', '1', 'Red', 'Red')
+    # 检查间隔内只读内存缓存，显式检查（标签服务每个请求前调用）时重新加载
+    assert gui.get_all_tags() == {'/photos/a.jpg': '1'}
+    assert gui.refresh_if_changed()
+    assert gui.get_all_tags() == {'/photos/a.jpg': '1', '/photos/b.jpg': '1'}
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from utils.image_sniffer import ImageSniffer
+from utils.wechat_dat import WeChatDat
+
+JPEG = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + bytes(range(256))
+WEBP = b'RIFF\x24\x00\x00\x00WEBPVP8 ' + bytes(32)
+
+def encrypt(data, key):
+    return bytes(byte ^ key for byte in data)
+
+@pytest.mark.parametrize('data, extension', [(JPEG, '.jpg'), (WEBP, '.webp')])
+@pytest.mark.parametrize('key', [0x00, 0x37, 0xff])
+def test_detect_key(data, extension, key):
+    assert WeChatDat.detect_key(encrypt(data, key)[:WeChatDat.HEADER_SIZE]) == (key, extension)
+
+def test_detect_key_rejects_other_data():
+    assert WeChatDat.detect_key(b'plain text file.') is None
+    # 两段文件头推出的密钥不同时不是 webp
+    broken = bytearray(encrypt(WEBP, 0x37))
+    broken[8] ^= 0x01
+    assert WeChatDat.detect_key(bytes(broken[:16])) is None
+
+def test_read_and_export_round_trip(tmp_path):
+    source = tmp_path / 'abc.dat'
+    source.write_bytes(encrypt(JPEG, 0x5a))
+
+    assert ImageSniffer.sniff_file(str(source)) == '.jpg'
+    assert WeChatDat.read(str(source)) == (JPEG, '.jpg')
+
+    dest = tmp_path / 'out'
+    dest.mkdir()
+    first = WeChatDat.export_file(str(source), str(dest))
+    second = WeChatDat.export_file(str(source), str(dest))
+    assert os.path.basename(first) == 'abc.jpg'
+    assert os.path.basename(second) == 'abc_1.jpg'
+    with open(first, 'rb') as f:
+        assert f.read() == JPEG
+
+def test_unknown_dat_is_not_exported(tmp_path):
+    source = tmp_path / 'x.dat'
+    source.write_bytes(b'\x01\x02\x03' * 10)
+    assert WeChatDat.read(str(source)) is None
+    assert WeChatDat.export_file(str(source), str(tmp_path)) is None